@@ -1,21 +1,60 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from azure.cognitiveservices.vision.computervision import ComputerVisionClient
-from azure.core.credentials import AzureKeyCredential
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
-from services.storage_service import StorageService
-from services.runway_service import RunwayService
+from services.job_store import IdempotencyConflict, SQLiteJobStore
+from services.job_events import JobEventBus
+from services.prompt_cache import normalize_prompt, prompt_cache_key
+from services import telemetry
+import importlib
+import logging
 import os
+import time
 import uuid
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, Any, List, Optional, Dict, Tuple
 import json
 import asyncio
+from datetime import datetime
+
+if TYPE_CHECKING:
+    # The service modules pull in the Azure, Runway and OpenCV SDKs; main.py imports
+    # them on first use so the API starts answering before they are loaded
+    from services.audio_mux import AudioLibrary, AudioMuxer
+    from services.local_renderer import LocalRenderBackend
+    from services.providers import HTTPSessionPool, ProviderRouter
+    from services.runway_service import RunwayService
+    from services.storage_service import StorageService
+    from services.video_mirror import VideoMirror
+    from services.vision_service import VisionAnalysisService
 
 # Load environment variables
 load_dotenv()
 
+# Leveled, sampled logging (LOG_LEVEL, LOG_DEBUG_SAMPLE_RATE) and optional OTLP trace export
+telemetry.configure_logging()
+telemetry.configure_tracing()
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="AI Video Generation System")
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """
+    Record the latency of every request by route template, so /metrics doesn't grow a series per job ID
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        telemetry.HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - started)
+
 # CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -30,151 +69,693 @@ AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 AZURE_VISION_KEY = os.getenv("AZURE_VISION_KEY")
 AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")
 
-# Initialize services
-storage_service = StorageService(AZURE_STORAGE_CONNECTION_STRING)
-vision_client = ComputerVisionClient(
-    endpoint=AZURE_VISION_ENDPOINT,
-    credentials=AzureKeyCredential(AZURE_VISION_KEY)
+# Store generation jobs (shared by every worker process on this host)
+job_store = SQLiteJobStore(
+    os.getenv("JOB_STORE_PATH", "output/jobs.db"),
+    ttl=float(os.getenv("JOB_TTL_SECONDS", 7 * 24 * 3600))
+)
+
+# Pushes job changes to SSE/WebSocket watchers
+job_events = JobEventBus(job_store, poll_interval=float(os.getenv("JOB_EVENTS_POLL_SECONDS", "2")))
+JOB_EVENTS_HEARTBEAT_SECONDS = 15.0
+MAX_WEBSOCKET_SUBSCRIPTIONS = int(os.getenv("MAX_WEBSOCKET_SUBSCRIPTIONS", "100"))
+
+# Local files (renders, audio muxes, cached background tracks) are written here
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")
+
+# Upper bound on num_candidates per request; every candidate is a paid generation
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", "4"))
+# Upper bound on prompt/duration combinations per /generate-video/from-image request
+MAX_IMAGE_VARIANTS = int(os.getenv("MAX_IMAGE_VARIANTS", "8"))
+
+# Retried submissions attach to the job the first one created: by Idempotency-Key header within
+# IDEMPOTENCY_KEY_WINDOW_SECONDS, otherwise by request fingerprint within DUPLICATE_WINDOW_SECONDS (0 disables)
+IDEMPOTENCY_KEY_WINDOW_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_WINDOW_SECONDS", 24 * 3600))
+DUPLICATE_WINDOW_SECONDS = float(os.getenv("DUPLICATE_WINDOW_SECONDS", "120"))
+# Candidates are scored on their header against the request (duration, CANDIDATE_RESOLUTION: the shorter
+# side providers render, 720 for Runway's 1280:720) and, unless disabled, on sampled frames (sharpness, motion)
+CANDIDATE_RESOLUTION = int(os.getenv("CANDIDATE_RESOLUTION", "720"))
+CANDIDATE_FRAME_SCORING = os.getenv("CANDIDATE_FRAME_SCORING", "1") == "1"
+
+# Import the service modules in the background once the API is up, so the first
+# request using them doesn't pay for it
+SERVICES_PREWARM = os.getenv("SERVICES_PREWARM", "1") == "1"
+PREWARM_MODULES = (
+    "services.storage_service", "services.runway_service", "services.vision_service",
+    "services.providers", "services.video_mirror", "services.audio_mux", "services.candidates"
 )
-runway_service = RunwayService()
 
-# Store generation jobs
-generation_jobs: Dict[str, Dict] = {}
+# Services are built on first use by the get_* functions below (FastAPI dependencies);
+# init_services() can replace the Azure and Runway clients before that
+storage_service: Optional["StorageService"] = None
+runway_service: Optional["RunwayService"] = None
+vision_api_client: Optional[Any] = None
+vision_service: Optional["VisionAnalysisService"] = None
+http_sessions: Optional["HTTPSessionPool"] = None
+generation_router: Optional["ProviderRouter"] = None
+video_mirror: Optional["VideoMirror"] = None
+audio_library: Optional["AudioLibrary"] = None
+audio_muxer: Optional["AudioMuxer"] = None
+candidate_scorer: Optional[Any] = None
+
+# Local rendering worker pool, only spawned when a local render is requested
+local_renderer: Optional["LocalRenderBackend"] = None
+
+def init_services(storage: Optional["StorageService"] = None,
+                  vision_client: Optional[Any] = None,
+                  runway: Optional["RunwayService"] = None):
+    """
+    Replace the clients normally built from the environment (e.g. with the fakes of scripts/load_test.py).
+    Call before the first request; services not given here are still built on first use
+    """
+    global storage_service, vision_api_client, runway_service
+    storage_service = storage
+    vision_api_client = vision_client
+    runway_service = runway
+
+def get_storage_service() -> "StorageService":
+    global storage_service
+    if storage_service is None:
+        from services.storage_service import StorageService
+        storage_service = StorageService(AZURE_STORAGE_CONNECTION_STRING)
+    return storage_service
+
+def get_runway_service() -> "RunwayService":
+    global runway_service
+    if runway_service is None:
+        from services.runway_service import RunwayService
+        runway_service = RunwayService(get_storage_service())
+    return runway_service
+
+def get_vision_service() -> "VisionAnalysisService":
+    global vision_api_client, vision_service
+    if vision_service is None:
+        from services.vision_service import VisionAnalysisService
+        if vision_api_client is None:
+            from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+            from msrest.authentication import CognitiveServicesCredentials
+            vision_api_client = ComputerVisionClient(
+                endpoint=AZURE_VISION_ENDPOINT,
+                credentials=CognitiveServicesCredentials(AZURE_VISION_KEY)
+            )
+        # Image analysis runs after the upload has returned
+        vision_service = VisionAnalysisService(
+            vision_api_client,
+            get_storage_service(),
+            job_store,
+            max_concurrency=int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+        )
+    return vision_service
+
+def get_http_sessions() -> "HTTPSessionPool":
+    """HTTP providers and the video mirror share pooled sessions"""
+    global http_sessions
+    if http_sessions is None:
+        from services.providers import HTTPSessionPool
+        http_sessions = HTTPSessionPool()
+    return http_sessions
+
+def get_local_renderer() -> "LocalRenderBackend":
+    global local_renderer
+    if local_renderer is None:
+        from services.local_renderer import LocalRenderBackend
+        local_renderer = LocalRenderBackend(get_storage_service(), output_dir=OUTPUT_DIR)
+    return local_renderer
+
+def get_generation_router() -> "ProviderRouter":
+    """Generation backends behind one interface"""
+    global generation_router
+    if generation_router is None:
+        from services.providers import ProviderRouter, RunwaySDKProvider, RunwayRESTProvider, PikaProvider, LocalProvider
+        generation_router = ProviderRouter(
+            {
+                "runway": RunwaySDKProvider(
+                    get_runway_service(),
+                    timeout=float(os.getenv("RUNWAY_TIMEOUT_SECONDS", "1800"))
+                ),
+                "runway-rest": RunwayRESTProvider(
+                    get_http_sessions(),
+                    os.getenv("RUNWAYML_API_SECRET"),
+                    base_url=os.getenv("RUNWAY_API_BASE_URL", "https://api.dev.runwayml.com"),
+                    runway_service=get_runway_service(),
+                    timeout=float(os.getenv("RUNWAY_TIMEOUT_SECONDS", "1800"))
+                ),
+                "pika": PikaProvider(
+                    get_http_sessions(),
+                    os.getenv("PIKALABS_API_KEY"),
+                    base_url=os.getenv("PIKALABS_API_BASE_URL", "https://api.pikalabs.ai"),
+                    timeout=float(os.getenv("PIKA_TIMEOUT_SECONDS", "1800"))
+                ),
+                "local": LocalProvider(
+                    get_local_renderer,
+                    fps=int(os.getenv("LOCAL_RENDER_FPS", "8")),
+                    keyframe_interval=int(os.getenv("LOCAL_RENDER_KEYFRAME_INTERVAL", "4")),
+                    timeout=float(os.getenv("LOCAL_TIMEOUT_SECONDS", "3600"))
+                )
+            },
+            mode=os.getenv("GENERATION_DISPATCH_MODE", "single"),
+            fallback=os.getenv("GENERATION_FALLBACK_BACKEND") or None
+        )
+    return generation_router
+
+def get_video_mirror() -> "VideoMirror":
+    """Finished videos are copied from the provider into our own storage"""
+    global video_mirror
+    if video_mirror is None:
+        from services.video_mirror import VideoMirror
+        video_mirror = VideoMirror(
+            get_storage_service(),
+            get_http_sessions(),
+            mode=os.getenv("VIDEO_MIRROR_MODE", "ranges"),
+            max_concurrency=int(os.getenv("VIDEO_MIRROR_CONCURRENCY", "4"))
+        )
+    return video_mirror
+
+def get_audio_library() -> "AudioLibrary":
+    """Background tracks (audio files in the media container), cached on local disk"""
+    global audio_library
+    if audio_library is None:
+        from services.audio_mux import AudioLibrary
+        audio_library = AudioLibrary(get_storage_service(), cache_dir=os.path.join(OUTPUT_DIR, "audio-cache"))
+    return audio_library
+
+def get_audio_muxer() -> "AudioMuxer":
+    """ffmpeg processes adding background tracks"""
+    global audio_muxer
+    if audio_muxer is None:
+        from services.audio_mux import AudioMuxer
+        audio_muxer = AudioMuxer(max_workers=int(os.getenv("AUDIO_MUX_WORKERS", "2")), output_dir=OUTPUT_DIR)
+    return audio_muxer
+
+def candidate_criteria(duration: int) -> Dict:
+    """
+    score_video criteria for the requested video; its defaults (1080p, 60-180s) rate every provider clip the same
+    """
+    return {
+        "resolution": CANDIDATE_RESOLUTION,
+        # Providers round to the lengths they support (Runway: 5 or 10 seconds)
+        "min_duration": duration * 0.8,
+        "max_duration": duration * 1.2 + 1
+    }
+
+def get_candidate_scorer() -> Optional[Any]:
+    global candidate_scorer
+    if candidate_scorer is None and CANDIDATE_FRAME_SCORING:
+        from services.video_scoring import SharpnessMotionScorer
+        candidate_scorer = SharpnessMotionScorer()
+    return candidate_scorer
+
+def _cache_stats(service: Optional[Any]) -> Dict[str, Any]:
+    return service.cache.stats() if service is not None else {}
+
+# Read by /metrics on every scrape; services that were not built yet report nothing
+telemetry.register_cache("runway", lambda: _cache_stats(runway_service))
+telemetry.register_cache("vision", lambda: _cache_stats(vision_service))
+telemetry.register_cache("video_mirror", lambda: _cache_stats(video_mirror))
+telemetry.register_cache("audio", lambda: _cache_stats(audio_library))
+telemetry.register_scheduler("runway", lambda: runway_service.scheduler.stats() if runway_service else {})
+telemetry.register_providers("generation", lambda: generation_router.stats()["providers"] if generation_router else {})
+telemetry.register_gauge("ttv_runway_tasks_polling", lambda: runway_service.poller.in_flight if runway_service else 0)
+telemetry.register_gauge("ttv_job_watchers", lambda: job_events.watchers)
+
+async def submit_job(data: Dict, fingerprint: str, idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Create a job, or return the one an earlier identical submission created.
+    Returns (job_id, created); the check and the insert are one transaction in the job store, so it holds across workers
+    """
+    job_id = str(uuid.uuid4())
+    if idempotency_key:
+        return await job_store.create_if_absent_async(
+            f"key:{idempotency_key}", job_id, data, IDEMPOTENCY_KEY_WINDOW_SECONDS, fingerprint
+        )
+    if DUPLICATE_WINDOW_SECONDS > 0:
+        return await job_store.create_if_absent_async(
+            f"fingerprint:{fingerprint}", job_id, data, DUPLICATE_WINDOW_SECONDS, fingerprint
+        )
+    await job_store.create_async(job_id, data)
+    return job_id, True
+
+async def duplicate_response(job_id: str) -> Dict:
+    job = await job_store.get_async(job_id) or {}
+    return {
+        "job_id": job_id,
+        "status": job.get("status", "queued"),
+        "duplicate": True,
+        "message": "Duplicate submission, attached to the existing job"
+    }
+
+async def store_generated_video(job_id: str, result: Dict, prompt: str) -> Dict:
+    """
+    Copy a finished video into our storage and add a thumbnail; on failure the provider URL is kept
+    """
+    try:
+        return await get_video_mirror().store_result(result, metadata={
+            "job_id": job_id,
+            "prompt": prompt[:256].encode('ascii', 'ignore').decode()
+        })
+    except Exception as e:
+        logger.warning("Could not store video of job %s: %s", job_id, e)
+        return {"storage_error": str(e)}
+
+async def add_background_audio(job_id: str, video_url: str, audio_track: str) -> Dict:
+    """
+    Attach a background track to a finished video and store the result in the videos container
+    """
+    async with get_audio_library().use(audio_track) as audio_path:
+        output_path = await get_audio_muxer().mux(video_url, audio_path, os.path.join(OUTPUT_DIR, f"{job_id}.mp4"))
+    try:
+        with open(output_path, "rb") as video_file:
+            stored = await get_storage_service().upload_stream(
+                video_file,
+                filename=f"{job_id}.mp4",
+                container_type='videos',
+                metadata={"job_id": job_id, "audio_track": audio_track.encode('ascii', 'ignore').decode()}
+            )
+    finally:
+        os.remove(output_path)
+    return {
+        "video_url": stored["sas_url"] or stored["url"],
+        "video_blob": stored["filename"],
+        "audio_track": audio_track
+    }
 
 @app.post("/upload")
 async def upload_media(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    container_type: str = "media"
+    container_type: str = "media",
+    storage=Depends(get_storage_service)
 ):
     """
-    Upload media file (image or video) to Azure Blob Storage
+    Upload media file (image or video) to Azure Blob Storage.
+    Images are analyzed with Computer Vision in the background; poll /analysis/{analysis_id} for the result.
     """
     try:
-        # Read file content
-        content = await file.read()
-        
         # Generate unique filename
         file_extension = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         
-        # Upload to Azure Blob Storage
-        upload_result = await storage_service.upload_file(
-            file_data=content,
-            filename=unique_filename,
-            container_type=container_type,
-            metadata={
-                "original_filename": file.filename,
-                "content_type": file.content_type
-            }
-        )
+        # Stream the upload to Azure Blob Storage in fixed-size blocks
+        with telemetry.span("upload", container=container_type):
+            upload_result = await storage.upload_stream(
+                file,
+                filename=unique_filename,
+                container_type=container_type,
+                metadata={
+                    "original_filename": file.filename,
+                    "content_type": file.content_type
+                }
+            )
         
-        # If it's an image, analyze it with Computer Vision
-        if file_extension.lower() in ['.jpg', '.jpeg', '.png']:
-            image_analysis = vision_client.analyze_image_in_stream(
-                content,
-                visual_features=['Description', 'Tags', 'Categories']
+        # If it's an image, queue analysis with Computer Vision; other uploads never build the client
+        from services.vision_service import VisionAnalysisService
+        if VisionAnalysisService.is_image(unique_filename):
+            vision = get_vision_service()
+            analysis_id = str(uuid.uuid4())
+            analysis = await vision.submit(analysis_id, unique_filename, container_type)
+            background_tasks.add_task(
+                vision.analyze,
+                analysis_id,
+                unique_filename,
+                container_type,
+                upload_result["content_sha256"]
             )
             return {
                 **upload_result,
-                "analysis": {
-                    "description": image_analysis.description.captions[0].text if image_analysis.description.captions else None,
-                    "tags": [tag.name for tag in image_analysis.tags],
-                    "categories": [category.name for category in image_analysis.categories]
-                }
+                "analysis": analysis
             }
         
         return upload_result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/analysis/{analysis_id}")
+async def get_analysis_status(analysis_id: str):
+    """
+    Check status and results of an image analysis job
+    """
+    analysis = await job_store.get_async(analysis_id)
+    if analysis is None or analysis.get("type") != "image_analysis":
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    return analysis
+
 @app.get("/files")
 async def list_files(
     container_type: str = "media",
-    prefix: Optional[str] = None
+    prefix: Optional[str] = None,
+    container_sas: bool = False,
+    limit: int = Query(100, ge=1, le=5000),
+    page_token: Optional[str] = None,
+    content_type: Optional[str] = None,
+    modified_since: Optional[datetime] = None,
+    stream: bool = False,
+    storage=Depends(get_storage_service)
 ):
     """
-    List files in a container
+    List files in a container, one page at a time.
+    
+    Pass the returned next_page_token as page_token to get the following page.
+    content_type filters by prefix (e.g. "video/"). With stream=true every
+    matching file is streamed as NDJSON, one object per line, as pages arrive.
+    Set container_sas to sign all URLs with one container-wide token.
     """
     try:
-        files = await storage_service.list_files(container_type, prefix)
-        return {"files": files}
+        if stream:
+            files = storage.iter_files(
+                container_type,
+                prefix,
+                content_type=content_type,
+                modified_since=modified_since,
+                container_sas=container_sas
+            )
+            # Validate the container and fetch the first page before the 200 status is sent
+            try:
+                first = [await files.__anext__()]
+            except StopAsyncIteration:
+                first = []
+            
+            async def ndjson():
+                for entry in first:
+                    yield json.dumps(jsonable_encoder(entry)) + "\n"
+                if first:
+                    async for entry in files:
+                        yield json.dumps(jsonable_encoder(entry)) + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        
+        return await storage.list_files_page(
+            container_type,
+            prefix,
+            limit=limit,
+            page_token=page_token,
+            content_type=content_type,
+            modified_since=modified_since,
+            container_sas=container_sas
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/files/{filename}")
 async def delete_file(
     filename: str,
-    container_type: str = "media"
+    container_type: str = "media",
+    storage=Depends(get_storage_service)
 ):
     """
     Delete a file from storage
     """
     try:
-        success = await storage_service.delete_file(filename, container_type)
+        success = await storage.delete_file(filename, container_type)
         if not success:
             raise HTTPException(status_code=404, detail="File not found")
         return {"message": "File deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_video_generation(job_id: str, prompt: str, duration: int):
+async def process_video_generation(job_id: str, prompt: str, duration: int, priority: int = 0,
+                                   backend: str = "runway", fallback: Optional[str] = None,
+                                   dispatch: Optional[str] = None, num_candidates: int = 1,
+                                   quality_threshold: Optional[float] = None,
+                                   audio_track: Optional[str] = None):
     """
     Background task to process video generation
     """
     try:
         # Update job status
-        generation_jobs[job_id] = {
-            "status": "processing",
-            "progress": 0
-        }
+        if not await job_store.transition_async(job_id, ["queued"], "processing", {"progress": 0}):
+            # Another worker already picked this job up
+            return
+        
+        # Generate video on the requested backend (hedged or with fallback if configured)
+        router = get_generation_router()
+        if num_candidates > 1:
+            from services.candidates import generate_candidates
+            result = await generate_candidates(
+                lambda **options: router.generate(
+                    backend, prompt, duration, job_id=job_id, priority=priority,
+                    fallback=fallback, mode=dispatch, **options
+                ),
+                num_candidates,
+                quality_threshold=quality_threshold,
+                criteria=candidate_criteria(duration),
+                scorer=get_candidate_scorer(),
+                on_update=lambda candidates: job_store.update_soon(job_id, {"candidates": candidates})
+            )
+        else:
+            result = await router.generate(
+                backend,
+                prompt,
+                duration,
+                job_id=job_id,
+                priority=priority,
+                on_progress=lambda progress: job_store.update_soon(job_id, progress),
+                fallback=fallback,
+                mode=dispatch
+            )
+        
+        # Serve the video from our own storage rather than the expiring provider URL
+        await job_store.update_async(job_id, {"stage": "storing", "progress": 0.95})
+        stored = await store_generated_video(job_id, result, prompt)
         
-        # Generate video using RunwayML
-        result = runway_service.generate_video(prompt, duration)
+        if audio_track:
+            await job_store.update_async(job_id, {"stage": "adding audio", "progress": 0.97})
+            stored.update(await add_background_audio(job_id, stored.get("video_url", result["video_url"]), audio_track))
         
         # Update job status with result
-        generation_jobs[job_id] = {
+        await job_store.update_async(job_id, {
             "status": "completed",
-            "video_url": result["video_url"],
-            "job_id": result["job_id"]
-        }
+            "stage": "uploaded" if "storage_error" not in stored else "completed",
+            "progress": 1.0,
+            **result,
+            **stored
+        })
     except Exception as e:
-        generation_jobs[job_id] = {
+        await job_store.update_async(job_id, {
             "status": "failed",
             "error": str(e)
-        }
+        })
 
 @app.post("/generate-video")
 async def generate_video(
     background_tasks: BackgroundTasks,
     prompt: str,
-    duration: int = 4
+    duration: int = 5,
+    priority: int = 0,
+    backend: str = "runway",
+    fallback: Optional[str] = None,
+    dispatch: Optional[str] = None,
+    num_candidates: int = Query(1, ge=1),
+    quality_threshold: Optional[float] = Query(None, ge=0),
+    audio_track: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    router=Depends(get_generation_router),
+    storage=Depends(get_storage_service)
 ):
     """
-    Generate video based on text prompt
+    Generate video based on text prompt. Lower priority values are scheduled first.
+    backend selects RunwayML ("runway" via the SDK, "runway-rest"), Pika Labs ("pika")
+    or the local rendering worker pool ("local"). dispatch is "single", "fallback"
+    (retry on the fallback backend if the first one fails) or "hedge" (also start the
+    fallback backend once the first one runs past its p95 latency).
+    With num_candidates > 1 that many videos are generated concurrently and scored as
+    they finish; their status is listed under "candidates" in /video-status and the best
+    one is returned. With quality_threshold the first candidate scoring at least that
+    much is returned and the remaining ones are cancelled.
+    audio_track names an audio file in the media container (see /audio-tracks) to add
+    as background music.
+    A repeated submission (same Idempotency-Key header, or without one the same prompt
+    and options within DUPLICATE_WINDOW_SECONDS) returns the existing job with
+    "duplicate": true instead of starting another generation.
     """
+    # Runway only renders these lengths; anything else would silently get the default length
+    from services.runway_service import VIDEO_DURATIONS
+    if duration not in VIDEO_DURATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported duration {duration}; use {', '.join(map(str, VIDEO_DURATIONS))}"
+        )
+    if num_candidates > MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"num_candidates must be at most {MAX_CANDIDATES}")
     try:
-        # Generate unique job ID
-        job_id = str(uuid.uuid4())
-        
-        # Initialize job status
-        generation_jobs[job_id] = {
+        router.resolve(backend, fallback, dispatch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if audio_track and not await storage.file_exists(audio_track, "media"):
+        raise HTTPException(status_code=404, detail="Audio track not found")
+    try:
+        # Initialize job status, unless this repeats an earlier submission
+        fingerprint = prompt_cache_key(
+            "generate-video", prompt, duration=duration, backend=backend, fallback=fallback,
+            dispatch=dispatch, num_candidates=num_candidates, quality_threshold=quality_threshold,
+            audio_track=audio_track
+        )
+        job_id, created = await submit_job({
             "status": "queued",
             "progress": 0
-        }
+        }, fingerprint, idempotency_key)
+        if not created:
+            return await duplicate_response(job_id)
         
         # Start background task
         background_tasks.add_task(
             process_video_generation,
             job_id,
             prompt,
-            duration
+            duration,
+            priority,
+            backend,
+            fallback,
+            dispatch,
+            num_candidates,
+            quality_threshold,
+            audio_track
         )
         
         return {
             "job_id": job_id,
             "status": "queued",
+            "duplicate": False,
             "message": "Video generation started"
         }
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def process_image_to_video(job_id: str, image: str, container_type: str,
+                                 variants: List[Dict], priority: int = 0):
+    """
+    Background task to generate several videos from one stored image
+    """
+    try:
+        if not await job_store.transition_async(job_id, ["queued"], "processing", {"progress": 0}):
+            return
+        
+        image_url = await get_storage_service().get_file_url(image, container_type)
+        videos = [dict(variant, status="queued") for variant in variants]
+        
+        def on_stage(name: str, status: str, detail):
+            video = videos[int(name)]
+            video["status"] = "processing" if status == "running" else status
+            if status == "completed":
+                video["video_url"] = detail["video_url"]
+                video["runway_job_id"] = detail["job_id"]
+            elif status == "failed":
+                video["error"] = detail
+            done = sum(v["status"] in ("completed", "failed") for v in videos)
+            job_store.update_soon(job_id, {"videos": videos, "progress": done / len(videos)})
+        
+        results = await get_runway_service().generate_videos_from_image(
+            image_url,
+            variants,
+            job_id=job_id,
+            priority=priority,
+            image_id=f"{container_type}/{image}",
+            on_stage=on_stage
+        )
+        
+        # Copy every finished video into our storage
+        finished = [(video, result) for video, result in zip(videos, results) if result is not None]
+        stored = await asyncio.gather(*(
+            store_generated_video(job_id, result, video["prompt"]) for video, result in finished
+        ))
+        for (video, _), fields in zip(finished, stored):
+            video.update(fields)
+        
+        if any(video["status"] == "completed" for video in videos):
+            await job_store.update_async(job_id, {"status": "completed", "progress": 1.0, "videos": videos})
+        else:
+            await job_store.update_async(job_id, {
+                "status": "failed",
+                "videos": videos,
+                "error": "; ".join(video.get("error", "") for video in videos)
+            })
+    except Exception as e:
+        await job_store.update_async(job_id, {
+            "status": "failed",
+            "error": str(e)
+        })
+
+@app.post("/generate-video/from-image")
+async def generate_video_from_image(
+    background_tasks: BackgroundTasks,
+    image: str,
+    prompts: List[str] = Query(...),
+    durations: List[int] = Query([5]),
+    container_type: str = "thumbnails",
+    priority: int = 0,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    storage=Depends(get_storage_service)
+):
+    """
+    Generate videos from an existing image, one per prompt and duration combination.
+    Use the image_blob of a finished /generate-video job (thumbnails container) or any
+    uploaded image (container_type=media) to skip generating the image again.
+    Repeated submissions are attached to the existing job as in /generate-video.
+    """
+    # Runway only renders these lengths; anything else would silently get the default length
+    from services.runway_service import VIDEO_DURATIONS
+    unsupported = sorted(set(durations) - set(VIDEO_DURATIONS))
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported durations {unsupported}; use {', '.join(map(str, VIDEO_DURATIONS))}"
+        )
+    variants = [{"prompt": prompt, "duration": duration} for prompt in prompts for duration in durations]
+    if len(variants) > MAX_IMAGE_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMAGE_VARIANTS} prompt/duration combinations")
+    try:
+        if not await storage.file_exists(image, container_type):
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        fingerprint = prompt_cache_key(
+            "generate-video/from-image", "", image=f"{container_type}/{image}",
+            variants=[{"prompt": normalize_prompt(v["prompt"]), "duration": v["duration"]} for v in variants]
+        )
+        job_id, created = await submit_job({
+            "status": "queued",
+            "type": "image_to_video",
+            "image": image,
+            "progress": 0,
+            "videos": [dict(variant, status="queued") for variant in variants]
+        }, fingerprint, idempotency_key)
+        if not created:
+            return await duplicate_response(job_id)
+        background_tasks.add_task(process_image_to_video, job_id, image, container_type, variants, priority)
+        
+        return {
+            "job_id": job_id,
+            "status": "queued",
+            "duplicate": False,
+            "message": f"Generating {len(variants)} videos from {image}"
+        }
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/audio-tracks")
+async def list_audio_tracks(
+    limit: int = Query(100, ge=1, le=5000),
+    page_token: Optional[str] = None,
+    storage=Depends(get_storage_service)
+):
+    """
+    List the background tracks (audio files in the media container) usable as audio_track
+    """
+    try:
+        return await storage.list_files_page(
+            "media",
+            limit=limit,
+            page_token=page_token,
+            content_type="audio/"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -183,18 +764,182 @@ async def get_video_status(job_id: str):
     """
     Check status of video generation job
     """
-    if job_id not in generation_jobs:
+    job = await job_store.get_async(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Jobs waiting for a Runway slot in this process report their place in line
+    queue_info = runway_service.scheduler.queue_info(job_id) if runway_service is not None else None
+    if queue_info:
+        job.update(queue_info)
+    
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-sent events with the job's state: sent once on connect and again on every
+    change (status, stage, progress), until the job completes or fails
+    """
+    if await job_store.get_async(job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return generation_jobs[job_id]
+    async def event_stream():
+        sequence = 0
+        async for record in job_events.events(job_id, heartbeat=JOB_EVENTS_HEARTBEAT_SECONDS):
+            if record is None:
+                yield ": keep-alive\n\n"
+                continue
+            sequence += 1
+            yield f"id: {sequence}\nevent: job\ndata: {json.dumps(jsonable_encoder(record))}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/jobs/ws")
+async def job_events_websocket(websocket: WebSocket):
+    """
+    Watch many jobs over one connection.
+    Send {"action": "subscribe", "job_id": ...} or {"action": "unsubscribe", "job_id": ...};
+    every change arrives as {"job_id": ..., "job": {...}}.
+    """
+    await websocket.accept()
+    subscriptions: Dict[str, asyncio.Task] = {}
+    send_lock = asyncio.Lock()
+    usage = {"error": "Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"job_id\": ...}"}
+    
+    async def send(message: Dict):
+        async with send_lock:
+            await websocket.send_json(jsonable_encoder(message))
+    
+    async def forward(job_id: str):
+        try:
+            async for record in job_events.events(job_id):
+                await send({"job_id": job_id, "job": record})
+        except Exception:
+            pass
+        finally:
+            subscriptions.pop(job_id, None)
+    
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError):
+                # Not JSON, or a binary frame; keep the connection and its subscriptions
+                await send(usage)
+                continue
+            action = message.get("action") if isinstance(message, dict) else None
+            job_id = message.get("job_id") if isinstance(message, dict) else None
+            if action == "subscribe" and job_id:
+                if job_id in subscriptions:
+                    continue
+                if len(subscriptions) >= MAX_WEBSOCKET_SUBSCRIPTIONS:
+                    await send({"job_id": job_id, "error": "Too many subscriptions"})
+                elif await job_store.get_async(job_id) is None:
+                    await send({"job_id": job_id, "error": "Job not found"})
+                else:
+                    subscriptions[job_id] = asyncio.ensure_future(forward(job_id))
+            elif action == "unsubscribe" and job_id:
+                task = subscriptions.pop(job_id, None)
+                if task is not None:
+                    task.cancel()
+            else:
+                await send(usage)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(subscriptions.values()):
+            task.cancel()
+
+def prewarm_services():
+    """
+    Import the service modules (Azure, Runway and OpenCV SDKs) ahead of the first request that needs them
+    """
+    started = time.perf_counter()
+    for module in PREWARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning("Could not preload %s: %s", module, e)
+    logger.info("Service modules loaded in %.2fs", time.perf_counter() - started)
+
+@app.on_event("startup")
+async def startup_services():
+    """
+    Start answering right away; services are built on first use and their modules load in a background thread
+    """
+    if SERVICES_PREWARM:
+        asyncio.get_running_loop().run_in_executor(None, prewarm_services)
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """
+    Stop the shared Runway task poller, job event polling and writes, local render workers, provider sessions and the storage connection pool
+    """
+    if runway_service is not None:
+        await runway_service.poller.stop()
+    await job_events.stop()
+    await asyncio.to_thread(job_store.close)
+    if http_sessions is not None:
+        await http_sessions.close()
+    if local_renderer is not None:
+        await local_renderer.stop()
+    if storage_service is not None:
+        await storage_service.close()
+
+@app.post("/models/warm-up")
+async def warm_up_local_models(timeout: float = 600):
+    """
+    Start the local render workers and wait until each has loaded its models.
+    The models are loaded in the worker processes that render with them, never in the API process.
+    """
+    try:
+        renderer = get_local_renderer()
+        loaded = await asyncio.wait_for(renderer.wait_ready(), timeout)
+        return {"loaded": loaded, "workers": renderer.workers}
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Local render workers not ready after {timeout:.0f}s")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/providers")
+async def get_provider_stats(router=Depends(get_generation_router)):
+    """
+    Latency percentiles, failures and hedging counts of the generation backends
+    """
+    return router.stats()
+
+@app.get("/health")
+async def get_health():
+    """
+    Liveness check that answers without building any service
+    """
+    return {"status": "ok", "services": {
+        "storage": storage_service is not None,
+        "runway": runway_service is not None,
+        "vision": vision_service is not None,
+        "generation": generation_router is not None
+    }}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: stage latency histograms, queue depth and in-flight generations per model, cache hit rates
+    """
+    body, content_type = telemetry.render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/runway-credits")
-def get_runway_credits():
+def get_runway_credits(runway=Depends(get_runway_service)):
     """
     Get remaining RunwayML API credits
     """
     try:
-        credits = runway_service.get_credits()
+        credits = runway.get_credits()
         return credits
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
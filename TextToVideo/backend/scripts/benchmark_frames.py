@@ -0,0 +1,74 @@
+"""
+Compare the throughput of per-frame, batched and keyframed local frame generation:
+
+    python scripts/benchmark_frames.py --frames 16 --batch-size 4 --keyframe-interval 4
+
+This is for manual benchmarking on the real model; tests/test_video_generator.py
+checks the batching and keyframing with a fake one.
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.video_generator import VideoGenerator, warm_up_models
+
+def generate_frames_loop(generator: VideoGenerator, prompt: str, num_frames: int):
+    # The original per-frame loop: tokenize and generate one frame at a time
+    frames = []
+    for _ in range(num_frames):
+        inputs = generator.processor(prompt, return_tensors="pt").to(generator.device)
+        with torch.no_grad():
+            output = generator.model.generate(**inputs)
+        frames.append(output.images[0].numpy())
+    return frames
+
+def measure(name: str, func, num_frames: int):
+    start = time.perf_counter()
+    frames = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {len(frames):>5} frames  {elapsed:8.2f}s  {num_frames / elapsed:8.3f} frames/sec")
+    return elapsed
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Compare per-frame and batched frame generation throughput")
+    parser.add_argument("--prompt", default="A beautiful sunset over the ocean with waves crashing on the shore")
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--keyframe-interval", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-loop", action="store_true", help="Skip the slow per-frame baseline")
+    args = parser.parse_args()
+    
+    generator = VideoGenerator()
+    # The model loads lazily; load it before timing so the first run doesn't include it
+    start = time.perf_counter()
+    warm_up_models()
+    print(f"Model loaded in {time.perf_counter() - start:.2f}s")
+    print(f"Device: {generator.device}, frames: {args.frames}\n")
+    
+    baseline = None
+    if not args.skip_loop:
+        baseline = measure("per-frame loop", lambda: generate_frames_loop(generator, args.prompt, args.frames), args.frames)
+    
+    batched = measure(
+        f"batched (batch={args.batch_size})",
+        lambda: generator.generate_frames(args.prompt, args.frames, batch_size=args.batch_size, seed=args.seed),
+        args.frames
+    )
+    keyframed = measure(
+        f"keyframes every {args.keyframe_interval}",
+        lambda: generator.generate_frames(args.prompt, args.frames, batch_size=args.batch_size,
+                                          seed=args.seed, keyframe_interval=args.keyframe_interval),
+        args.frames
+    )
+    
+    if baseline:
+        print(f"\nSpeedup vs loop: batched {baseline / batched:.2f}x, keyframed {baseline / keyframed:.2f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,125 @@
+"""
+Startup budget check for the API.
+
+Two measurements, each the median of --runs fresh processes:
+
+- ``import main`` under ``python -X importtime``: the total must stay under
+  --import-budget, and none of the heavy SDKs (torch, OpenCV, the Azure and
+  Runway clients, ...) may be imported, since main.py builds its services on
+  first use. The slowest imports are listed so a regression is easy to trace.
+- time to first request: uvicorn is started on main:app and /health is polled
+  until it answers, which must happen within --ttfr-budget.
+
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --runs 5 --import-budget 0.8 --ttfr-budget 2
+
+The exit status is 1 when a budget is exceeded or a heavy module is imported.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Seconds; see "Startup budget" in the README
+IMPORT_BUDGET = 1.0
+TTFR_BUDGET = 2.5
+
+# Must not be loaded by "import main"; the services that need them import them on first use
+HEAVY_MODULES = (
+    "torch", "transformers", "moviepy", "langchain", "cv2", "numpy",
+    "azure.storage.blob", "azure.cognitiveservices", "msrest", "runwayml"
+)
+
+
+def import_profile() -> Tuple[float, Dict[str, float]]:
+    """Total and per-module cumulative import time (seconds) of a fresh ``import main``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import main failed:\n{result.stderr}")
+    modules: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules.get("main", 0.0), modules
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn until /health answers."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"uvicorn exited with {process.returncode}:\n{process.stderr.read().decode()}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise SystemExit(f"/health did not answer within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API's import time and time to first request")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement (median is used)")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="Seconds for import main")
+    parser.add_argument("--ttfr-budget", type=float, default=TTFR_BUDGET,
+                        help="Seconds from process start to the first /health response")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--skip-ttfr", action="store_true", help="Only profile imports")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_seconds = statistics.median(total for total, _ in profiles)
+    modules = profiles[-1][1]
+    print(f"import main: {import_seconds:.3f}s (budget {args.import_budget:.2f}s)")
+    for name, seconds in sorted(modules.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    if import_seconds > args.import_budget:
+        failures.append(f"import main took {import_seconds:.3f}s")
+    heavy = [module for module in HEAVY_MODULES if module in modules]
+    if heavy:
+        failures.append("import main loads " + ", ".join(heavy))
+
+    if not args.skip_ttfr:
+        ttfr = statistics.median(time_to_first_request() for _ in range(args.runs))
+        print(f"time to first request: {ttfr:.3f}s (budget {args.ttfr_budget:.2f}s)")
+        if ttfr > args.ttfr_budget:
+            failures.append(f"first request took {ttfr:.3f}s")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
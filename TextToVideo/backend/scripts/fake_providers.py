@@ -0,0 +1,154 @@
+"""
+Fake Runway REST and Pika Labs servers for local testing of the generation providers.
+
+Both APIs are served from one port:
+
+    python scripts/fake_providers.py --port 8100 --latency 2 --tail-rate 0.1 --tail-latency 20
+
+then point the backend at it:
+
+    RUNWAY_API_BASE_URL="http://localhost:8100"
+    RUNWAYML_BASE_URL="http://localhost:8100"  # the runwayml SDK
+    PIKALABS_API_BASE_URL="http://localhost:8100"
+
+Each task takes ``--latency`` seconds (with some jitter); a fraction
+``--tail-rate`` of tasks takes ``--tail-latency`` instead, which is what the
+hedged dispatch mode is meant to hide. ``--failure-rate`` makes tasks fail.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from aiohttp import web
+
+# Smallest payload that is served as the "video" of every finished task
+FAKE_VIDEO = b"\x00\x00\x00\x18ftypmp42"
+
+# Models reported by the fake /v1/organization (what RunwayService.get_credits reads)
+RUNWAY_MODELS = ("gen4_turbo", "upscale_v1", "gen3a_turbo", "gen4_image")
+
+
+class FakeProviders:
+    def __init__(self, latency: float, jitter: float, tail_rate: float, tail_latency: float,
+                 failure_rate: float, max_concurrent: int = 100, video: bytes = FAKE_VIDEO):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.failure_rate = failure_rate
+        self.max_concurrent = max_concurrent
+        self.video = video
+        self.tasks = {}
+
+    def _create(self, request: web.Request, kind: str) -> dict:
+        if random.random() < self.tail_rate:
+            delay = self.tail_latency
+        else:
+            delay = max(0.0, random.gauss(self.latency, self.jitter))
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {
+            "kind": kind,
+            "ready_at": time.monotonic() + delay,
+            "fails": random.random() < self.failure_rate,
+            "output": f"{request.scheme}://{request.host}/files/{task_id}.{'png' if kind == 'image' else 'mp4'}"
+        }
+        return {"id": task_id}
+
+    def _task(self, request: web.Request) -> dict:
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None:
+            raise web.HTTPNotFound()
+        return task
+
+    # Runway REST API
+
+    async def runway_text_to_image(self, request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response(self._create(request, "image"))
+
+    async def runway_image_to_video(self, request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response(self._create(request, "video"))
+
+    async def runway_task(self, request: web.Request) -> web.Response:
+        task = self._task(request)
+        task_id = request.match_info["task_id"]
+        if time.monotonic() < task["ready_at"]:
+            return web.json_response({"id": task_id, "status": "RUNNING"})
+        if task["fails"]:
+            return web.json_response({"id": task_id, "status": "FAILED", "failure": "Fake failure"})
+        return web.json_response({"id": task_id, "status": "SUCCEEDED", "output": [task["output"]]})
+
+    async def runway_delete_task(self, request: web.Request) -> web.Response:
+        self._task(request)
+        del self.tasks[request.match_info["task_id"]]
+        return web.Response(status=204)
+
+    async def runway_organization(self, request: web.Request) -> web.Response:
+        limits = {"maxConcurrentGenerations": self.max_concurrent, "maxDailyGenerations": 1000000}
+        return web.json_response({
+            "creditBalance": 1000000,
+            "tier": {
+                "maxMonthlyCreditSpend": 1000000,
+                "models": {model: limits for model in RUNWAY_MODELS}
+            },
+            "usage": {"models": {model: {"dailyGenerations": 0} for model in RUNWAY_MODELS}}
+        })
+
+    # Pika Labs API (submit-only: the POST answers once the video is ready)
+
+    async def pika_generate(self, request: web.Request) -> web.Response:
+        await request.json()
+        task_id = self._create(request, "video")["id"]
+        task = self.tasks.pop(task_id)
+        await asyncio.sleep(max(0.0, task["ready_at"] - time.monotonic()))
+        if task["fails"]:
+            return web.json_response({"error": "Fake failure"}, status=500)
+        return web.json_response({"id": task_id, "status": "completed", "video_url": task["output"]})
+
+    async def file(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.video, content_type="video/mp4")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post("/v1/text_to_image", self.runway_text_to_image),
+            web.post("/v1/image_to_video", self.runway_image_to_video),
+            web.get("/v1/tasks/{task_id}", self.runway_task),
+            web.delete("/v1/tasks/{task_id}", self.runway_delete_task),
+            web.get("/v1/organization", self.runway_organization),
+            web.post("/v1/generate", self.pika_generate),
+            web.get("/files/{name}", self.file)
+        ])
+        return app
+
+
+def read_video(path: str = None) -> bytes:
+    if not path:
+        return FAKE_VIDEO
+    with open(path, "rb") as video_file:
+        return video_file.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Runway REST and Pika Labs APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=2.0, help="Typical seconds per task")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="Fraction of slow tasks")
+    parser.add_argument("--tail-latency", type=float, default=30.0, help="Seconds per slow task")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent", type=int, default=100, help="Runway concurrency limit per model")
+    parser.add_argument("--video", help="Serve this file as every generated video")
+    args = parser.parse_args()
+
+    fake = FakeProviders(args.latency, args.jitter, args.tail_rate, args.tail_latency, args.failure_rate,
+                         args.max_concurrent, read_video(args.video))
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
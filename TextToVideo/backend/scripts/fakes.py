@@ -0,0 +1,310 @@
+"""
+Offline stand-ins for the services the backend calls, used by scripts/load_test.py.
+
+- ``FakeProviders`` (scripts/fake_providers.py): Runway (SDK and REST) and Pika Labs
+- ``FakeVision``: the Computer Vision "analyze" endpoint
+- ``InMemoryBlobServiceClient``: the part of the async Azure Blob client that
+  StorageService uses, kept in memory (or use Azurite instead)
+
+Serve the fake Runway, Pika and Vision APIs on one port:
+
+    python scripts/fakes.py --port 8100 --runway-latency 2 --vision-latency 0.3
+
+then point the backend at it:
+
+    RUNWAYML_BASE_URL="http://localhost:8100"
+    RUNWAY_API_BASE_URL="http://localhost:8100"
+    PIKALABS_API_BASE_URL="http://localhost:8100"
+    AZURE_VISION_ENDPOINT="http://localhost:8100"
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+)
+
+from fake_providers import FakeProviders, read_video
+
+# Azurite's well-known development account; the in-memory store signs SAS tokens with it too
+AZURITE_ACCOUNT = "devstoreaccount1"
+AZURITE_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+AZURITE_CONNECTION_STRING = (
+    f"DefaultEndpointsProtocol=http;AccountName={AZURITE_ACCOUNT};AccountKey={AZURITE_KEY};"
+    f"BlobEndpoint=http://127.0.0.1:10000/{AZURITE_ACCOUNT};"
+)
+
+# Azure's default download chunk size (max_chunk_get_size)
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class FakeVision:
+    """Computer Vision v3.2 ``/analyze`` with a configurable latency and failure rate."""
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, failure_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    async def analyze(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.calls += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if random.random() < self.failure_rate:
+            return web.json_response(
+                {"error": {"code": "InternalServerError", "message": "Fake failure"}}, status=500)
+        return web.json_response({
+            "categories": [{"name": "outdoor_", "score": 0.9}],
+            "tags": [{"name": "sky", "confidence": 0.99}, {"name": "ocean", "confidence": 0.95}],
+            "description": {
+                "tags": ["sky", "ocean"],
+                "captions": [{"text": "a sunset over the ocean", "confidence": 0.8}]
+            },
+            "requestId": str(uuid.uuid4()),
+            "metadata": {"width": 1280, "height": 720, "format": "Png"},
+            "modelVersion": "2021-05-01"
+        })
+
+    def routes(self) -> List[web.RouteDef]:
+        return [web.post("/vision/v3.2/analyze", self.analyze)]
+
+
+class _StoredBlob:
+    def __init__(self, data: bytes, content_settings: Any, metadata: Optional[Dict[str, str]]):
+        self.data = data
+        self.content_settings = content_settings or SimpleNamespace(content_type=None)
+        self.metadata = dict(metadata or {})
+        self.etag = f'"{uuid.uuid4().hex}"'
+        self.last_modified = datetime.now(timezone.utc)
+
+    def properties(self, name: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            name=name,
+            size=len(self.data),
+            etag=self.etag,
+            last_modified=self.last_modified,
+            metadata=dict(self.metadata),
+            content_settings=self.content_settings,
+            copy=SimpleNamespace(status="success")
+        )
+
+
+class _Items:
+    def __init__(self, items: List[Any]):
+        self._items = items
+
+    async def __aiter__(self):
+        for item in self._items:
+            yield item
+
+
+class _Pages:
+    def __init__(self, client: "InMemoryBlobServiceClient", blobs: Dict[str, _StoredBlob],
+                 prefix: Optional[str], page_size: Optional[int], continuation_token: Optional[str]):
+        self._client = client
+        self._names = sorted(name for name in blobs if not prefix or name.startswith(prefix))
+        self._blobs = blobs
+        self._page_size = page_size or 5000
+        self._offset = int(continuation_token or 0)
+        self._done = False
+        self.continuation_token = continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _Items:
+        if self._done:
+            raise StopAsyncIteration
+        await self._client._delay()
+        names = self._names[self._offset:self._offset + self._page_size]
+        self._offset += self._page_size
+        self.continuation_token = str(self._offset) if self._offset < len(self._names) else None
+        self._done = self.continuation_token is None
+        return _Items([self._blobs[name].properties(name) for name in names if name in self._blobs])
+
+
+class _BlobList:
+    def __init__(self, client: "InMemoryBlobServiceClient", blobs: Dict[str, _StoredBlob],
+                 prefix: Optional[str], page_size: Optional[int]):
+        self._args = (client, blobs, prefix, page_size)
+
+    def by_page(self, continuation_token: Optional[str] = None) -> _Pages:
+        return _Pages(*self._args, continuation_token)
+
+
+class _BlobClient:
+    def __init__(self, client: "InMemoryBlobServiceClient", container: str, name: str):
+        self._client = client
+        self._blobs = client._containers.setdefault(container, {})
+        self._key = (container, name)
+        self.blob_name = name
+        self.url = f"{client.url}/{container}/{name}"
+
+    def _get(self) -> _StoredBlob:
+        blob = self._blobs.get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError("The specified blob does not exist.")
+        return blob
+
+    def _put(self, data: bytes, content_settings: Any, metadata: Optional[Dict[str, str]], overwrite: bool):
+        if not overwrite and self.blob_name in self._blobs:
+            raise ResourceExistsError("The specified blob already exists.")
+        self._blobs[self.blob_name] = _StoredBlob(data, content_settings, metadata)
+
+    async def upload_blob(self, data: Any, overwrite: bool = False, content_settings: Any = None,
+                          metadata: Optional[Dict[str, str]] = None, **kwargs):
+        await self._client._delay()
+        if hasattr(data, "read"):
+            data = data.read()
+        self._put(bytes(data), content_settings, metadata, overwrite)
+
+    async def stage_block(self, block_id: str, data: bytes, **kwargs):
+        await self._client._delay()
+        self._client._staged.setdefault(self._key, {})[block_id] = bytes(data)
+
+    async def commit_block_list(self, block_ids: List[str], content_settings: Any = None,
+                                metadata: Optional[Dict[str, str]] = None, **kwargs):
+        await self._client._delay()
+        staged = self._client._staged.pop(self._key, {})
+        missing = [block_id for block_id in block_ids if block_id not in staged]
+        if missing:
+            raise HttpResponseError(f"The specified block list is invalid ({len(missing)} blocks not staged).")
+        self._put(b"".join(staged[block_id] for block_id in block_ids), content_settings, metadata, True)
+
+    async def upload_blob_from_url(self, source_url: str, overwrite: bool = False,
+                                   content_settings: Any = None, **kwargs):
+        self._put(await self._client._fetch(source_url), content_settings, None, overwrite)
+
+    async def start_copy_from_url(self, source_url: str, metadata: Optional[Dict[str, str]] = None, **kwargs):
+        self._put(await self._client._fetch(source_url), None, metadata, True)
+        return {"copy_status": "success", "copy_id": str(uuid.uuid4())}
+
+    async def abort_copy(self, copy_id: str, **kwargs):
+        pass
+
+    async def set_blob_metadata(self, metadata: Dict[str, str], etag: Optional[str] = None,
+                                match_condition: Optional[MatchConditions] = None, **kwargs):
+        await self._client._delay()
+        blob = self._get()
+        if match_condition == MatchConditions.IfNotModified and etag != blob.etag:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        blob.metadata = dict(metadata)
+        blob.etag = f'"{uuid.uuid4().hex}"'
+
+    async def get_blob_properties(self, **kwargs) -> SimpleNamespace:
+        await self._client._delay()
+        return self._get().properties(self.blob_name)
+
+    async def exists(self, **kwargs) -> bool:
+        await self._client._delay()
+        return self.blob_name in self._blobs
+
+    async def delete_blob(self, **kwargs):
+        await self._client._delay()
+        self._get()
+        del self._blobs[self.blob_name]
+
+    async def download_blob(self, **kwargs) -> SimpleNamespace:
+        await self._client._delay()
+        data = self._get().data
+
+        async def readall() -> bytes:
+            return data
+
+        def chunks() -> _Items:
+            return _Items([data[start:start + DOWNLOAD_CHUNK_SIZE]
+                           for start in range(0, len(data), DOWNLOAD_CHUNK_SIZE)])
+        return SimpleNamespace(readall=readall, chunks=chunks)
+
+
+class _ContainerClient:
+    def __init__(self, client: "InMemoryBlobServiceClient", name: str):
+        self._client = client
+        self.container_name = name
+        self.url = f"{client.url}/{name}"
+
+    def get_blob_client(self, blob: str) -> _BlobClient:
+        return _BlobClient(self._client, self.container_name, blob)
+
+    def list_blobs(self, name_starts_with: Optional[str] = None,
+                   results_per_page: Optional[int] = None, **kwargs) -> _BlobList:
+        blobs = self._client._containers.setdefault(self.container_name, {})
+        return _BlobList(self._client, blobs, name_starts_with, results_per_page)
+
+
+class InMemoryBlobServiceClient:
+    """
+    Stands in for ``azure.storage.blob.aio.BlobServiceClient`` in StorageService.
+
+    Blobs live in a dict, containers are created on first use and every call
+    waits ``latency`` seconds to stand in for a round trip to the service.
+    Blobs copied from a URL are downloaded over HTTP, as Azure would.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.account_name = AZURITE_ACCOUNT
+        self.credential = SimpleNamespace(account_name=AZURITE_ACCOUNT, account_key=AZURITE_KEY)
+        self.url = f"http://127.0.0.1:10000/{AZURITE_ACCOUNT}"
+        self.latency = latency
+        self._containers: Dict[str, Dict[str, _StoredBlob]] = {}
+        self._staged: Dict[tuple, Dict[str, bytes]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _fetch(self, url: str) -> bytes:
+        await self._delay()
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        async with self._session.get(url) as response:
+            if response.status >= 400:
+                raise HttpResponseError(f"Copy source returned {response.status}")
+            return await response.read()
+
+    def get_container_client(self, container: str) -> _ContainerClient:
+        return _ContainerClient(self, container)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Runway, Pika Labs and Computer Vision APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--runway-latency", type=float, default=2.0, help="Typical seconds per generation task")
+    parser.add_argument("--runway-jitter", type=float, default=0.5)
+    parser.add_argument("--runway-tail-rate", type=float, default=0.05, help="Fraction of slow tasks")
+    parser.add_argument("--runway-tail-latency", type=float, default=30.0, help="Seconds per slow task")
+    parser.add_argument("--runway-failure-rate", type=float, default=0.0)
+    parser.add_argument("--runway-max-concurrent", type=int, default=100, help="Concurrency limit per model")
+    parser.add_argument("--video", help="Serve this file as every generated video")
+    parser.add_argument("--vision-latency", type=float, default=0.3, help="Typical seconds per analysis")
+    parser.add_argument("--vision-jitter", type=float, default=0.1)
+    parser.add_argument("--vision-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    providers = FakeProviders(args.runway_latency, args.runway_jitter, args.runway_tail_rate,
+                              args.runway_tail_latency, args.runway_failure_rate, args.runway_max_concurrent,
+                              read_video(args.video))
+    vision = FakeVision(args.vision_latency, args.vision_jitter, args.vision_failure_rate)
+    app = providers.app()
+    app.add_routes(vision.routes())
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Offline load test of the API, with every external service faked (see scripts/fakes.py).
+
+The API runs in its own process under uvicorn, with the fake Runway, Pika and
+Vision servers in another and blobs kept in memory (or in Azurite with
+--azurite). N concurrent clients then drive the upload, list and generate
+endpoints, and for each scenario the throughput, p50/p99 latency and the API
+process's peak RSS are reported:
+
+    python scripts/load_test.py --clients 32 --requests 400
+    python scripts/load_test.py --json results.json
+    python scripts/load_test.py --baseline results.json --tolerance 0.2
+
+With --baseline the exit status is 1 when a scenario's throughput drops, or
+its p99 latency or peak RSS grows, by more than --tolerance.
+
+This is for manual benchmarking; tests/test_load.py runs the same scenarios
+under pytest and asserts that they succeed.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SCRIPTS_DIR = os.path.join(BACKEND_DIR, 'scripts')
+SCENARIOS = ("upload", "list", "generate")
+
+
+def serve(args):
+    """API process: build the services with the fakes and run the app under uvicorn."""
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    import main
+    from services.storage_service import StorageService
+    from fakes import AZURITE_CONNECTION_STRING, InMemoryBlobServiceClient
+
+    if args.azurite:
+        storage = StorageService(args.azurite)
+    else:
+        storage = StorageService(AZURITE_CONNECTION_STRING,
+                                 blob_service_client=InMemoryBlobServiceClient(latency=args.blob_latency))
+    main.init_services(storage=storage)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Current resident set size of a process, or None where it can't be read."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+def sample_video(workdir: str) -> Optional[str]:
+    """Render a short real clip for the fake Runway to return, so thumbnails are made as in production."""
+    if not shutil.which("ffmpeg"):
+        return None
+    path = os.path.join(workdir, "sample.mp4")
+    result = subprocess.run([
+        "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=duration=5:size=1280x720:rate=24",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-movflags", "+faststart", path
+    ], capture_output=True)
+    return path if result.returncode == 0 else None
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Scenario:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.peak_rss: Optional[int] = None
+
+    def summary(self) -> Dict[str, float]:
+        completed = len(self.latencies)
+        return {
+            "requests": completed + self.errors,
+            "errors": self.errors,
+            "throughput": round(completed / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "peak_rss_mb": round(self.peak_rss / 1024 ** 2, 1) if self.peak_rss else None
+        }
+
+
+async def sample_rss(pid: int, scenario: Scenario, interval: float = 0.05):
+    while True:
+        rss = rss_bytes(pid)
+        if rss is not None:
+            scenario.peak_rss = max(scenario.peak_rss or 0, rss)
+        await asyncio.sleep(interval)
+
+
+async def run_scenario(name: str, pid: int, clients: int, total: int,
+                       request: Callable[[int], Awaitable[None]]) -> Scenario:
+    """Send ``total`` requests from ``clients`` concurrent clients; a request fails by raising."""
+    scenario = Scenario(name)
+    counter = itertools.count()
+
+    async def client():
+        while (index := next(counter)) < total:
+            started = time.perf_counter()
+            try:
+                await request(index)
+            except Exception:
+                scenario.errors += 1
+            else:
+                scenario.latencies.append(time.perf_counter() - started)
+
+    sampler = asyncio.ensure_future(sample_rss(pid, scenario))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(client() for _ in range(clients)))
+    finally:
+        scenario.elapsed = time.perf_counter() - started
+        sampler.cancel()
+    return scenario
+
+
+async def wait_until_ready(http: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"API process exited with code {process.returncode}")
+        try:
+            if (await http.get("/providers")).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"API did not start within {timeout:.0f}s")
+
+
+async def drive(args, base_url: str, pid: int, process: subprocess.Popen) -> Dict[str, Dict[str, float]]:
+    run_id = uuid.uuid4().hex[:8]
+    payload = os.urandom(args.upload_size)
+    submit_latencies: List[float] = []
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        startup = await wait_until_ready(http, process)
+        print(f"API ready in {startup:.2f}s (pid {pid}, RSS {(rss_bytes(pid) or 0) / 1024 ** 2:.1f} MB)\n")
+
+        async def upload(index: int):
+            # A distinct prefix per request, so every upload is new content for the Vision cache
+            content = f"{run_id}-{index}".encode() + payload
+            response = await http.post("/upload", files={"file": (f"load-{index}.png", content, "image/png")})
+            response.raise_for_status()
+
+        async def list_files(index: int):
+            response = await http.get("/files", params={"limit": args.page_size})
+            response.raise_for_status()
+
+        async def generate(index: int):
+            started = time.perf_counter()
+            response = await http.post("/generate-video", params={
+                "prompt": f"Load test {run_id} scene {index}", "duration": 5
+            })
+            response.raise_for_status()
+            submit_latencies.append(time.perf_counter() - started)
+            job_id = response.json()["job_id"]
+            while True:
+                await asyncio.sleep(args.poll_interval)
+                job = (await http.get(f"/video-status/{job_id}")).json()
+                if job["status"] == "completed":
+                    return
+                if job["status"] == "failed":
+                    raise RuntimeError(job.get("error"))
+
+        requests = {"upload": upload, "list": list_files, "generate": generate}
+        results = {}
+        for name in args.scenarios:
+            total = args.generate_requests if name == "generate" else args.requests
+            clients = min(args.clients, args.generate_clients) if name == "generate" else args.clients
+            scenario = await run_scenario(name, pid, clients, total, requests[name])
+            results[name] = scenario.summary()
+            if name == "generate":
+                # Jobs run in the background, so the POST itself and the whole job are reported apart
+                results["generate (submit)"] = {
+                    **results[name],
+                    "p50_ms": round(percentile(submit_latencies, 50) * 1000, 1),
+                    "p99_ms": round(percentile(submit_latencies, 99) * 1000, 1)
+                }
+        return results
+
+
+def print_table(results: Dict[str, Dict[str, float]]):
+    print(f"{'scenario':<20} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS':>10}")
+    for name, result in results.items():
+        rss = f"{result['peak_rss_mb']:.1f} MB" if result["peak_rss_mb"] else "n/a"
+        print(f"{name:<20} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>9.2f} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {rss:>10}")
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                tolerance: float) -> List[str]:
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {result['throughput']} req/s, baseline {base['throughput']}")
+        if result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p99 {result['p99_ms']} ms, baseline {base['p99_ms']}")
+        if result["peak_rss_mb"] and base.get("peak_rss_mb") and \
+                result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{name}: peak RSS {result['peak_rss_mb']} MB, baseline {base['peak_rss_mb']}")
+    return problems
+
+
+def run(args) -> int:
+    fakes_port, api_port = free_port(), free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    workdir = tempfile.mkdtemp(prefix="ttv-load-")
+    from fakes import AZURITE_CONNECTION_STRING
+
+    command = [
+        sys.executable, os.path.join(SCRIPTS_DIR, "fakes.py"), "--port", str(fakes_port),
+        "--runway-latency", str(args.runway_latency), "--runway-jitter", str(args.runway_latency / 4),
+        "--runway-tail-rate", "0", "--runway-failure-rate", str(args.failure_rate),
+        "--vision-latency", str(args.vision_latency), "--vision-failure-rate", str(args.failure_rate)
+    ]
+    video = sample_video(workdir)
+    if video:
+        command += ["--video", video]
+    else:
+        print("ffmpeg not found: the fake videos are not playable and thumbnails will fail")
+    fakes = subprocess.Popen(command)
+    env = dict(
+        os.environ,
+        RUNWAYML_API_SECRET="fake",
+        RUNWAYML_BASE_URL=fakes_url,
+        RUNWAY_API_BASE_URL=fakes_url,
+        PIKALABS_API_KEY="fake",
+        PIKALABS_API_BASE_URL=fakes_url,
+        AZURE_VISION_KEY="fake",
+        AZURE_VISION_ENDPOINT=fakes_url,
+        AZURE_STORAGE_CONNECTION_STRING=args.azurite or AZURITE_CONNECTION_STRING,
+        JOB_STORE_PATH=os.path.join(workdir, "jobs.db"),
+        OUTPUT_DIR=workdir,
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING")
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(api_port),
+               "--blob-latency", str(args.blob_latency)]
+    if args.azurite:
+        command += ["--azurite", args.azurite]
+    api = subprocess.Popen(command, env=env, cwd=workdir)
+    try:
+        results = asyncio.run(drive(args, f"http://127.0.0.1:{api_port}", api.pid, api))
+    finally:
+        for process in (api, fakes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+                       "scenarios": results}, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["scenarios"]
+        problems = regressions(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against fake Runway, Vision and blob backends")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=400, help="Requests per upload/list scenario")
+    parser.add_argument("--generate-requests", type=int, default=32, help="Jobs in the generate scenario")
+    parser.add_argument("--generate-clients", type=int, default=16)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help="Comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--upload-size", type=int, default=256 * 1024, help="Bytes per uploaded file")
+    parser.add_argument("--page-size", type=int, default=100, help="limit of each /files request")
+    parser.add_argument("--runway-latency", type=float, default=0.5, help="Seconds per fake Runway task")
+    parser.add_argument("--vision-latency", type=float, default=0.2, help="Seconds per fake Vision call")
+    parser.add_argument("--blob-latency", type=float, default=0.002, help="Seconds per in-memory blob call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of fake Runway/Vision calls that fail")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="Seconds between /video-status polls")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout")
+    parser.add_argument("--azurite", metavar="CONNECTION_STRING", help="Use Azurite instead of the in-memory store")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.serve:
+        serve(args)
+    else:
+        sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
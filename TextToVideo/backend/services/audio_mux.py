@@ -0,0 +1,174 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from services.media_probe import probe_video
+from services.prompt_cache import PromptCache
+from services.telemetry import timed
+
+
+def _mux_command(video: str, audio: str, output_path: str, duration: Optional[float],
+                 ffmpeg_binary: str, audio_codec: str, audio_bitrate: str) -> List[str]:
+    """
+    ffmpeg arguments that copy the video stream as is and loop or trim the audio to fit.
+
+    Only the audio is encoded, so the cost depends on the audio length, not
+    on the video's resolution or frame count.
+    """
+    command = [
+        ffmpeg_binary, '-v', 'error', '-y',
+        '-i', video,
+        # Repeat the audio for as long as needed; it is cut to the video's length below
+        '-stream_loop', '-1', '-i', audio,
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c:v', 'copy',
+        '-c:a', audio_codec, '-b:a', audio_bitrate
+    ]
+    if duration:
+        command += ['-t', f"{duration:.3f}"]
+    else:
+        command += ['-shortest']
+    command += ['-movflags', '+faststart', output_path]
+    return command
+
+
+def _video_duration(video: str) -> Optional[float]:
+    try:
+        return probe_video(video).get('duration') or None
+    except Exception:
+        return None
+
+
+def mux_audio(video: str, audio: str, output_path: str, ffmpeg_binary: str = 'ffmpeg',
+              audio_codec: str = 'aac', audio_bitrate: str = '128k') -> str:
+    """Attach ``audio`` to ``video`` (a path or URL) without re-encoding the video; returns ``output_path``."""
+    command = _mux_command(video, audio, output_path, _video_duration(video),
+                           ffmpeg_binary, audio_codec, audio_bitrate)
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"Error adding audio: {result.stderr.decode(errors='replace')[-500:]}")
+    return output_path
+
+
+class AudioMuxer:
+    """
+    Runs audio muxes as ffmpeg subprocesses, at most ``max_workers`` at a time.
+
+    The processes run outside the event loop and the limit keeps a burst of
+    requests from starting more ffmpeg processes than the host has cores.
+    """
+
+    def __init__(self, max_workers: int = 2, output_dir: str = 'output', ffmpeg_binary: str = 'ffmpeg',
+                 audio_codec: str = 'aac', audio_bitrate: str = '128k'):
+        self.max_workers = max_workers
+        self.output_dir = output_dir
+        self.ffmpeg_binary = ffmpeg_binary
+        self.audio_codec = audio_codec
+        self.audio_bitrate = audio_bitrate
+        self._slots = asyncio.Semaphore(max_workers)
+
+    @timed("audio_mux")
+    async def mux(self, video: str, audio: str, output_path: Optional[str] = None) -> str:
+        """Attach ``audio`` to ``video`` (a path or URL) and return the path of the new file."""
+        if not shutil.which(self.ffmpeg_binary):
+            raise Exception(f"{self.ffmpeg_binary} not found")
+        if output_path is None:
+            output_path = os.path.join(self.output_dir, f"final_{uuid.uuid4().hex}.mp4")
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        async with self._slots:
+            duration = await asyncio.to_thread(_video_duration, video)
+            process = await asyncio.create_subprocess_exec(
+                *_mux_command(video, audio, output_path, duration,
+                              self.ffmpeg_binary, self.audio_codec, self.audio_bitrate),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+            _, errors = await process.communicate()
+        if process.returncode != 0:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise Exception(f"Error adding audio: {errors.decode(errors='replace')[-500:]}")
+        return output_path
+
+
+class AudioLibrary:
+    """
+    Background tracks from the ``media`` container, cached on local disk.
+
+    A track is streamed to disk on first use and kept until the cache holds
+    more than ``max_bytes``; concurrent requests for the same track share one
+    download. ``use`` pins a track while it is read: a pinned track that gets
+    evicted keeps its file until the last reader is done with it.
+    """
+
+    def __init__(self, storage_service: Any, cache_dir: str = 'output/audio-cache',
+                 container_type: str = 'media', max_entries: int = 256,
+                 max_bytes: int = 1024 ** 3):
+        self.storage_service = storage_service
+        self.cache_dir = cache_dir
+        self.container_type = container_type
+        self.cache = PromptCache(max_entries=max_entries, max_bytes=max_bytes, max_age=float("inf"),
+                                 on_evict=self._remove)
+        self._pins: Dict[str, int] = {}
+        # Evicted while pinned; their files are deleted when the last pin is released
+        self._evicted: Set[str] = set()
+
+    @staticmethod
+    def _delete(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove(self, key: str, value: dict):
+        if self._pins.get(key):
+            self._evicted.add(key)
+        else:
+            self._delete(value["path"])
+
+    def _local_path(self, track: str) -> str:
+        return os.path.join(self.cache_dir, track.replace('/', '_'))
+
+    @asynccontextmanager
+    async def use(self, track: str) -> AsyncIterator[str]:
+        """Yield the local path of a track, downloading it if needed; the file stays until the block exits."""
+        self._pins[track] = self._pins.get(track, 0) + 1
+        try:
+            yield await self._get(track)
+        finally:
+            self._pins[track] -= 1
+            if not self._pins[track]:
+                del self._pins[track]
+                if track in self._evicted:
+                    self._evicted.discard(track)
+                    self._delete(self._local_path(track))
+
+    async def _get(self, track: str) -> str:
+        async def download():
+            path = self._local_path(track)
+            # An evicted track still in use keeps its file, which the new entry takes over
+            self._evicted.discard(track)
+            if not await asyncio.to_thread(os.path.exists, path):
+                await asyncio.to_thread(os.makedirs, self.cache_dir, exist_ok=True)
+                partial = f"{path}.{uuid.uuid4().hex}.part"
+                try:
+                    await self.storage_service.download_to_file(track, partial, self.container_type)
+                except BaseException:
+                    self._delete(partial)
+                    raise
+                # Rename last so a crash never leaves a truncated track behind
+                os.replace(partial, path)
+            return {"path": path}
+
+        entry = await self.cache.get_or_create(
+            track, download, size_of=lambda value: os.path.getsize(value["path"]))
+        if not os.path.exists(entry["path"]):
+            # Removed from disk behind our back; fetch it again
+            self.cache.invalidate(track)
+            entry = await self.cache.get_or_create(
+                track, download, size_of=lambda value: os.path.getsize(value["path"]))
+        return entry["path"]
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.video_scoring import QualityScorer, score_video
+
+logger = logging.getLogger(__name__)
+
+
+# Called with a snapshot of every candidate whenever one of them changes
+CandidatesCallback = Callable[[List[Dict[str, Any]]], None]
+
+
+async def generate_candidates(
+        generate: Callable[..., Awaitable[Dict[str, Any]]],
+        num_candidates: int,
+        quality_threshold: Optional[float] = None,
+        criteria: Optional[Dict] = None,
+        scorer: Optional[QualityScorer] = None,
+        on_update: Optional[CandidatesCallback] = None,
+        seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate ``num_candidates`` videos concurrently and select the best one.
+
+    ``generate(seed=..., on_progress=...)`` runs one generation; every
+    candidate gets its own seed so they differ. Each finished candidate is
+    scored right away (from its URL, with ``score_video``) instead of after
+    all of them are done. With ``quality_threshold`` the first candidate
+    scoring at least that much is returned and the others are cancelled,
+    which also deletes their upstream tasks where the provider supports it.
+    Concurrency is still bounded by the provider (the Runway scheduler, the
+    local worker pool).
+
+    Returns the selected candidate's result plus ``candidates`` (the status
+    of each one) and ``selected_candidate``.
+    """
+    base_seed = seed if seed is not None else random.randrange(2 ** 31)
+    candidates = [
+        {"index": index, "status": "queued", "seed": (base_seed + index) % 2 ** 31}
+        for index in range(num_candidates)
+    ]
+    results: Dict[int, Dict[str, Any]] = {}
+
+    def update(index: int, **fields: Any):
+        candidates[index].update(fields)
+        if on_update:
+            on_update([dict(candidate) for candidate in candidates])
+
+    async def run(index: int) -> Optional[float]:
+        update(index, status="running")
+        result = await generate(
+            seed=candidates[index]["seed"],
+            on_progress=lambda progress: update(index, progress=progress.get("progress"))
+        )
+        results[index] = result
+        update(index, status="scoring", video_url=result["video_url"], provider=result.get("provider"))
+        try:
+            scored = await asyncio.to_thread(score_video, result["video_url"], criteria, scorer)
+            score = scored["score"]
+            update(index, status="completed", score=score)
+        except Exception as e:
+            # An unscorable video is still a valid result, just the least preferred one
+            score = 0.0
+            update(index, status="completed", score=score, score_error=str(e))
+        return score
+
+    tasks = {asyncio.ensure_future(run(index)): index for index in range(num_candidates)}
+    best_index: Optional[int] = None
+    best_score = -1.0
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = tasks[task]
+                if task.exception() is not None:
+                    update(index, status="failed", error=str(task.exception()))
+                    continue
+                score = task.result()
+                if score > best_score:
+                    best_index, best_score = index, score
+            if quality_threshold is not None and best_score >= quality_threshold:
+                break
+    finally:
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+            update(tasks[task], status="cancelled")
+        # Let the cancellations finish (and delete their upstream tasks) before returning
+        await asyncio.gather(*losers, return_exceptions=True)
+
+    if best_index is None:
+        errors = "; ".join(c.get("error", "") for c in candidates if c["status"] == "failed")
+        raise Exception(f"Error generating candidates: all {num_candidates} failed: {errors}")
+
+    logger.info("Selected candidate %d of %d with score %.3f", best_index, num_candidates, best_score)
+    return {
+        **results[best_index],
+        "score": best_score,
+        "selected_candidate": best_index,
+        "candidates": [dict(candidate) for candidate in candidates]
+    }
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from services.job_store import JobStore, TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscription:
+    def __init__(self, job_id: str, queue_size: int):
+        self.job_id = job_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, record: Dict[str, Any]):
+        if self.queue.full():
+            # Every event is a full snapshot of the job, so a slow watcher only needs the latest
+            self.queue.get_nowait()
+        self.queue.put_nowait(record)
+
+
+class JobEventBus:
+    """
+    In-process pub/sub of job state changes.
+
+    The job store calls ``publish`` after every write in this process, so
+    watchers see a change as soon as the backend makes it (e.g. when the
+    shared Runway poller sees a task progress); any number of watchers cost
+    no extra upstream calls. Jobs running in another worker process are
+    picked up by one background loop that re-reads every watched job from the
+    shared store each ``poll_interval`` seconds, however many watchers it has.
+    """
+
+    def __init__(self, job_store: JobStore, poll_interval: float = 2.0, queue_size: int = 16):
+        self.job_store = job_store
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[_Subscription]] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._last_local: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[asyncio.Task] = None
+        job_store.add_listener(self.publish)
+
+    @property
+    def watchers(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, job_id: str, record: Dict[str, Any]):
+        """Deliver a job's new state to its watchers; safe to call from any thread."""
+        if job_id not in self._subscriptions or self._loop is None:
+            return
+        if self._in_loop():
+            self._deliver(job_id, record, local=True)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, job_id, record, True)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _deliver(self, job_id: str, record: Dict[str, Any], local: bool = False):
+        if local:
+            self._last_local[job_id] = time.monotonic()
+        if record == self._last.get(job_id):
+            return
+        self._last[job_id] = record
+        for subscription in self._subscriptions.get(job_id, ()):
+            subscription.push(record)
+
+    async def events(self, job_id: str,
+                     heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the job's current state, then every change until it finishes.
+
+        With ``heartbeat`` None is yielded after that many idle seconds, so the
+        caller can keep its connection alive.
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = _Subscription(job_id, self.queue_size)
+        self._subscriptions.setdefault(job_id, set()).add(subscription)
+        self._ensure_polling()
+        try:
+            record = await self.job_store.get_async(job_id)
+            if record is None:
+                return
+            record = dict(record)
+            self._last.setdefault(job_id, record)
+            while True:
+                yield record
+                if record.get("status") in TERMINAL_STATUSES:
+                    return
+                record = None
+                while record is None:
+                    try:
+                        record = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            subscriptions = self._subscriptions.get(job_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[job_id]
+                    self._last.pop(job_id, None)
+                    self._last_local.pop(job_id, None)
+
+    def _ensure_polling(self):
+        if self._poller is None or self._poller.done():
+            self._poller = self._loop.create_task(self._poll_store())
+
+    async def _poll_store(self):
+        while self._subscriptions:
+            await asyncio.sleep(self.poll_interval)
+            now = time.monotonic()
+            for job_id in list(self._subscriptions):
+                # Jobs this process is writing to are already pushed as they change
+                if now - self._last_local.get(job_id, 0.0) < self.poll_interval:
+                    continue
+                try:
+                    record = await self.job_store.get_async(job_id)
+                except Exception as e:
+                    logger.warning("Error reading job %s for watchers: %s", job_id, e)
+                    continue
+                if record is not None:
+                    self._deliver(job_id, dict(record))
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
@@ -0,0 +1,376 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+# Called with (job_id, record) after every successful write made by this process
+JobListener = Callable[[str, Dict[str, Any]], None]
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request."""
+
+    def __init__(self, key: str, job_id: str):
+        self.key = key
+        self.job_id = job_id
+        super().__init__(f"Idempotency key already used for a different request (job {job_id})")
+
+
+class JobStore(ABC):
+    """
+    Interface for generation job state.
+
+    A job is a JSON-serializable dict that always carries a ``status`` key.
+    Implementations must make ``transition`` atomic so that several worker
+    processes can race on the same job safely.
+
+    Code running on the event loop uses ``get_async``, the other ``*_async``
+    methods and ``update_soon``, so neither a read nor a write waiting for a
+    lock blocks other requests.
+    """
+
+    def __init__(self):
+        self._listeners: List[JobListener] = []
+
+    def add_listener(self, listener: JobListener):
+        """Call ``listener(job_id, record)`` after every write made through this store."""
+        self._listeners.append(listener)
+
+    def _notify(self, job_id: str, record: Dict[str, Any]):
+        for listener in self._listeners:
+            try:
+                listener(job_id, dict(record))
+            except Exception as e:
+                logger.warning("Job listener failed for %s: %s", job_id, e)
+
+    @abstractmethod
+    def create(self, job_id: str, data: Dict[str, Any]) -> None:
+        """Store a new job; its status defaults to ``queued``."""
+
+    @abstractmethod
+    def create_if_absent(self, key: str, job_id: str, data: Dict[str, Any], window: float,
+                         fingerprint: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Create the job unless ``key`` was claimed by another one in the last ``window`` seconds.
+
+        Returns ``(job_id, created)``: the new job, or the one already holding
+        the key. A key held by a failed job is taken over. ``fingerprint``
+        identifies the request; reusing the key for a different one raises
+        ``IdempotencyConflict``. Must be atomic across worker processes.
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, or None if there is no such job."""
+
+    @abstractmethod
+    def update(self, job_id: str, data: Dict[str, Any]) -> None:
+        """Merge ``data`` into the job record."""
+
+    @abstractmethod
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str,
+                   data: Optional[Dict[str, Any]] = None) -> bool:
+        """Move a job to ``to_status`` only if it is currently in one of ``from_statuses``."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete finished jobs older than the store's TTL and return how many were removed."""
+
+    async def get_async(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def _run_write(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.to_thread(func, *args)
+
+    async def create_async(self, job_id: str, data: Dict[str, Any]) -> None:
+        await self._run_write(self.create, job_id, data)
+
+    async def create_if_absent_async(self, key: str, job_id: str, data: Dict[str, Any], window: float,
+                                     fingerprint: Optional[str] = None) -> Tuple[str, bool]:
+        return await self._run_write(self.create_if_absent, key, job_id, data, window, fingerprint)
+
+    async def update_async(self, job_id: str, data: Dict[str, Any]) -> None:
+        await self._run_write(self.update, job_id, data)
+
+    async def transition_async(self, job_id: str, from_statuses: Iterable[str], to_status: str,
+                               data: Optional[Dict[str, Any]] = None) -> bool:
+        return await self._run_write(self.transition, job_id, tuple(from_statuses), to_status, data)
+
+    def update_soon(self, job_id: str, data: Dict[str, Any]) -> None:
+        """Merge ``data`` without waiting for the write, for progress reported from sync callbacks."""
+        self.update(job_id, data)
+
+    def close(self) -> None:
+        """Finish writes queued by ``update_soon``."""
+
+
+class _LRUCache:
+    """Small thread-safe LRU of job records with a per-entry freshness window."""
+
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            # Finished jobs never change again, so they stay fresh until evicted
+            if value['status'] not in TERMINAL_STATUSES and time.monotonic() - stored_at > self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store backed by a SQLite database in WAL mode.
+
+    WAL lets any number of uvicorn workers on the same host read while one
+    writes, so all of them see the same jobs and nothing is lost on restart.
+    Reads go through an in-process LRU cache; records for unfinished jobs are
+    only trusted for ``cache_max_age`` seconds since another worker may be
+    updating them. Finished jobs are deleted ``ttl`` seconds after their last
+    update. Idempotency keys live in their own table and are claimed inside
+    the same write transaction as the job they point to.
+
+    The async write methods and ``update_soon`` hand writes to one writer
+    thread, which applies them in order. Progress written with
+    ``update_soon`` waits at most ``progress_busy_timeout`` seconds for the
+    lock and is dropped if another worker holds it longer; the next report
+    carries newer progress.
+    """
+
+    def __init__(self,
+                 path: str = 'jobs.db',
+                 ttl: float = 7 * 24 * 3600,
+                 cache_size: int = 1024,
+                 cache_max_age: float = 1.0,
+                 purge_interval: float = 300.0,
+                 busy_timeout: float = 30.0,
+                 progress_busy_timeout: float = 0.5):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.busy_timeout = busy_timeout
+        self.progress_busy_timeout = progress_busy_timeout
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._writer_lock = threading.Lock()
+        self._cache = _LRUCache(cache_size, cache_max_age)
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_keys ("
+            " key TEXT PRIMARY KEY,"
+            " job_id TEXT NOT NULL,"
+            " fingerprint TEXT,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            self.purge_expired()
+
+    def create(self, job_id: str, data: Dict[str, Any]) -> None:
+        record = {'status': 'queued', **data}
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, record['status'], json.dumps(record), now, now)
+        )
+        self._cache.put(job_id, record)
+        self._notify(job_id, record)
+        self._maybe_purge()
+
+    def create_if_absent(self, key: str, job_id: str, data: Dict[str, Any], window: float,
+                         fingerprint: Optional[str] = None) -> Tuple[str, bool]:
+        record = {'status': 'queued', **data}
+        now = time.time()
+        conn = self._connection()
+        # The write lock makes the lookup and the insert one step, even for duplicates hitting different workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = conn.execute(
+                "SELECT k.job_id, k.fingerprint FROM job_keys k JOIN jobs j ON j.id = k.job_id"
+                " WHERE k.key = ? AND k.expires_at > ? AND j.status != 'failed'",
+                (key, now)
+            ).fetchone()
+            if existing is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_keys (key, job_id, fingerprint, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, job_id, fingerprint, now + window)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, record['status'], json.dumps(record), now, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if existing is not None:
+            existing_id, existing_fingerprint = existing
+            if fingerprint is not None and existing_fingerprint is not None and existing_fingerprint != fingerprint:
+                raise IdempotencyConflict(key, existing_id)
+            return existing_id, False
+        self._cache.put(job_id, record)
+        self._notify(job_id, record)
+        self._maybe_purge()
+        return job_id, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        cached = self._cache.get(job_id)
+        if cached is not None:
+            return cached
+        row = self._connection().execute(
+            "SELECT data FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        self._cache.put(job_id, record)
+        return record
+
+    async def get_async(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Cached records are served on the loop; misses read in a thread, not on the
+        # writer thread, so a status check never queues behind a write waiting for the lock
+        cached = self._cache.get(job_id)
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(self.get, job_id)
+
+    def _write(self, job_id: str, data: Dict[str, Any], from_statuses: Optional[Iterable[str]] = None) -> bool:
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, making read-modify-write atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or (from_statuses is not None and row[0] not in from_statuses):
+                conn.execute("ROLLBACK")
+                self._cache.pop(job_id)
+                return False
+            record = {**json.loads(row[1]), **data}
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE id = ?",
+                (record['status'], json.dumps(record), time.time(), job_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._cache.put(job_id, record)
+        self._notify(job_id, record)
+        return True
+
+    def update(self, job_id: str, data: Dict[str, Any]) -> None:
+        if not self._write(job_id, data):
+            raise KeyError(f"Job not found: {job_id}")
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store-writer")
+            return self._writer
+
+    async def _run_write(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), func, *args)
+
+    def _update_progress(self, job_id: str, data: Dict[str, Any]):
+        conn = self._connection()
+        conn.execute(f"PRAGMA busy_timeout={int(self.progress_busy_timeout * 1000)}")
+        try:
+            self._write(job_id, data)
+        except sqlite3.OperationalError as e:
+            logger.debug("Dropped progress update of job %s: %s", job_id, e)
+        except Exception as e:
+            logger.warning("Progress update of job %s failed: %s", job_id, e)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+
+    def update_soon(self, job_id: str, data: Dict[str, Any]) -> None:
+        # Callers keep mutating what they report (e.g. the list of videos), so write a snapshot
+        self._executor().submit(self._update_progress, job_id, copy.deepcopy(data))
+
+    def close(self) -> None:
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str,
+                   data: Optional[Dict[str, Any]] = None) -> bool:
+        return self._write(job_id, {**(data or {}), 'status': to_status}, tuple(from_statuses))
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        cutoff = now - self.ttl
+        placeholders = ', '.join('?' for _ in TERMINAL_STATUSES)
+        self._connection().execute("DELETE FROM job_keys WHERE expires_at <= ?", (now,))
+        cursor = self._connection().execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+            (*TERMINAL_STATUSES, cutoff)
+        )
+        if cursor.rowcount:
+            self._cache.clear()
+        return cursor.rowcount
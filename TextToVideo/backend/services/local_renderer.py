@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class _RenderCancelled(Exception):
+    pass
+
+
+def _render_worker(job_queue, event_queue, current_job, cancel_job, output_dir: str, torch_threads: int):
+    """
+    Entry point of a render worker process.
+
+    Loads the model once, then renders jobs from ``job_queue`` until it
+    receives None, reporting progress and results on ``event_queue``. The ID
+    of the job being rendered is kept in the shared ``current_job`` buffer so
+    the parent can fail it if this process dies; the parent writes the same ID
+    to ``cancel_job`` to stop it, which is checked after every batch.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from services.video_generator import VideoGenerator, warm_up_models
+    generator = VideoGenerator()
+    models = warm_up_models()
+    event_queue.put(("ready", None, {"pid": os.getpid(), "models": models}))
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, params = job
+        current_job.value = job_id.encode()
+        event_queue.put(("started", job_id, {"pid": os.getpid()}))
+        path = os.path.join(output_dir, f"{job_id}.mp4")
+        try:
+            def on_frames(done: int, total: int):
+                if cancel_job.value == job_id.encode():
+                    raise _RenderCancelled()
+                # Frames are encoded as they are generated; finishing the file takes the last 10%
+                event_queue.put(("progress", job_id, {"stage": "frames", "progress": 0.9 * done / total}))
+
+            # Each batch is piped to ffmpeg as soon as it is generated instead of keeping every frame
+            generator.create_video_from_frames(
+                generator.iter_frames(
+                    params["prompt"],
+                    num_frames=params["num_frames"],
+                    batch_size=params.get("batch_size", 4),
+                    seed=params.get("seed"),
+                    keyframe_interval=params.get("keyframe_interval", 1),
+                    progress_callback=on_frames
+                ),
+                fps=params.get("fps", 8),
+                output_path=path
+            )
+            if params.get("audio_path"):
+                with_audio = generator.add_audio(path, params["audio_path"])
+                os.remove(path)
+                path = with_audio
+            event_queue.put(("done", job_id, {"path": path}))
+        except _RenderCancelled:
+            if os.path.exists(path):
+                os.remove(path)
+            event_queue.put(("cancelled", job_id, {}))
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            event_queue.put(("failed", job_id, {"error": str(e)}))
+        finally:
+            current_job.value = b""
+
+
+class LocalRenderBackend:
+    """
+    Renders videos locally on a pool of worker processes.
+
+    Each worker process holds its own loaded model and takes render jobs from
+    a shared queue, so N workers render N videos at once without blocking the
+    API's event loop. Progress and results come back on an event queue that a
+    listener thread forwards to the waiting coroutines. Finished videos are
+    uploaded to the ``videos`` container and the local file is removed.
+    Cancelling ``render()`` stops the worker after its current batch.
+    ``wait_ready()`` waits until every worker has loaded its model.
+
+    Every worker loads its own copy of the model, so the pool defaults to
+    one worker (``LOCAL_RENDER_WORKERS``) rather than one per core.
+    """
+
+    def __init__(self, storage_service: Any, workers: Optional[int] = None,
+                 output_dir: str = 'output'):
+        self.storage_service = storage_service
+        self.workers = workers or int(os.getenv("LOCAL_RENDER_WORKERS") or 1)
+        self.output_dir = output_dir
+        self._processes: List[Tuple[multiprocessing.Process, Any, Any]] = []
+        self._pending: Dict[str, tuple] = {}
+        self._cancelled: Set[str] = set()
+        self._ready: Dict[int, List[str]] = {}
+        self._ready_changed: Optional[asyncio.Event] = None
+        self._context = None
+        self._torch_threads = 1
+        self._listener: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._job_queue = None
+        self._event_queue = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._processes)
+
+    def start(self):
+        """Spawn the worker processes (must be called from the event loop thread)."""
+        if self.started:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        # spawn, not fork: forking a process that already runs an event loop and threads is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._job_queue = self._context.Queue()
+        self._event_queue = self._context.Queue()
+        self._ready_changed = asyncio.Event()
+        # Split the cores between workers so they don't oversubscribe the CPU
+        self._torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        for _ in range(self.workers):
+            self._spawn_worker()
+        self._listener = threading.Thread(target=self._listen, name='local-render-events', daemon=True)
+        self._listener.start()
+
+    def _spawn_worker(self):
+        # Large enough for a uuid4 job ID
+        current_job = self._context.Array('c', 64)
+        cancel_job = self._context.Array('c', 64)
+        process = self._context.Process(
+            target=_render_worker,
+            args=(self._job_queue, self._event_queue, current_job, cancel_job, self.output_dir,
+                  self._torch_threads),
+            daemon=True
+        )
+        process.start()
+        self._processes.append((process, current_job, cancel_job))
+
+    def _reap_dead_workers(self):
+        """Fail the job of any worker that died and replace the worker."""
+        for entry in list(self._processes):
+            process, current_job, _ = entry
+            if process.is_alive():
+                continue
+            self._processes.remove(entry)
+            job_id = current_job.value.decode()
+            logger.warning("Local render worker %s exited with code %s", process.pid, process.exitcode)
+            if job_id:
+                self._loop.call_soon_threadsafe(
+                    self._dispatch, "failed", job_id,
+                    {"error": f"worker exited with code {process.exitcode}"}
+                )
+            self._spawn_worker()
+
+    def _listen(self):
+        while True:
+            try:
+                event = self._event_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not self._processes:
+                    return
+                self._reap_dead_workers()
+                continue
+            except (EOFError, OSError):
+                return
+            if event is None:
+                return
+            self._loop.call_soon_threadsafe(self._dispatch, *event)
+
+    def _signal_cancel(self, job_id: str):
+        """Tell the worker rendering ``job_id`` (if any yet) to stop after its current batch."""
+        for _, current_job, cancel_job in self._processes:
+            if current_job.value == job_id.encode():
+                cancel_job.value = job_id.encode()
+
+    def _dispatch(self, kind: str, job_id: Optional[str], payload: Dict[str, Any]):
+        if kind == "ready":
+            logger.info("Local render worker %s ready", payload['pid'])
+            self._ready[payload['pid']] = payload['models']
+            self._ready_changed.set()
+            return
+        if kind == "started":
+            if job_id in self._cancelled:
+                self._signal_cancel(job_id)
+            return
+        pending = self._pending.get(job_id)
+        if pending is None:
+            if kind in ("done", "failed", "cancelled"):
+                self._cancelled.discard(job_id)
+            # Nobody waits for this render any more; don't leave its file behind
+            if kind == "done" and os.path.exists(payload["path"]):
+                os.remove(payload["path"])
+            return
+        future, on_progress = pending
+        if kind == "progress":
+            if on_progress:
+                on_progress(payload)
+            return
+        self._pending.pop(job_id, None)
+        if future.done():
+            return
+        if kind == "done":
+            future.set_result(payload["path"])
+        else:
+            future.set_exception(Exception(f"Local render failed: {payload['error']}"))
+
+    def _ready_models(self) -> Optional[List[str]]:
+        """Models loaded by the workers, or None while any worker is still loading."""
+        models: List[str] = []
+        for process, _, _ in list(self._processes):
+            if process.pid not in self._ready:
+                return None
+            models.extend(name for name in self._ready[process.pid] if name not in models)
+        return models
+
+    async def wait_ready(self) -> List[str]:
+        """Start the workers if needed and wait until each has loaded its model; returns the loaded models."""
+        self.start()
+        while True:
+            models = self._ready_models()
+            if models is not None:
+                return models
+            self._ready_changed.clear()
+            await self._ready_changed.wait()
+
+    async def render(self, prompt: str, duration: int = 4, fps: int = 8,
+                     on_progress: Optional[ProgressCallback] = None, **options: Any) -> Dict[str, Any]:
+        """Render a video on a worker process and upload it; returns the storage result."""
+        self.start()
+        job_id = str(uuid.uuid4())
+        future = self._loop.create_future()
+        self._pending[job_id] = (future, on_progress)
+        self._job_queue.put((job_id, {
+            "prompt": prompt,
+            "num_frames": max(1, duration * fps),
+            "fps": fps,
+            **options
+        }))
+        try:
+            with span("local_render", frames=max(1, duration * fps)):
+                path = await future
+        except asyncio.CancelledError:
+            # Hedge losers and candidates dropped by quality_threshold free their worker
+            self._cancelled.add(job_id)
+            self._signal_cancel(job_id)
+            raise
+        finally:
+            self._pending.pop(job_id, None)
+
+        if on_progress:
+            on_progress({"stage": "uploading", "progress": 0.95})
+        try:
+            with open(path, "rb") as video_file:
+                return await self.storage_service.upload_stream(
+                    video_file,
+                    filename=os.path.basename(path),
+                    container_type='videos',
+                    metadata={"prompt": prompt[:256].encode('ascii', 'ignore').decode()}
+                )
+        finally:
+            os.remove(path)
+
+    async def stop(self):
+        """Ask the workers to exit and wait for them."""
+        if not self.started:
+            return
+        processes, self._processes = self._processes, []
+        for _ in processes:
+            self._job_queue.put(None)
+        for process, _, _ in processes:
+            await asyncio.to_thread(process.join, 30)
+            if process.is_alive():
+                process.terminate()
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Local render backend stopped"))
+        self._pending.clear()
+        self._cancelled.clear()
+        self._ready.clear()
@@ -0,0 +1,151 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+_DONE = object()
+
+
+class _ProducerError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _resize(frame: np.ndarray, resolution: Optional[int]) -> np.ndarray:
+    """Downscale so the shorter side is at most ``resolution`` pixels (never upscales)."""
+    if not resolution:
+        return frame
+    height, width = frame.shape[:2]
+    short_side = min(height, width)
+    if short_side <= resolution:
+        return frame
+    scale = resolution / short_side
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _iter_image(path: str, resolution: Optional[int]) -> Iterator[np.ndarray]:
+    frame = cv2.imread(path)
+    if frame is None:
+        return
+    frame = _resize(frame, resolution)
+    yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def _iter_video(path: str,
+                stride: int,
+                target_fps: Optional[float],
+                start: Optional[float],
+                end: Optional[float],
+                resolution: Optional[int]) -> Iterator[np.ndarray]:
+    cap = cv2.VideoCapture(path)
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000.0)
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        if target_fps and source_fps > target_fps:
+            step = source_fps / target_fps
+        else:
+            step = float(max(1, stride))
+
+        index = 0
+        next_keep = 0.0
+        while cap.isOpened():
+            # grab() advances without decoding to an image; only kept frames are retrieved
+            if not cap.grab():
+                break
+            if end is not None and cap.get(cv2.CAP_PROP_POS_MSEC) > end * 1000.0:
+                break
+            if index >= next_keep:
+                next_keep += step
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                frame = _resize(frame, resolution)
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        cap.release()
+
+
+def iter_media_frames(path: str,
+                      stride: int = 1,
+                      target_fps: Optional[float] = None,
+                      start: Optional[float] = None,
+                      end: Optional[float] = None,
+                      resolution: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Lazily yield RGB frames from one image or video file."""
+    lower = path.lower()
+    if lower.endswith(IMAGE_EXTENSIONS):
+        return _iter_image(path, resolution)
+    if lower.endswith(VIDEO_EXTENSIONS):
+        return _iter_video(path, stride, target_fps, start, end, resolution)
+    return iter(())
+
+
+def iter_source_media(media_paths: List[str],
+                      stride: int = 1,
+                      target_fps: Optional[float] = None,
+                      start: Optional[float] = None,
+                      end: Optional[float] = None,
+                      resolution: Optional[int] = None,
+                      workers: int = 0,
+                      prefetch: int = 8) -> Iterator[np.ndarray]:
+    """
+    Lazily yield RGB frames from several images/videos, in input order.
+
+    Frames are decoded only as the consumer asks for them. ``stride`` keeps
+    every n-th frame, ``target_fps`` resamples to (at most) that rate, and
+    ``start``/``end`` (seconds) restrict each video to a time range. Frames
+    are downscaled to ``resolution`` (shorter side) as they are decoded.
+    With ``workers`` > 1 up to that many files are decoded ahead in threads,
+    each holding at most ``prefetch`` frames, so memory stays bounded.
+    """
+    options = dict(stride=stride, target_fps=target_fps, start=start, end=end, resolution=resolution)
+    if workers <= 1 or len(media_paths) <= 1:
+        for path in media_paths:
+            yield from iter_media_frames(path, **options)
+        return
+
+    stop = threading.Event()
+
+    def produce(path: str, frames: "queue.Queue"):
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for frame in iter_media_frames(path, **options):
+                if not put(frame):
+                    return
+        except BaseException as e:
+            put(_ProducerError(e))
+            return
+        put(_DONE)
+
+    queues = [queue.Queue(maxsize=prefetch) for _ in media_paths]
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-decode')
+    try:
+        for path, frames in zip(media_paths, queues):
+            executor.submit(produce, path, frames)
+        for frames in queues:
+            while True:
+                item = frames.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _ProducerError):
+                    raise item.error
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+from typing import Any, Dict, Optional, Tuple
+
+_cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 4096
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    try:
+        return float(Fraction(rate)) if rate and rate != '0/0' else 0.0
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _probe_ffprobe(path: str, ffprobe_binary: str) -> Dict[str, Any]:
+    """Read stream info from the container header only; no frames are decoded."""
+    output = subprocess.run(
+        [
+            ffprobe_binary, '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration'
+                             ':format=duration',
+            '-of', 'json', path
+        ],
+        capture_output=True, check=True, timeout=30
+    ).stdout
+    data = json.loads(output or b'{}')
+    streams = data.get('streams') or [{}]
+    stream = streams[0]
+    fps = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+    duration = float(stream.get('duration') or data.get('format', {}).get('duration') or 0.0)
+    frame_count = int(stream.get('nb_frames') or 0) or int(round(duration * fps))
+    return {
+        'width': int(stream.get('width') or 0),
+        'height': int(stream.get('height') or 0),
+        'fps': fps,
+        'frame_count': frame_count,
+        'duration': duration
+    }
+
+
+def _probe_opencv(path: str) -> Dict[str, Any]:
+    # Only the fallback needs OpenCV; the API image probes with ffprobe
+    import cv2
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': frame_count / fps if fps > 0 else 0.0
+        }
+    finally:
+        cap.release()
+
+
+def _cache_key(path: str) -> Tuple:
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        # Remote URLs have no mtime; cache them by URL
+        return (path,)
+
+
+def probe_video(path: str, ffprobe_binary: str = 'ffprobe') -> Dict[str, Any]:
+    """
+    Get width, height, fps, frame count and duration of a video file or URL.
+
+    Uses ffprobe, which only parses the container header, and falls back to
+    OpenCV when ffprobe is not installed. Results are cached by path, mtime
+    and size, so a file that changes is probed again.
+    """
+    key = _cache_key(path)
+    with _cache_lock:
+        info = _cache.get(key)
+        if info is not None:
+            _cache.move_to_end(key)
+            return dict(info)
+
+    if shutil.which(ffprobe_binary):
+        try:
+            info = _probe_ffprobe(path, ffprobe_binary)
+        except (subprocess.SubprocessError, ValueError) as e:
+            raise Exception(f"Error probing video {path}: {str(e)}")
+    else:
+        info = _probe_opencv(path)
+
+    with _cache_lock:
+        _cache[key] = info
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(info)
@@ -0,0 +1,148 @@
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of lazily loaded models.
+
+    Loaders are registered up front but only run on first use, so processes
+    that never generate locally never pay for loading. Each model is loaded
+    at most once per process even under concurrent first use. With
+    ``idle_timeout`` a background thread unloads models that have not been
+    used for that many seconds; they are loaded again on next use. Models
+    held with ``acquire()``/``use()`` are never unloaded until released.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None, reap_interval: float = 60.0):
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register how to load a model; nothing is loaded yet."""
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def loaded(self) -> List[str]:
+        return list(self._models)
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use."""
+        model = self._models.get(name)
+        if model is None:
+            if name not in self._loaders:
+                raise KeyError(f"Model not registered: {name}")
+            with self._locks[name]:
+                model = self._models.get(name)
+                if model is None:
+                    logger.info("Loading model %s...", name)
+                    started = time.monotonic()
+                    model = self._loaders[name]()
+                    self._models[name] = model
+                    self._last_used[name] = time.monotonic()
+                    logger.info("Loaded model %s in %.1fs", name, time.monotonic() - started)
+            self._ensure_reaper()
+        self._last_used[name] = time.monotonic()
+        return model
+
+    def acquire(self, name: str) -> Any:
+        """Return the model like ``get`` and keep it loaded until ``release`` is called."""
+        if name not in self._loaders:
+            raise KeyError(f"Model not registered: {name}")
+        with self._locks[name]:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            return self.get(name)
+        except BaseException:
+            self.release(name)
+            raise
+
+    def release(self, name: str):
+        with self._locks[name]:
+            self._in_use[name] = max(0, self._in_use.get(name, 0) - 1)
+        self._last_used[name] = time.monotonic()
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """Hold the model for the duration of the block so it can't be unloaded mid-batch."""
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def warm_up(self, names: Optional[List[str]] = None) -> List[str]:
+        """Load the given (default: all registered) models ahead of the first request."""
+        for name in names or list(self._loaders):
+            self.get(name)
+        return self.loaded()
+
+    def unload(self, name: str, max_idle: Optional[float] = None) -> bool:
+        """
+        Unload the model unless it is in use (or, with ``max_idle``, was used
+        more recently than that); returns whether it was unloaded.
+        """
+        with self._locks.get(name, threading.Lock()):
+            if self._in_use.get(name):
+                return False
+            # Checked under the model's lock so a batch that just acquired it keeps it
+            if max_idle is not None and time.monotonic() - self._last_used.get(name, 0.0) < max_idle:
+                return False
+            model = self._models.pop(name, None)
+        if model is None:
+            return False
+        del model
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        logger.info("Unloaded model %s", name)
+        return True
+
+    def unload_idle(self, max_idle: Optional[float] = None) -> List[str]:
+        """Unload every model unused for ``max_idle`` seconds and return their names."""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        if max_idle is None:
+            return []
+        return [name for name in list(self._models) if self.unload(name, max_idle)]
+
+    def _ensure_reaper(self):
+        if not self.idle_timeout:
+            return
+
+        def reap():
+            while True:
+                time.sleep(self.reap_interval)
+                self.unload_idle()
+
+        # Models loading at the same time hold different per-model locks; only one may start the reaper
+        with self._registry_lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=reap, name='model-idle-reaper', daemon=True)
+            self._reaper.start()
+
+
+_idle_timeout = os.getenv("MODEL_IDLE_UNLOAD_SECONDS")
+model_registry = ModelRegistry(idle_timeout=float(_idle_timeout) if _idle_timeout else None)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Called as on_stage(name, status, detail) with status "running", "completed", "failed" or "skipped"
+StageCallback = Callable[[str, str, Any], None]
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], depends: List[str], required: bool):
+        self.name = name
+        self.func = func
+        self.depends = depends
+        self.required = required
+
+
+class Pipeline:
+    """
+    A small DAG of async stages.
+
+    Each stage is called with the results of the stages it depends on as
+    keyword arguments and starts as soon as those are done, so independent
+    stages (and the pipelines of different jobs) run concurrently. A failing
+    required stage cancels the rest of the pipeline; an optional stage
+    (``required=False``) that fails yields None, and stages depending on it
+    are skipped.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, _Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]],
+            depends: Iterable[str] = (), required: bool = True) -> "Pipeline":
+        if name in self._stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        depends = list(depends)
+        for dependency in depends:
+            if dependency not in self._stages:
+                # Stages must be added after their dependencies, which also rules out cycles
+                raise ValueError(f"Stage {name} depends on unknown stage: {dependency}")
+        self._stages[name] = _Stage(name, func, depends, required)
+        return self
+
+    async def run(self, on_stage: Optional[StageCallback] = None) -> Dict[str, Any]:
+        """Run every stage and return their results by name."""
+        results: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def notify(name: str, status: str, detail: Any = None):
+            if on_stage:
+                on_stage(name, status, detail)
+
+        async def run_stage(stage: _Stage):
+            for dependency in stage.depends:
+                await tasks[dependency]
+            if any(results.get(dependency) is None for dependency in stage.depends):
+                notify(stage.name, "skipped")
+                results[stage.name] = None
+                return
+            notify(stage.name, "running")
+            try:
+                result = await stage.func(**{dependency: results[dependency] for dependency in stage.depends})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                notify(stage.name, "failed", str(e))
+                if stage.required:
+                    raise
+                logger.warning("Optional pipeline stage %s failed: %s", stage.name, e)
+                result = None
+            else:
+                notify(stage.name, "completed", result)
+            results[stage.name] = result
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            pending = [task for task in tasks.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            # Wait for the cancelled stages to unwind so none outlives the pipeline
+            await asyncio.gather(*pending, return_exceptions=True)
+        return results
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different spellings share a cache entry."""
+    prompt = re.sub(r"\s+", " ", prompt).strip().lower()
+    return prompt.rstrip(" .!")
+
+
+def prompt_cache_key(stage: str, prompt: str, **params: Any) -> str:
+    """Content address for one generation stage: hash of the normalized prompt and its parameters."""
+    payload = json.dumps(
+        {"stage": stage, "prompt": normalize_prompt(prompt), **params},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _LeaderCancelled(Exception):
+    """Set on an in-flight entry whose factory was cancelled, so its waiters retry."""
+
+
+class PromptCache:
+    """
+    Content-addressed cache of generation results.
+
+    Entries are evicted least-recently-used once ``max_entries`` or
+    ``max_bytes`` is exceeded, and expire ``max_age`` seconds after they were
+    stored (Runway output URLs are only valid for a limited time, so this
+    should stay below their lifetime unless the result has been copied into
+    our own storage). Concurrent misses for the same key are coalesced so only
+    one upstream call is made.
+
+    Sizes come from ``put(size=...)`` or ``get_or_create(size_of=...)`` and
+    stand for the bytes an entry keeps in storage (a downloaded track, a
+    mirrored blob); entries without one count as 0 bytes. ``max_bytes`` is
+    None by default, so a cache of URLs is bounded by count and age only.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 max_bytes: Optional[int] = None,
+                 max_age: float = 12 * 3600,
+                 on_evict: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _evict(self, key: str):
+        _, size, value = self._entries.pop(key)
+        self.total_bytes -= size
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, _, value = entry
+        if time.monotonic() - stored_at > self.max_age:
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return dict(value)
+
+    def put(self, key: str, value: Dict[str, Any], size: int = 0):
+        """Store a result. ``size`` is the byte size of any blob the entry keeps in storage."""
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (time.monotonic(), size, dict(value))
+        self.total_bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+            self._evict(next(iter(self._entries)))
+
+    def invalidate(self, key: str):
+        if key in self._entries:
+            self._evict(key)
+
+    async def get_or_create(self,
+                            key: str,
+                            factory: Callable[[], Awaitable[Dict[str, Any]]],
+                            size_of: Optional[Callable[[Dict[str, Any]], int]] = None) -> Dict[str, Any]:
+        """
+        Return the cached value for ``key``, or run ``factory`` once for all concurrent callers.
+
+        If the caller running ``factory`` is cancelled (a hedge loser, a client
+        going away), the callers waiting on it are not: one of them runs
+        ``factory`` again.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                value = await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                continue
+            self.hits += 1
+            return dict(value)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            # Wake the waiters so one of them takes over; cancelling the future would cancel them too
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.put(key, value, size_of(value) if size_of else 0)
+            future.set_result(value)
+            return dict(value)
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,492 @@
+import asyncio
+import importlib.util
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+DISPATCH_MODES = ("single", "fallback", "hedge")
+
+RUNWAY_API_BASE_URL = "https://api.dev.runwayml.com"
+RUNWAY_API_VERSION = "2024-11-06"
+PIKALABS_API_BASE_URL = "https://api.pikalabs.ai"
+
+
+class ProviderError(Exception):
+    """Raised when a provider request fails or returns an unusable result."""
+
+
+class LatencyTracker:
+    """Keeps the latencies of the last ``window`` successful generations."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HTTPSessionPool:
+    """
+    One pooled aiohttp session per provider.
+
+    Sessions are created on first use (inside the event loop) and keep their
+    connections alive between requests, so a poll does not pay for a new TLS
+    handshake each time.
+    """
+
+    def __init__(self, limit_per_host: int = 32):
+        self.limit_per_host = limit_per_host
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def get(self, name: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host, ttl_dns_cache=300)
+            )
+            self._sessions[name] = session
+        return session
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+
+
+class GenerationProvider:
+    """
+    Base class of the video generation backends.
+
+    Subclasses implement ``_generate`` and return a dict with at least
+    ``video_url``. ``timeout`` bounds a whole generation; ``hedge_after`` is
+    how long to wait before hedging until enough latencies have been seen to
+    use the provider's own p95. A ``submit_only`` provider can't be polled
+    for progress, so it only ever runs on its own, never as part of a
+    fallback or hedge.
+    """
+
+    name = "provider"
+    submit_only = False
+
+    def __init__(self, timeout: float = 1800.0, hedge_after: float = 120.0,
+                 min_samples: int = 20, window: int = 200):
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+        self.failures = 0
+        self.in_flight = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether the provider is configured (e.g. has an API key)."""
+        return True
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this provider before sending the job elsewhere too."""
+        if len(self.latency) >= self.min_samples:
+            return self.latency.percentile(95)
+        return self.hedge_after
+
+    async def _generate(self, prompt: str, duration: int, job_id: Optional[str], priority: int,
+                        on_progress: Optional[ProgressCallback], seed: Optional[int]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def generate(self, prompt: str, duration: int = 4, job_id: Optional[str] = None,
+                       priority: int = 0, on_progress: Optional[ProgressCallback] = None,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate a video within the provider's timeout and record how long it took.
+
+        ``seed`` asks for a different but reproducible result for the same
+        prompt, where the provider supports it.
+        """
+        started = time.monotonic()
+        self.in_flight += 1
+        try:
+            with span(f"provider_{self.name}", job_id=job_id):
+                result = await asyncio.wait_for(
+                    self._generate(prompt, duration, job_id, priority, on_progress, seed),
+                    timeout=self.timeout
+                )
+        except asyncio.TimeoutError:
+            self.failures += 1
+            raise ProviderError(f"{self.name} did not finish within {self.timeout:.0f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "in_flight": self.in_flight,
+            "completed": self.latency.count,
+            "failures": self.failures,
+            "p50_seconds": self.latency.percentile(50),
+            "p95_seconds": self.latency.percentile(95),
+            "hedge_after_seconds": self.hedge_delay()
+        }
+
+
+class RunwaySDKProvider(GenerationProvider):
+    """RunwayML through the official SDK, with its scheduler, poller and prompt cache."""
+
+    name = "runway"
+
+    def __init__(self, runway_service: Any, **options: Any):
+        super().__init__(**options)
+        self.runway_service = runway_service
+
+    async def _generate(self, prompt, duration, job_id, priority, on_progress, seed):
+        result = await self.runway_service.generate_video(prompt, duration, job_id=job_id,
+                                                          priority=priority, seed=seed,
+                                                          on_progress=on_progress)
+        return {
+            "job_id": result["job_id"],
+            "video_url": result["video_url"],
+            "image_url": result["image_url"],
+            "image_blob": result.get("image_blob")
+        }
+
+
+class _HTTPProvider(GenerationProvider):
+    """Shared request and polling helpers of the REST providers."""
+
+    def __init__(self, sessions: HTTPSessionPool, api_key: Optional[str], base_url: str,
+                 request_timeout: float = 30.0, poll_interval: float = 2.0,
+                 max_poll_interval: float = 10.0, **options: Any):
+        super().__init__(**options)
+        self.sessions = sessions
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.request_timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict[str, Any]:
+        session = self.sessions.get(self.name)
+        async with session.request(method, f"{self.base_url}{path}", json=payload,
+                                   headers=self._headers(), timeout=self.request_timeout) as response:
+            if response.status >= 400:
+                raise ProviderError(f"{self.name} {method} {path} returned {response.status}: "
+                                    f"{(await response.text())[:200]}")
+            return await response.json()
+
+    async def _poll(self, path: str, is_done: Callable[[Dict], bool],
+                    is_failed: Callable[[Dict], bool]) -> Dict[str, Any]:
+        interval = self.poll_interval
+        while True:
+            await asyncio.sleep(interval)
+            status = await self._request("GET", path)
+            if is_failed(status):
+                raise ProviderError(f"{self.name} task failed: {status.get('failure') or status.get('error')}")
+            if is_done(status):
+                return status
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+
+def _first_output(output: Any) -> Any:
+    return output[0] if isinstance(output, list) else output
+
+
+class RunwayRESTProvider(_HTTPProvider):
+    """
+    RunwayML through its REST API directly, on a pooled aiohttp session.
+
+    Given the SDK path's ``runway_service``, each step holds a slot of its
+    ``GenerationScheduler`` and results go through its prompt cache, so both
+    paths share the account's concurrency and daily limits and the same
+    prompt is never paid for twice.
+    """
+
+    name = "runway-rest"
+
+    def __init__(self, sessions: HTTPSessionPool, api_key: Optional[str],
+                 base_url: str = RUNWAY_API_BASE_URL, runway_service: Optional[Any] = None, **options: Any):
+        super().__init__(sessions, api_key, base_url, **options)
+        self.runway_service = runway_service
+
+    def _headers(self) -> Dict[str, str]:
+        return {**super()._headers(), "X-Runway-Version": RUNWAY_API_VERSION}
+
+    @asynccontextmanager
+    async def _slot(self, model: str, job_id: Optional[str], priority: int):
+        if self.runway_service is None:
+            yield
+            return
+        async with self.runway_service.scheduler.slot(model, job_id, priority):
+            yield
+
+    async def _run_task(self, path: str, payload: Dict[str, Any], job_id: Optional[str] = None,
+                        priority: int = 0) -> Dict[str, Any]:
+        async with self._slot(payload["model"], job_id, priority):
+            return await self._submit_and_poll(path, payload)
+
+    async def _submit_and_poll(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        task = await self._request("POST", path, payload)
+        try:
+            return await self._poll(
+                f"/v1/tasks/{task['id']}",
+                is_done=lambda status: status.get("status") == "SUCCEEDED",
+                is_failed=lambda status: status.get("status") in ("FAILED", "CANCELLED")
+            )
+        except asyncio.CancelledError:
+            # Nobody wants the result any more; stop paying for it
+            try:
+                session = self.sessions.get(self.name)
+                async with session.delete(f"{self.base_url}/v1/tasks/{task['id']}",
+                                          headers=self._headers(), timeout=self.request_timeout):
+                    pass
+            except Exception as e:
+                logger.warning("Could not delete cancelled task %s: %s", task['id'], e)
+            raise
+
+    async def _generate(self, prompt, duration, job_id, priority, on_progress, seed):
+        if self.runway_service is None:
+            return await self._generate_uncached(prompt, duration, job_id, priority, seed)
+        return dict(await self.runway_service.cache.get_or_create(
+            self.runway_service.video_cache_key(prompt, duration, seed),
+            lambda: self._generate_uncached(prompt, duration, job_id, priority, seed)
+        ))
+
+    async def _generate_uncached(self, prompt, duration, job_id, priority, seed):
+        # Imported here to reuse the model settings of the SDK path
+        from services.runway_service import IMAGE_MODEL, IMAGE_RATIO, VIDEO_DURATIONS, VIDEO_MODEL, VIDEO_RATIO
+        image = await self._run_task("/v1/text_to_image", {
+            "model": IMAGE_MODEL,
+            "promptText": prompt,
+            "ratio": IMAGE_RATIO,
+            **({"seed": seed} if seed is not None else {})
+        }, job_id, priority)
+        image_url = _first_output(image.get("output"))
+        video = await self._run_task("/v1/image_to_video", {
+            "model": VIDEO_MODEL,
+            "promptImage": image_url,
+            "promptText": prompt,
+            "ratio": VIDEO_RATIO,
+            **({"duration": duration} if duration in VIDEO_DURATIONS else {}),
+            **({"seed": seed} if seed is not None else {})
+        }, job_id, priority)
+        return {
+            "job_id": video["id"],
+            "video_url": _first_output(video.get("output")),
+            "image_url": image_url
+        }
+
+
+class PikaProvider(_HTTPProvider):
+    """
+    Pika Labs, using the request of ``VideoGenerator.generate_with_pikalabs``.
+
+    Submit-only: the request is a single POST whose response must hold the
+    ``video_url``. There is no documented endpoint to poll a pending job, so
+    a response without a video fails instead of being guessed at.
+    """
+
+    name = "pika"
+    submit_only = True
+
+    def __init__(self, sessions: HTTPSessionPool, api_key: Optional[str],
+                 base_url: str = PIKALABS_API_BASE_URL, **options: Any):
+        super().__init__(sessions, api_key, base_url, **options)
+
+    async def _generate(self, prompt, duration, job_id, priority, on_progress, seed):
+        result = await self._request("POST", "/v1/generate", {
+            "prompt": prompt,
+            "duration": duration,
+            "model": "pika-1"
+        })
+        if not result.get("video_url"):
+            raise ProviderError(f"pika returned no video_url (status {result.get('status')}); "
+                                f"polling pending Pika jobs is not supported")
+        return {"job_id": result.get("id"), "video_url": result["video_url"]}
+
+
+class LocalProvider(GenerationProvider):
+    """The local rendering worker pool; the result is uploaded to the videos container."""
+
+    name = "local"
+
+    def __init__(self, get_renderer: Callable[[], Any], fps: int = 8,
+                 keyframe_interval: int = 4, **options: Any):
+        super().__init__(**options)
+        self.get_renderer = get_renderer
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        # The slim API image (Dockerfile.api) ships without torch
+        self._has_torch = importlib.util.find_spec("torch") is not None
+
+    @property
+    def available(self) -> bool:
+        return self._has_torch
+
+    async def _generate(self, prompt, duration, job_id, priority, on_progress, seed):
+        result = await self.get_renderer().render(
+            prompt,
+            duration,
+            fps=self.fps,
+            keyframe_interval=self.keyframe_interval,
+            on_progress=on_progress,
+            seed=seed
+        )
+        return {
+            "video_url": result["sas_url"] or result["url"],
+            "blob": result["filename"]
+        }
+
+
+class ProviderRouter:
+    """
+    Dispatches generations to the named providers.
+
+    ``single`` only uses the requested provider. ``fallback`` retries on the
+    secondary provider when the primary fails. ``hedge`` also starts the
+    secondary once the primary has run past its p95 latency, takes whichever
+    finishes first and cancels the other, trading some duplicate work for a
+    shorter tail. Submit-only providers are always dispatched on their own.
+    """
+
+    def __init__(self, providers: Dict[str, GenerationProvider], mode: str = "single",
+                 fallback: Optional[str] = None):
+        self.providers = providers
+        self.mode = self._check_mode(mode)
+        if fallback in providers and providers[fallback].submit_only:
+            raise ValueError(f"{fallback} is submit-only and can't be the fallback backend")
+        self.fallback = fallback
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.providers)
+
+    def _check_mode(self, mode: str) -> str:
+        if mode not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode: {mode}")
+        return mode
+
+    def get(self, name: str) -> GenerationProvider:
+        provider = self.providers.get(name)
+        if provider is None:
+            raise ValueError(f"Unknown backend: {name}")
+        if not provider.available:
+            raise ValueError(f"Backend not configured: {name}")
+        return provider
+
+    def resolve(self, name: str, fallback: Optional[str] = None,
+                mode: Optional[str] = None) -> tuple:
+        """Validate a request and return (primary, secondary or None, mode)."""
+        requested_mode = mode
+        mode = self._check_mode(mode or self.mode)
+        primary = self.get(name)
+        if primary.submit_only:
+            if fallback or requested_mode not in (None, "single"):
+                raise ValueError(f"{name} is submit-only and can't be hedged or fall back")
+            return primary, None, "single"
+        secondary_name = fallback or self.fallback
+        secondary = None
+        if mode != "single" and secondary_name and secondary_name != name:
+            secondary = self.get(secondary_name)
+            if secondary.submit_only:
+                raise ValueError(f"{secondary_name} is submit-only and can't be a fallback")
+        return primary, secondary, mode
+
+    async def generate(self, name: str, prompt: str, duration: int = 4, job_id: Optional[str] = None,
+                       priority: int = 0, on_progress: Optional[ProgressCallback] = None,
+                       fallback: Optional[str] = None, mode: Optional[str] = None,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+        """Generate a video and return the provider's result plus the ``provider`` that produced it."""
+        primary, secondary, mode = self.resolve(name, fallback, mode)
+
+        def start(provider: GenerationProvider) -> Awaitable:
+            return asyncio.ensure_future(provider.generate(
+                prompt, duration, job_id=job_id, priority=priority, on_progress=on_progress, seed=seed))
+
+        if secondary is None:
+            return {**await start(primary), "provider": primary.name}
+
+        if mode == "fallback":
+            try:
+                return {**await start(primary), "provider": primary.name}
+            except Exception as e:
+                logger.warning("%s failed (%s), falling back to %s", primary.name, e, secondary.name)
+                return {**await start(secondary), "provider": secondary.name}
+
+        return await self._hedge(primary, secondary, start)
+
+    async def _hedge(self, primary: GenerationProvider, secondary: GenerationProvider,
+                     start: Callable[[GenerationProvider], Awaitable]) -> Dict[str, Any]:
+        tasks = {start(primary): primary}
+        try:
+            done, _ = await asyncio.wait(set(tasks), timeout=primary.hedge_delay())
+            if done:
+                task = done.pop()
+                if task.exception() is None:
+                    return {**task.result(), "provider": primary.name}
+                logger.warning("%s failed (%s), falling back to %s", primary.name, task.exception(), secondary.name)
+                return {**await start(secondary), "provider": secondary.name}
+
+            logger.info("%s past %.1fs, hedging on %s", primary.name, primary.hedge_delay(), secondary.name)
+            self.hedges += 1
+            tasks[start(secondary)] = secondary
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if winner is secondary:
+                            self.hedge_wins += 1
+                        return {**task.result(), "provider": winner.name}
+                    errors.append(f"{tasks[task].name}: {str(task.exception())}")
+            raise ProviderError(f"All providers failed: {'; '.join(errors)}")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "fallback": self.fallback,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "providers": {name: provider.stats() for name, provider in self.providers.items()}
+        }
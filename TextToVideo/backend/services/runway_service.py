@@ -1,19 +1,60 @@
+import asyncio
+import logging
 import os
-import time
-from runwayml import RunwayML
+from typing import Any, Callable, Dict, Optional
+from runwayml import RunwayML, AsyncRunwayML
 from dotenv import load_dotenv
+from services.task_poller import RunwayTaskPoller, SUCCEEDED_STATUSES
+from services.scheduler import GenerationScheduler
+from services.prompt_cache import PromptCache, prompt_cache_key
+from services.pipeline import Pipeline, StageCallback
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+# Models and ratios used by the two-step text-to-video process (ratios from the sample code)
+IMAGE_MODEL = 'gen4_image'
+IMAGE_RATIO = '1360:768'
+VIDEO_MODEL = 'gen4_turbo'
+VIDEO_RATIO = '1280:720'
+# Durations image_to_video accepts; other requested durations use the model default
+VIDEO_DURATIONS = (5, 10)
+# Share of the overall progress taken by the image step
+IMAGE_PROGRESS_SHARE = 0.3
 
 class RunwayService:
-    def __init__(self):
+    def __init__(self, storage_service: Optional[Any] = None,
+                 client: Optional[Any] = None, async_client: Optional[Any] = None):
         load_dotenv()
         # Get API key from environment variable
         self.api_key = os.getenv("RUNWAYML_API_SECRET")
-        if not self.api_key:
+        if not self.api_key and (client is None or async_client is None):
             raise ValueError("RUNWAYML_API_SECRET not found in environment variables")
         
-        # Initialize client with API key
-        self.client = RunwayML(api_key=self.api_key)
-        
+        # Initialize client with API key (RUNWAYML_BASE_URL points the SDK elsewhere, e.g. a fake server)
+        self.client = client or RunwayML(api_key=self.api_key)
+        self.async_client = async_client or AsyncRunwayML(api_key=self.api_key)
+
+        # Shared poller for every in-flight task created through this service
+        self.poller = RunwayTaskPoller(self.async_client)
+
+        # Keeps submissions within the account's concurrency and daily limits
+        self.scheduler = GenerationScheduler(
+            self.get_credits,
+            refresh_interval=float(os.getenv("RUNWAY_LIMITS_REFRESH_SECONDS", "300"))
+        )
+
+        # Reuses results of repeated prompts instead of paying for a new generation. Entries are
+        # Runway URLs and task IDs, not stored bytes, so they are bounded by count and age only
+        self.cache = PromptCache(
+            max_entries=int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "1024")),
+            max_age=float(os.getenv("PROMPT_CACHE_MAX_AGE_SECONDS", str(12 * 3600)))
+        )
+
+        # Generated images are copied here (thumbnails container) so they can be reused
+        self.storage_service = storage_service
+
     def get_credits(self):
         """Get credit balance and available models from RunwayML."""
         try:
@@ -61,80 +102,207 @@ class RunwayService:
         except Exception as e:
             raise Exception(f"Error getting credits: {str(e)}")
 
-    def generate_video(self, prompt: str, duration: int = 4):
+    def _seed_option(self, seed: Optional[int]):
+        return {"seed": seed} if seed is not None else {}
+
+    def _duration_option(self, duration: int):
+        # Cache keys use this too, so durations Runway ignores share the default-length result
+        return {"duration": duration} if duration in VIDEO_DURATIONS else {}
+
+    def video_cache_key(self, prompt: str, duration: int, seed: Optional[int] = None) -> str:
+        """Cache key of a text-to-video result; the REST provider shares it."""
+        return prompt_cache_key("video", prompt, model=VIDEO_MODEL, ratio=VIDEO_RATIO,
+                                image_model=IMAGE_MODEL, image_ratio=IMAGE_RATIO,
+                                duration=self._duration_option(duration).get("duration"),
+                                **self._seed_option(seed))
+
+    def _stage_reporter(self, stage: str, on_progress: Optional[Callable[[Dict[str, Any]], None]]):
+        """Turn poller status callbacks for one step into overall progress updates."""
+        if on_progress is None:
+            return None
+        start, share = (0.0, IMAGE_PROGRESS_SHARE) if stage == "image" else (IMAGE_PROGRESS_SHARE, 1.0 - IMAGE_PROGRESS_SHARE)
+
+        def report(task):
+            done = 1.0 if task.status in SUCCEEDED_STATUSES else (getattr(task, 'progress', None) or 0.0)
+            on_progress({
+                "stage": stage,
+                "stage_status": task.status,
+                "progress": round(start + share * done, 3)
+            })
+        return report
+
+    async def _wait_or_delete(self, task_id: str, on_status=None):
+        """Wait for a task; if the wait is cancelled, delete the task so it stops using credits."""
+        try:
+            return await self.poller.wait(task_id, on_status=on_status)
+        except asyncio.CancelledError:
+            try:
+                await self.async_client.tasks.delete(task_id)
+                logger.debug("Deleted cancelled task %s", task_id)
+            except Exception as e:
+                logger.warning("Could not delete cancelled task %s: %s", task_id, e)
+            raise
+
+    async def _generate_image(self, prompt: str, job_id: Optional[str], priority: int,
+                              seed: Optional[int] = None, on_progress=None):
+        """Step 1: Generate an image from text and return its URL."""
+        logger.debug("Step 1: Generating image from text...")
+        async with self.scheduler.slot(IMAGE_MODEL, job_id, priority):
+            with span("text_to_image_submit", job_id=job_id, model=IMAGE_MODEL):
+                image_task = await self.async_client.text_to_image.create(
+                    model=IMAGE_MODEL,
+                    prompt_text=prompt,
+                    ratio=IMAGE_RATIO,
+                    **self._seed_option(seed)
+                )
+            logger.debug("Image generation task created with ID: %s", image_task.id)
+            
+            # Wait for image generation completion
+            with span("text_to_image_wait", job_id=job_id, task_id=image_task.id):
+                image_status = await self._wait_or_delete(
+                    image_task.id, self._stage_reporter("image", on_progress))
+        logger.debug("Image generation completed successfully")
+        
+        # Get the generated image URL
+        image_url = image_status.output[0] if isinstance(image_status.output, list) else image_status.output
+        logger.debug("Generated image URL: %s", image_url)
+        return {"image_url": image_url}
+
+    async def _store_image(self, image_url: str, image_key: str):
+        """Copy a generated image into the thumbnails container, named by its cache key."""
+        stored = await self.storage_service.upload_from_url(
+            image_url,
+            f"{image_key[:32]}.png",
+            container_type='thumbnails'
+        )
+        logger.debug("Stored generated image as %s", stored['filename'])
+        return {"image_blob": stored["filename"], "image_sas_url": stored["sas_url"]}
+
+    async def _generate_video_from_image(self, image_url: str, prompt: str,
+                                         job_id: Optional[str], priority: int,
+                                         seed: Optional[int] = None, duration: int = 4,
+                                         on_progress=None):
+        """Step 2: Generate a video from the image and return its URL and task ID."""
+        logger.debug("Step 2: Generating video from image...")
+        async with self.scheduler.slot(VIDEO_MODEL, job_id, priority):
+            with span("image_to_video_submit", job_id=job_id, model=VIDEO_MODEL):
+                video_task = await self.async_client.image_to_video.create(
+                    model=VIDEO_MODEL,
+                    prompt_image=image_url,
+                    prompt_text=prompt,
+                    ratio=VIDEO_RATIO,
+                    **self._duration_option(duration),
+                    **self._seed_option(seed)
+                )
+            logger.debug("Video generation task created with ID: %s", video_task.id)
+            
+            # Wait for video generation completion
+            with span("image_to_video_wait", job_id=job_id, task_id=video_task.id):
+                video_status = await self._wait_or_delete(
+                    video_task.id, self._stage_reporter("video", on_progress))
+        logger.debug("Video generation completed successfully")
+        
+        # Get the generated video URL
+        video_url = video_status.output[0] if isinstance(video_status.output, list) else video_status.output
+        logger.debug("Generated video URL: %s", video_url)
+        return {"job_id": video_task.id, "video_url": video_url}
+
+    async def generate_video(self, prompt: str, duration: int = 4,
+                             job_id: Optional[str] = None, priority: int = 0,
+                             seed: Optional[int] = None,
+                             on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
         """Generate a video from text using RunwayML's two-step process:
         1. Generate an image from text
         2. Generate a video from the image
         Input JSON: {prompt: "A beautiful sunset over the ocean with waves crashing on the shore"
         duration: 4}
+        Both tasks are awaited through the shared poller, so this never blocks the event loop.
+        Each step waits for a free slot of its model in the scheduler (lower priority runs first).
+        Results of both steps are cached by normalized prompt and parameters, and concurrent
+        identical requests share a single upstream generation. Pass ``seed`` to get a
+        different (but reproducible) result for the same prompt; it is part of the cache key.
+        If the caller is cancelled, the Runway task in progress is deleted.
+        The steps run as a pipeline: while the video is generated, the image is copied into
+        the thumbnails container (when storage is configured) and returned as ``image_blob``,
+        so more videos can later be made from it with ``generate_videos_from_image``.
+        ``on_progress`` receives the stage ("image", "video") and progress as soon as the
+        shared poller sees a Runway task change.
         """
         try:
-            print(f"[DEBUG] Starting video generation with prompt: {prompt}")
-            
-            # Step 1: Generate image from text
-            print("[DEBUG] Step 1: Generating image from text...")
-            image_task = self.client.text_to_image.create(
-                model='gen4_image',
-                prompt_text=prompt,
-                ratio='1360:768'  # Using the exact ratio from the sample code
-            )
-            print(f"[DEBUG] Image generation task created with ID: {image_task.id}")
-            
-            # Poll for image generation completion
-            print("[DEBUG] Polling for image generation completion...")
-            while True:
-                image_status = self.client.tasks.retrieve(image_task.id)
-                print(f"[DEBUG] Image generation status: {image_status.status}")
-                if image_status.status in ['completed', 'SUCCEEDED']:
-                    print("[DEBUG] Image generation completed successfully")
-                    break
-                elif image_status.status in ['failed', 'FAILED']:
-                    print(f"[DEBUG] Image generation failed: {image_status.error}")
-                    raise Exception(f"Image generation failed: {image_status.error}")
-                time.sleep(5)
-            
-            # Get the generated image URL
-            print(f"[DEBUG] Task output: {image_status.output}")
-            image_url = image_status.output[0] if isinstance(image_status.output, list) else image_status.output
-            print(f"[DEBUG] Generated image URL: {image_url}")
-            
-            # Step 2: Generate video from image
-            print("[DEBUG] Step 2: Generating video from image...")
-            video_task = self.client.image_to_video.create(
-                model='gen4_turbo',
-                prompt_image=image_url,
-                prompt_text=prompt,
-                ratio='1280:720'  # Using the ratio from the sample code
-            )
-            print(f"[DEBUG] Video generation task created with ID: {video_task.id}")
-            
-            # Poll for video generation completion
-            print("[DEBUG] Polling for video generation completion...")
-            while True:
-                video_status = self.client.tasks.retrieve(video_task.id)
-                print(f"[DEBUG] Video generation status: {video_status.status}")
-                if video_status.status in ['completed', 'SUCCEEDED']:
-                    print("[DEBUG] Video generation completed successfully")
-                    break
-                elif video_status.status in ['failed', 'FAILED']:
-                    print(f"[DEBUG] Video generation failed: {video_status.error}")
-                    raise Exception(f"Video generation failed: {video_status.error}")
-                time.sleep(5)
-            
-            # Get the generated video URL
-            video_url = video_status.output[0] if isinstance(video_status.output, list) else video_status.output
-            print(f"[DEBUG] Generated video URL: {video_url}")
+            logger.debug("Starting video generation with prompt: %s", prompt)
+            image_key = prompt_cache_key("image", prompt, model=IMAGE_MODEL, ratio=IMAGE_RATIO,
+                                         **self._seed_option(seed))
+            video_key = self.video_cache_key(prompt, duration, seed)
+
+            async def create_video():
+                pipeline = Pipeline()
+                pipeline.add("image", lambda: self.cache.get_or_create(
+                    image_key, lambda: self._generate_image(prompt, job_id, priority, seed, on_progress)))
+                if self.storage_service is not None:
+                    pipeline.add("stored_image",
+                                 lambda image: self._store_image(image["image_url"], image_key),
+                                 depends=["image"], required=False)
+                pipeline.add("video", lambda image: self._generate_video_from_image(
+                    image["image_url"], prompt, job_id, priority, seed, duration, on_progress),
+                    depends=["image"])
+                results = await pipeline.run()
+                return {**results["video"], "image_url": results["image"]["image_url"],
+                        **(results.get("stored_image") or {})}
+
+            result = await self.cache.get_or_create(video_key, create_video)
             
             return {
-                "job_id": video_task.id,
+                "job_id": result["job_id"],
                 "status": "completed",
-                "video_url": video_url,
-                "image_url": image_url
+                "video_url": result["video_url"],
+                "image_url": result["image_url"],
+                "image_blob": result.get("image_blob")
             }
         except Exception as e:
-            print(f"[DEBUG] Error in generate_video: {str(e)}")
+            logger.error("Error in generate_video: %s", e)
             raise Exception(f"Error generating video: {str(e)}")
 
+    async def generate_video_from_image(self, image_url: str, prompt: str, duration: int = 5,
+                                        job_id: Optional[str] = None, priority: int = 0,
+                                        seed: Optional[int] = None, image_id: Optional[str] = None):
+        """Generate a video from an existing image (step 2 only).
+
+        ``image_id`` identifies the image in the cache key (e.g. its blob name) when
+        ``image_url`` changes between calls, as SAS URLs do.
+        """
+        try:
+            video_key = prompt_cache_key("video_from_image", prompt, image=image_id or image_url,
+                                         model=VIDEO_MODEL, ratio=VIDEO_RATIO,
+                                         duration=self._duration_option(duration).get("duration"),
+                                         **self._seed_option(seed))
+            result = await self.cache.get_or_create(video_key, lambda: self._generate_video_from_image(
+                image_url, prompt, job_id, priority, seed, duration))
+            return {
+                "job_id": result["job_id"],
+                "status": "completed",
+                "video_url": result["video_url"],
+                "image_url": image_url
+            }
+        except Exception as e:
+            raise Exception(f"Error generating video from image: {str(e)}")
+
+    async def generate_videos_from_image(self, image_url: str, variants: list,
+                                         job_id: Optional[str] = None, priority: int = 0,
+                                         image_id: Optional[str] = None,
+                                         on_stage: Optional[StageCallback] = None):
+        """Generate one video per ``{"prompt", "duration"}`` variant from the same image.
+
+        The variants are independent pipeline stages and run concurrently (within the
+        scheduler's limits). A failed variant does not fail the others; its result is None.
+        """
+        pipeline = Pipeline()
+        for index, variant in enumerate(variants):
+            pipeline.add(str(index), lambda variant=variant: self.generate_video_from_image(
+                image_url, variant["prompt"], variant.get("duration", 5), job_id=job_id,
+                priority=priority, image_id=image_id), required=False)
+        results = await pipeline.run(on_stage)
+        return [results[str(index)] for index in range(len(variants))]
+
     def get_video_status(self, job_id: str):
         """Get the status of a video generation job"""
         try:
@@ -0,0 +1,95 @@
+from azure.storage.blob import (
+    BlobSasPermissions,
+    ContainerSasPermissions,
+    generate_blob_sas,
+    generate_container_sas
+)
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+
+class SasSigner:
+    """
+    Signs read-only SAS tokens locally with the storage account key.
+
+    Signing is a pure HMAC computation, so no client objects or network calls
+    are needed. Tokens are cached per blob (or per container) and reused
+    until ``refresh_margin`` before they expire, so repeated listings cost a
+    dictionary lookup per blob.
+    """
+
+    def __init__(self,
+                 account_name: str,
+                 account_key: Optional[str],
+                 refresh_margin: timedelta = timedelta(minutes=10),
+                 max_entries: int = 50000):
+        self.account_name = account_name
+        self.account_key = account_key
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self._tokens: "OrderedDict[Tuple, Tuple[str, datetime]]" = OrderedDict()
+
+    @classmethod
+    def from_client(cls, blob_service_client) -> "SasSigner":
+        """Build a signer from a (sync or async) BlobServiceClient's shared key credential."""
+        credential = blob_service_client.credential
+        return cls(blob_service_client.account_name, getattr(credential, 'account_key', None))
+
+    @property
+    def can_sign(self) -> bool:
+        return bool(self.account_key)
+
+    def _cached(self, key: Tuple) -> Optional[str]:
+        entry = self._tokens.get(key)
+        if entry is None:
+            return None
+        token, expiry = entry
+        if datetime.now(timezone.utc) >= expiry - self.refresh_margin:
+            del self._tokens[key]
+            return None
+        self._tokens.move_to_end(key)
+        return token
+
+    def _store(self, key: Tuple, token: str, expiry: datetime):
+        self._tokens[key] = (token, expiry)
+        self._tokens.move_to_end(key)
+        while len(self._tokens) > self.max_entries:
+            self._tokens.popitem(last=False)
+
+    def blob_sas(self, container_name: str, blob_name: str, expiry_hours: int = 24) -> Optional[str]:
+        """Read-only SAS token for a single blob, or None if the account key is unavailable."""
+        if not self.can_sign:
+            return None
+        key = ('blob', container_name, blob_name, expiry_hours)
+        token = self._cached(key)
+        if token is None:
+            expiry = datetime.now(timezone.utc) + timedelta(hours=expiry_hours)
+            token = generate_blob_sas(
+                account_name=self.account_name,
+                container_name=container_name,
+                blob_name=blob_name,
+                account_key=self.account_key,
+                permission=BlobSasPermissions(read=True),
+                expiry=expiry
+            )
+            self._store(key, token, expiry)
+        return token
+
+    def container_sas(self, container_name: str, expiry_hours: int = 24) -> Optional[str]:
+        """Read-only SAS token valid for every blob in a container."""
+        if not self.can_sign:
+            return None
+        key = ('container', container_name, expiry_hours)
+        token = self._cached(key)
+        if token is None:
+            expiry = datetime.now(timezone.utc) + timedelta(hours=expiry_hours)
+            token = generate_container_sas(
+                account_name=self.account_name,
+                container_name=container_name,
+                account_key=self.account_key,
+                permission=ContainerSasPermissions(read=True),
+                expiry=expiry
+            )
+            self._store(key, token, expiry)
+        return token
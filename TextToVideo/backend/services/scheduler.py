@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a model's daily generation quota has been used up."""
+
+
+def _utc_today():
+    # Runway's daily quotas reset at midnight UTC
+    return datetime.now(timezone.utc).date()
+
+
+class _ModelLane:
+    """
+    Admission control for one Runway model.
+
+    Works like a semaphore whose size can change at runtime, except that
+    waiters are admitted in priority order (lower value first, FIFO within a
+    priority) instead of arrival order. The daily count starts over on the
+    first quota check of a new UTC day, so an exhausted lane reopens at
+    midnight even if the tier limits could not be refreshed.
+    """
+
+    def __init__(self, model: str, limit: int, daily_limit: Optional[int]):
+        self.model = model
+        self.limit = limit
+        self.daily_limit = daily_limit
+        self.daily_used = 0
+        self.quota_day = _utc_today()
+        self.active = 0
+        self._waiters: List[list] = []
+        self._counter = itertools.count()
+        # Rolling average of how long a slot is held, used for start estimates
+        self.avg_hold_seconds = 60.0
+
+    def _dispatch(self):
+        while self._waiters and self.active < self.limit:
+            entry = heapq.heappop(self._waiters)
+            future = entry[3]
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def resize(self, limit: int):
+        self.limit = max(1, limit)
+        self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._waiters if not w[3].done())
+
+    def roll_over(self):
+        """Reset the daily count if the UTC day changed since it was last checked."""
+        today = _utc_today()
+        if today != self.quota_day:
+            self.quota_day = today
+            self.daily_used = 0
+
+    def _check_quota(self):
+        self.roll_over()
+        if self.daily_limit is not None and self.daily_used >= self.daily_limit:
+            raise QuotaExceededError(
+                f"Daily generation quota reached for {self.model} ({self.daily_limit})")
+
+    async def acquire(self, job_id: str, priority: int):
+        # Fail fast instead of queueing work that can never be submitted today
+        self._check_quota()
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, [priority, next(self._counter), job_id, future])
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Slot was granted just as we were cancelled; hand it on
+                    self.release()
+                raise
+        try:
+            self._check_quota()
+        except QuotaExceededError:
+            self.release()
+            raise
+        self.daily_used += 1
+
+    def release(self, held_seconds: Optional[float] = None):
+        self.active -= 1
+        if held_seconds is not None:
+            self.avg_hold_seconds = 0.8 * self.avg_hold_seconds + 0.2 * held_seconds
+        self._dispatch()
+
+    def position(self, job_id: str) -> Optional[int]:
+        pending = sorted(w for w in self._waiters if not w[3].done())
+        for index, entry in enumerate(pending):
+            if entry[2] == job_id:
+                return index + 1
+        return None
+
+
+class GenerationScheduler:
+    """
+    Admits Runway generations within the account's tier limits.
+
+    Each model gets a lane sized from ``maxConcurrentGenerations`` and capped
+    by ``maxDailyGenerations``, both read from ``RunwayService.get_credits``
+    and refreshed every ``refresh_interval`` seconds. Limits are per account,
+    so when several worker processes share one account each process takes an
+    equal share (``workers``, defaulting to ``WEB_CONCURRENCY``).
+    """
+
+    def __init__(self,
+                 limits_provider: Callable[[], Dict[str, Any]],
+                 refresh_interval: float = 300.0,
+                 workers: Optional[int] = None,
+                 default_limit: int = 1):
+        self.limits_provider = limits_provider
+        self.refresh_interval = refresh_interval
+        self.workers = workers or int(os.getenv("WEB_CONCURRENCY", "1"))
+        self.default_limit = default_limit
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._last_refresh = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = _ModelLane(model, self.default_limit, None)
+            self._lanes[model] = lane
+        return lane
+
+    def _share(self, limit: Optional[int]) -> Optional[int]:
+        if limit is None:
+            return None
+        return max(1, limit // self.workers)
+
+    async def refresh_limits(self, force: bool = False):
+        """Re-read tier limits and today's usage from Runway."""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = time.monotonic()
+            try:
+                credits = await asyncio.to_thread(self.limits_provider)
+            except Exception as e:
+                logger.warning("Could not refresh Runway tier limits: %s", e)
+                return
+
+            usage = credits.get("usage", {}).get("models", {})
+            for model, limits in credits.get("tier", {}).get("models", {}).items():
+                lane = self._lane(model)
+                lane.daily_limit = self._share(limits.get("maxDailyGenerations"))
+                lane.roll_over()
+                # Trust whichever is higher: our own count or what Runway reports
+                reported = usage.get(model, {}).get("dailyGenerations")
+                if reported is not None:
+                    lane.daily_used = max(lane.daily_used, reported // self.workers)
+                lane.resize(self._share(limits.get("maxConcurrentGenerations")) or self.default_limit)
+
+    @asynccontextmanager
+    async def slot(self, model: str, job_id: str, priority: int = 0):
+        """Hold one concurrent generation slot for ``model`` for the duration of the block."""
+        await self.refresh_limits()
+        lane = self._lane(model)
+        await lane.acquire(job_id, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.release(time.monotonic() - started)
+
+    def queue_info(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position and estimated start time for a waiting job, if it is waiting here."""
+        for lane in self._lanes.values():
+            position = lane.position(job_id)
+            if position is None:
+                continue
+            # Slots free up roughly every avg_hold / limit seconds
+            wait_seconds = lane.avg_hold_seconds * position / max(1, lane.limit)
+            return {
+                "model": lane.model,
+                "queue_position": position,
+                "estimated_start": datetime.fromtimestamp(
+                    time.time() + wait_seconds, timezone.utc).isoformat()
+            }
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                "active": lane.active,
+                "limit": lane.limit,
+                "queued": lane.queued,
+                "daily_used": lane.daily_used,
+                "daily_limit": lane.daily_limit
+            }
+            for model, lane in self._lanes.items()
+        }
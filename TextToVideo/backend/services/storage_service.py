@@ -1,25 +1,131 @@
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.blob import BlobServiceClient as SyncBlobServiceClient, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.core import MatchConditions
+from azure.core.pipeline.transport import AioHttpTransport
+from services.sas_signer import SasSigner
+from services.telemetry import timed
+from urllib.parse import quote
+import aiohttp
 import os
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import asyncio
+import base64
+import hashlib
+import inspect
+import json
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable
+from datetime import datetime, timezone
 import mimetypes
 
+# Size of each staged block for streaming uploads
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
 class StorageService:
-    def __init__(self, connection_string: str):
-        self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    """
+    Azure Blob Storage access for the API.
+    
+    By default all calls go through the native async client
+    (``azure.storage.blob.aio``) and share one pooled aiohttp transport, so
+    blob operations overlap instead of blocking the event loop. The client is
+    created on first use inside the event loop (or by ``start()``); call
+    ``close()`` on shutdown. With
+    ``use_thread_offload`` (or ``STORAGE_THREAD_OFFLOAD=1``) the synchronous
+    client is used instead and every call runs in a worker thread.
+    
+    ``blob_service_client`` injects an already built async client (e.g. the
+    in-memory fake used by ``scripts/load_test.py``); SAS tokens are still
+    signed with the key in ``connection_string``.
+    """
+    
+    def __init__(self, connection_string: str,
+                 use_thread_offload: Optional[bool] = None,
+                 max_connections: int = 100,
+                 blob_service_client: Optional[Any] = None):
+        self.connection_string = connection_string
+        if use_thread_offload is None:
+            use_thread_offload = os.getenv("STORAGE_THREAD_OFFLOAD") == "1"
+        self.use_thread_offload = use_thread_offload
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sas_signer: Optional[SasSigner] = None
+        self.blob_service_client = blob_service_client
+        if self.use_thread_offload and blob_service_client is None:
+            self.blob_service_client = SyncBlobServiceClient.from_connection_string(connection_string)
         self.containers = {
             'media': 'media-assets',
             'videos': 'generated-videos',
             'thumbnails': 'thumbnails',
             'temp': 'temp'
         }
+    
+    async def start(self):
+        """Create the shared connection pool and async client ahead of the first call."""
+        self._ensure_client()
+    
+    def _ensure_client(self):
+        """Create the connection pool and async client unless they exist (must run inside the event loop)."""
+        if self.blob_service_client is not None:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        )
+        transport = AioHttpTransport(session=self._session, session_owner=False)
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            self.connection_string,
+            transport=transport
+        )
+    
+    async def close(self):
+        """Close the async client and its connection pool."""
+        if self.use_thread_offload:
+            if self.blob_service_client is not None:
+                self.blob_service_client.close()
+            return
+        if self.blob_service_client is not None:
+            await self.blob_service_client.close()
+            self.blob_service_client = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        """Await an async client method, or run a sync one in a worker thread."""
+        if self.use_thread_offload:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return await func(*args, **kwargs)
+    
+    async def _iter_pages(self, container_client, page_size: Optional[int] = None,
+                          continuation_token: Optional[str] = None, **kwargs):
+        """
+        Yield ``(blobs, continuation_token)`` one listing page at a time.
         
+        Only one page is held in memory, and neither mode blocks the event loop.
+        """
+        pages = container_client.list_blobs(results_per_page=page_size, **kwargs).by_page(
+            continuation_token=continuation_token
+        )
+        while True:
+            if self.use_thread_offload:
+                page = await asyncio.to_thread(next, pages, None)
+                blobs = await asyncio.to_thread(list, page) if page is not None else None
+            else:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    page = None
+                blobs = [blob async for blob in page] if page is not None else None
+            if blobs is None:
+                return
+            yield blobs, pages.continuation_token
+            if not pages.continuation_token:
+                return
+    
     def _get_container_client(self, container_type: str):
         """Get container client for the specified container type."""
         container_name = self.containers.get(container_type)
         if not container_name:
             raise ValueError(f"Invalid container type: {container_type}")
+        self._ensure_client()
         return self.blob_service_client.get_container_client(container_name)
     
     def _get_content_settings(self, filename: str) -> ContentSettings:
@@ -27,6 +133,7 @@ class StorageService:
         content_type, _ = mimetypes.guess_type(filename)
         return ContentSettings(content_type=content_type or 'application/octet-stream')
     
+    @timed("storage_upload_file")
     async def upload_file(self, 
                          file_data: bytes, 
                          filename: str, 
@@ -52,7 +159,8 @@ class StorageService:
             content_settings = self._get_content_settings(filename)
             
             # Upload the file
-            blob_client.upload_blob(
+            await self._call(
+                blob_client.upload_blob,
                 file_data,
                 overwrite=True,
                 content_settings=content_settings,
@@ -74,34 +182,388 @@ class StorageService:
         except Exception as e:
             raise Exception(f"Error uploading file: {str(e)}")
     
-    def _generate_sas_token(self, container_type: str, filename: str, 
-                          expiry_hours: int = 24) -> Optional[str]:
-        """Generate a SAS token for temporary access to the blob."""
+    @timed("storage_upload_chunks")
+    async def upload_chunks(self,
+                            chunks: AsyncIterator[bytes],
+                            filename: str,
+                            container_type: str = 'media',
+                            metadata: Optional[Dict[str, str]] = None,
+                            max_concurrency: int = 4) -> Dict[str, Any]:
+        """
+        Upload a stream of chunks as a block blob.
+        
+        Each chunk is staged as its own block with at most ``max_concurrency``
+        blocks in flight, and the block list is committed at the end. Peak
+        memory is therefore bounded by chunk size times ``max_concurrency``
+        regardless of the total size.
+        
+        Args:
+            chunks: Async iterator yielding the file data in order
+            filename: The name of the file
+            container_type: Type of container to upload to ('media', 'videos', 'thumbnails', 'temp')
+            metadata: Optional metadata to attach to the blob
+            max_concurrency: Maximum number of blocks staged in parallel
+            
+        Returns:
+            Dict containing the blob URL, metadata, size and SHA-256 of the content
+        """
         try:
             container_client = self._get_container_client(container_type)
             blob_client = container_client.get_blob_client(filename)
+            content_settings = self._get_content_settings(filename)
+            
+            slots = asyncio.Semaphore(max_concurrency)
+            pending = set()
+            block_ids = []
+            digest = hashlib.sha256()
+            size = 0
+            
+            errors = []
+            
+            async def stage(block_id: str, data: bytes):
+                try:
+                    await self._call(blob_client.stage_block, block_id, data)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    slots.release()
             
-            # Generate SAS token
-            sas_token = blob_client.generate_shared_access_signature(
-                permission="r",  # Read permission
-                expiry=datetime.utcnow() + timedelta(hours=expiry_hours)
+            try:
+                async for chunk in chunks:
+                    if errors:
+                        raise errors[0]
+                    if not chunk:
+                        continue
+                    digest.update(chunk)
+                    size += len(chunk)
+                    # Block IDs must all have the same length within a blob
+                    block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                    block_ids.append(block_id)
+                    # Wait for a free slot before holding on to another chunk
+                    await slots.acquire()
+                    task = asyncio.create_task(stage(block_id, chunk))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                if pending:
+                    await asyncio.gather(*pending)
+                if errors:
+                    raise errors[0]
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                raise
+            
+            await self._call(
+                blob_client.commit_block_list,
+                block_ids,
+                content_settings=content_settings,
+                metadata=metadata
             )
-            return sas_token
-        except Exception:
-            return None
+            
+            sas_token = self._generate_sas_token(container_type, filename)
+            
+            return {
+                'url': blob_client.url,
+                'sas_url': f"{blob_client.url}?{sas_token}" if sas_token else None,
+                'filename': filename,
+                'container': container_type,
+                'content_type': content_settings.content_type,
+                'metadata': metadata,
+                'size': size,
+                'content_sha256': digest.hexdigest()
+            }
+            
+        except Exception as e:
+            raise Exception(f"Error uploading file: {str(e)}")
+    
+    async def upload_stream(self,
+                            stream: Any,
+                            filename: str,
+                            container_type: str = 'media',
+                            metadata: Optional[Dict[str, str]] = None,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            max_concurrency: int = 4) -> Dict[str, Any]:
+        """
+        Upload from a readable stream (e.g. FastAPI's UploadFile) in fixed-size chunks.
+        
+        ``stream.read(size)`` may be sync or async. Sync reads (a local file)
+        run in a thread so reading a large video never blocks the event loop.
+        """
+        read_in_thread = not inspect.iscoroutinefunction(stream.read)
+        
+        async def chunks():
+            while True:
+                if read_in_thread:
+                    chunk = await asyncio.to_thread(stream.read, chunk_size)
+                else:
+                    chunk = await stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        
+        return await self.upload_chunks(
+            chunks(),
+            filename,
+            container_type=container_type,
+            metadata=metadata,
+            max_concurrency=max_concurrency
+        )
+    
+    @timed("storage_upload_from_url")
+    async def upload_from_url(self,
+                              source_url: str,
+                              filename: str,
+                              container_type: str = 'media',
+                              metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Copy a publicly readable URL into a blob server-side (Put Blob From URL).
+        
+        The data never passes through this process, so it suits small files
+        such as generated images (the service limit is 5000 MiB).
+        """
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            content_settings = self._get_content_settings(filename)
+            
+            await self._call(
+                blob_client.upload_blob_from_url,
+                source_url,
+                overwrite=True,
+                content_settings=content_settings
+            )
+            # Put Blob From URL can't set metadata itself
+            if metadata:
+                await self._call(blob_client.set_blob_metadata, metadata)
+            
+            sas_token = self._generate_sas_token(container_type, filename)
+            return {
+                'url': blob_client.url,
+                'sas_url': f"{blob_client.url}?{sas_token}" if sas_token else None,
+                'filename': filename,
+                'container': container_type,
+                'content_type': content_settings.content_type,
+                'metadata': metadata
+            }
+        except Exception as e:
+            raise Exception(f"Error copying file from URL: {str(e)}")
+    
+    @timed("storage_upload_ranges")
+    async def upload_ranges(self,
+                            fetch_range: Callable[[int, int], Awaitable[bytes]],
+                            size: int,
+                            filename: str,
+                            container_type: str = 'media',
+                            metadata: Optional[Dict[str, str]] = None,
+                            block_size: int = DEFAULT_CHUNK_SIZE,
+                            max_concurrency: int = 4) -> Dict[str, Any]:
+        """
+        Upload a file of known ``size`` whose byte ranges can be read independently.
+        
+        ``fetch_range(start, end)`` returns bytes ``start`` to ``end`` inclusive
+        (e.g. an HTTP range request). Up to ``max_concurrency`` blocks are
+        fetched and staged at once, in any order, so a remote file is copied at
+        the speed of several connections while memory stays bounded by
+        ``block_size`` times ``max_concurrency``.
+        """
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            content_settings = self._get_content_settings(filename)
+            
+            offsets = list(range(0, size, block_size))
+            block_ids = [base64.b64encode(f"{index:08d}".encode()).decode() for index in range(len(offsets))]
+            slots = asyncio.Semaphore(max_concurrency)
+            
+            async def copy_block(block_id: str, start: int):
+                async with slots:
+                    end = min(start + block_size, size) - 1
+                    data = await fetch_range(start, end)
+                    if len(data) != end - start + 1:
+                        raise ValueError(f"Expected {end - start + 1} bytes at offset {start}, got {len(data)}")
+                    await self._call(blob_client.stage_block, block_id, data)
+            
+            tasks = [asyncio.ensure_future(copy_block(block_id, start))
+                     for block_id, start in zip(block_ids, offsets)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+            
+            await self._call(
+                blob_client.commit_block_list,
+                block_ids,
+                content_settings=content_settings,
+                metadata=metadata
+            )
+            
+            sas_token = self._generate_sas_token(container_type, filename)
+            return {
+                'url': blob_client.url,
+                'sas_url': f"{blob_client.url}?{sas_token}" if sas_token else None,
+                'filename': filename,
+                'container': container_type,
+                'content_type': content_settings.content_type,
+                'metadata': metadata,
+                'size': size
+            }
+        except Exception as e:
+            raise Exception(f"Error uploading file: {str(e)}")
+    
+    @timed("storage_copy_from_url")
+    async def copy_from_url(self,
+                            source_url: str,
+                            filename: str,
+                            container_type: str = 'media',
+                            metadata: Optional[Dict[str, str]] = None,
+                            poll_interval: float = 1.0,
+                            timeout: float = 600.0) -> Dict[str, Any]:
+        """
+        Copy a URL into a blob with an asynchronous server-side copy (Copy Blob).
+        
+        Azure fetches the source itself; this waits until the copy has finished.
+        """
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            
+            copy = await self._call(blob_client.start_copy_from_url, source_url, metadata=metadata)
+            status = copy.get('copy_status')
+            deadline = asyncio.get_running_loop().time() + timeout
+            properties = None
+            while status == 'pending':
+                if asyncio.get_running_loop().time() > deadline:
+                    await self._call(blob_client.abort_copy, copy['copy_id'])
+                    raise TimeoutError(f"Copy of {filename} did not finish within {timeout:.0f}s")
+                await asyncio.sleep(poll_interval)
+                properties = await self._call(blob_client.get_blob_properties)
+                status = properties.copy.status
+            if status != 'success':
+                raise Exception(f"Copy of {filename} ended with status {status}")
+            if properties is None:
+                properties = await self._call(blob_client.get_blob_properties)
+            
+            sas_token = self._generate_sas_token(container_type, filename)
+            return {
+                'url': blob_client.url,
+                'sas_url': f"{blob_client.url}?{sas_token}" if sas_token else None,
+                'filename': filename,
+                'container': container_type,
+                'content_type': properties.content_settings.content_type,
+                'metadata': metadata,
+                'size': properties.size
+            }
+        except Exception as e:
+            raise Exception(f"Error copying file from URL: {str(e)}")
+    
+    async def file_exists(self, filename: str, container_type: str = 'media') -> bool:
+        """Check whether a blob exists."""
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            return await self._call(blob_client.exists)
+        except Exception as e:
+            raise Exception(f"Error checking file: {str(e)}")
+    
+    def _get_sas_signer(self) -> SasSigner:
+        if self._sas_signer is None:
+            self._ensure_client()
+            self._sas_signer = SasSigner.from_client(self.blob_service_client)
+        return self._sas_signer
+    
+    def _generate_sas_token(self, container_type: str, filename: str, 
+                          expiry_hours: int = 24) -> Optional[str]:
+        """Generate a read-only SAS token for the blob, signed locally and cached until near expiry."""
+        container_name = self.containers.get(container_type)
+        if not container_name:
+            raise ValueError(f"Invalid container type: {container_type}")
+        return self._get_sas_signer().blob_sas(container_name, filename, expiry_hours)
+    
+    def _generate_container_sas_token(self, container_type: str,
+                                      expiry_hours: int = 24) -> Optional[str]:
+        """Generate a read-only SAS token covering every blob in the container."""
+        container_name = self.containers.get(container_type)
+        if not container_name:
+            raise ValueError(f"Invalid container type: {container_type}")
+        return self._get_sas_signer().container_sas(container_name, expiry_hours)
+    
+    def _blob_url(self, container_client, blob_name: str, sas_token: Optional[str]) -> str:
+        """Build a blob URL without constructing a blob client."""
+        url = f"{container_client.url}/{quote(blob_name, safe='/')}"
+        return f"{url}?{sas_token}" if sas_token else url
     
     async def delete_file(self, filename: str, container_type: str = 'media') -> bool:
         """Delete a file from Azure Blob Storage."""
         try:
             container_client = self._get_container_client(container_type)
             blob_client = container_client.get_blob_client(filename)
-            blob_client.delete_blob()
+            await self._call(blob_client.delete_blob)
             return True
         except ResourceNotFoundError:
             return False
         except Exception as e:
             raise Exception(f"Error deleting file: {str(e)}")
     
+    async def download_file(self, filename: str, container_type: str = 'media') -> bytes:
+        """Download a whole blob into memory (only for small files such as images)."""
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            downloader = await self._call(blob_client.download_blob)
+            return await self._call(downloader.readall)
+        except Exception as e:
+            raise Exception(f"Error downloading file: {str(e)}")
+    
+    async def download_to_file(self, filename: str, path: str, container_type: str = 'media') -> int:
+        """
+        Stream a blob to a local file and return its size.
+        
+        Only one chunk is held in memory; the file is opened and written in a
+        worker thread so large blobs don't block the event loop.
+        """
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            downloader = await self._call(blob_client.download_blob)
+            local_file = await asyncio.to_thread(open, path, 'wb')
+            size = 0
+            try:
+                if self.use_thread_offload:
+                    chunks = downloader.chunks()
+                    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                        await asyncio.to_thread(local_file.write, chunk)
+                        size += len(chunk)
+                else:
+                    async for chunk in downloader.chunks():
+                        await asyncio.to_thread(local_file.write, chunk)
+                        size += len(chunk)
+            finally:
+                await asyncio.to_thread(local_file.close)
+            return size
+        except Exception as e:
+            raise Exception(f"Error downloading file: {str(e)}")
+    
+    async def update_file_metadata(self, filename: str, container_type: str,
+                                   metadata: Dict[str, str]) -> Dict[str, str]:
+        """Merge ``metadata`` into the blob's existing metadata and return the result."""
+        try:
+            container_client = self._get_container_client(container_type)
+            blob_client = container_client.get_blob_client(filename)
+            properties = await self._call(blob_client.get_blob_properties)
+            merged = {**(properties.metadata or {}), **metadata}
+            # Only replace the metadata if nobody changed the blob in between
+            await self._call(
+                blob_client.set_blob_metadata,
+                merged,
+                etag=properties.etag,
+                match_condition=MatchConditions.IfNotModified
+            )
+            return merged
+        except Exception as e:
+            raise Exception(f"Error updating file metadata: {str(e)}")
+    
     async def get_file_url(self, filename: str, container_type: str = 'media', 
                           generate_sas: bool = True) -> Optional[str]:
         """Get the URL for a file, optionally with a SAS token."""
@@ -118,19 +580,102 @@ class StorageService:
         except Exception as e:
             raise Exception(f"Error getting file URL: {str(e)}")
     
-    async def list_files(self, container_type: str = 'media', 
-                        prefix: Optional[str] = None) -> list:
-        """List files in a container, optionally filtered by prefix."""
+    def _encode_page_token(self, container_type: str, prefix: Optional[str], token: str) -> str:
+        """Wrap an Azure continuation token so clients can't reuse it against another listing."""
+        payload = json.dumps({'c': container_type, 'p': prefix, 't': token})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    def _decode_page_token(self, container_type: str, prefix: Optional[str], page_token: str) -> str:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+        except Exception:
+            raise ValueError("Invalid page token")
+        if payload.get('c') != container_type or payload.get('p') != prefix:
+            raise ValueError("Page token does not match this listing")
+        return payload['t']
+    
+    def _file_entry(self, container_client, container_type: str, blob,
+                    shared_token: Optional[str] = None) -> Dict[str, Any]:
+        token = shared_token or self._generate_sas_token(container_type, blob.name)
+        return {
+            'name': blob.name,
+            'url': self._blob_url(container_client, blob.name, token),
+            'size': blob.size,
+            'last_modified': blob.last_modified,
+            'content_type': blob.content_settings.content_type
+        }
+    
+    @staticmethod
+    def _matches(blob, content_type: Optional[str], modified_since: Optional[datetime]) -> bool:
+        """Server-side filters; ``content_type`` matches by prefix, so 'video/' selects all videos."""
+        if content_type and not (blob.content_settings.content_type or '').startswith(content_type):
+            return False
+        if modified_since:
+            if modified_since.tzinfo is None:
+                modified_since = modified_since.replace(tzinfo=timezone.utc)
+            if blob.last_modified < modified_since:
+                return False
+        return True
+    
+    async def list_files_page(self, container_type: str = 'media',
+                              prefix: Optional[str] = None,
+                              limit: int = 100,
+                              page_token: Optional[str] = None,
+                              content_type: Optional[str] = None,
+                              modified_since: Optional[datetime] = None,
+                              container_sas: bool = False) -> Dict[str, Any]:
+        """
+        List one page of files.
+        
+        Returns the files and an opaque ``next_page_token`` (None on the last
+        page). Filters are applied to each page after it is fetched, so a
+        filtered page may hold fewer than ``limit`` files.
+        """
+        continuation_token = self._decode_page_token(container_type, prefix, page_token) if page_token else None
         try:
             container_client = self._get_container_client(container_type)
-            blobs = container_client.list_blobs(name_starts_with=prefix)
-            
-            return [{
-                'name': blob.name,
-                'url': self._generate_sas_token(container_type, blob.name),
-                'size': blob.size,
-                'last_modified': blob.last_modified,
-                'content_type': blob.content_settings.content_type
-            } for blob in blobs]
+            shared_token = self._generate_container_sas_token(container_type) if container_sas else None
+            
+            async for blobs, next_token in self._iter_pages(container_client, page_size=limit,
+                                                            continuation_token=continuation_token,
+                                                            name_starts_with=prefix):
+                return {
+                    'files': [
+                        self._file_entry(container_client, container_type, blob, shared_token)
+                        for blob in blobs if self._matches(blob, content_type, modified_since)
+                    ],
+                    'next_page_token': self._encode_page_token(container_type, prefix, next_token) if next_token else None
+                }
+            return {'files': [], 'next_page_token': None}
+        except Exception as e:
+            raise Exception(f"Error listing files: {str(e)}")
+    
+    async def iter_files(self, container_type: str = 'media',
+                         prefix: Optional[str] = None,
+                         content_type: Optional[str] = None,
+                         modified_since: Optional[datetime] = None,
+                         container_sas: bool = False,
+                         page_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every matching file, fetching the listing page by page as it is consumed."""
+        container_client = self._get_container_client(container_type)
+        shared_token = self._generate_container_sas_token(container_type) if container_sas else None
+        async for blobs, _ in self._iter_pages(container_client, page_size=page_size, name_starts_with=prefix):
+            for blob in blobs:
+                if self._matches(blob, content_type, modified_since):
+                    yield self._file_entry(container_client, container_type, blob, shared_token)
+    
+    async def list_files(self, container_type: str = 'media', 
+                        prefix: Optional[str] = None,
+                        container_sas: bool = False) -> list:
+        """
+        List files in a container, optionally filtered by prefix.
+        
+        Each entry's URL carries a read-only SAS token. With ``container_sas``
+        one container-wide token is shared by every entry instead of a token
+        per blob. Prefer ``list_files_page`` or ``iter_files`` for large
+        containers.
+        """
+        try:
+            return [entry async for entry in self.iter_files(container_type, prefix, container_sas=container_sas)]
         except Exception as e:
-            raise Exception(f"Error listing files: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error listing files: {str(e)}")
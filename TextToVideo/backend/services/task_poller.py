@@ -0,0 +1,207 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Called with the retrieved task whenever its status or progress changes
+StatusCallback = Callable[[Any], None]
+
+SUCCEEDED_STATUSES = {'completed', 'SUCCEEDED'}
+FAILED_STATUSES = {'failed', 'FAILED', 'CANCELLED'}
+
+
+class TaskFailedError(Exception):
+    """Raised when a Runway task finishes in a failed or cancelled state."""
+
+    def __init__(self, task_id: str, status: str, failure: Optional[str] = None):
+        self.task_id = task_id
+        self.status = status
+        self.failure = failure
+        super().__init__(f"Task {task_id} {status.lower()}: {failure}")
+
+
+class _TrackedTask:
+    def __init__(self, task_id: str, future: asyncio.Future, interval: float, deadline: Optional[float]):
+        self.task_id = task_id
+        self.future = future
+        self.interval = interval
+        self.next_check = time.monotonic() + interval
+        self.deadline = deadline
+        self.errors = 0
+        self.last_status: Optional[str] = None
+        self.last_progress: Optional[float] = None
+        self.callbacks: List[StatusCallback] = []
+
+
+class RunwayTaskPoller:
+    """
+    Polls every in-flight Runway task from one shared coroutine.
+
+    Callers ``await poller.wait(task_id)`` and get the finished task back. On
+    each tick the poller retrieves the status of all tasks that are due in one
+    concurrent batch, then backs each task off from ``min_interval`` towards
+    ``max_interval`` so fresh tasks are checked quickly and long-running ones
+    cheaply. The client only needs a ``tasks.retrieve(task_id)`` method, which
+    may be sync (run in a thread) or async, so a local fake can stand in for
+    Runway.
+    """
+
+    def __init__(self,
+                 client: Any,
+                 min_interval: float = 1.0,
+                 max_interval: float = 10.0,
+                 backoff: float = 1.5,
+                 max_batch: int = 32,
+                 max_errors: int = 5,
+                 timeout: Optional[float] = 1800.0):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_batch = max_batch
+        self.max_errors = max_errors
+        self.timeout = timeout
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        """Number of tasks currently being tracked."""
+        return len(self._tasks)
+
+    def _ensure_running(self):
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait(self, task_id: str, timeout: Optional[float] = None,
+                   on_status: Optional[StatusCallback] = None) -> Any:
+        """
+        Wait until the task finishes and return its final retrieved state.
+
+        ``on_status(task)`` is called as soon as a poll sees the task's status
+        or progress change, so callers can push updates without polling. It
+        is removed again when this waiter returns, times out or is cancelled.
+        """
+        self._ensure_running()
+        tracked = self._tasks.get(task_id)
+        if tracked is None:
+            timeout = self.timeout if timeout is None else timeout
+            deadline = time.monotonic() + timeout if timeout else None
+            future = asyncio.get_running_loop().create_future()
+            tracked = _TrackedTask(task_id, future, self.min_interval, deadline)
+            self._tasks[task_id] = tracked
+            self._wakeup.set()
+        if on_status is not None:
+            tracked.callbacks.append(on_status)
+        try:
+            # Shield so one cancelled waiter does not cancel the shared future
+            return await asyncio.shield(tracked.future)
+        finally:
+            if on_status is not None and on_status in tracked.callbacks:
+                tracked.callbacks.remove(on_status)
+
+    async def stop(self):
+        """Stop the polling loop and fail any outstanding waiters."""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        for tracked in self._tasks.values():
+            if not tracked.future.done():
+                tracked.future.set_exception(RuntimeError("Task poller stopped"))
+        self._tasks.clear()
+
+    async def _retrieve(self, task_id: str) -> Any:
+        retrieve = self.client.tasks.retrieve
+        if inspect.iscoroutinefunction(retrieve):
+            return await retrieve(task_id)
+        result = await asyncio.to_thread(retrieve, task_id)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _resolve(self, tracked: _TrackedTask, result: Any = None, error: Optional[BaseException] = None):
+        self._tasks.pop(tracked.task_id, None)
+        if tracked.future.done():
+            return
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(result)
+
+    def _reschedule(self, tracked: _TrackedTask, now: float):
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+        tracked.next_check = now + tracked.interval
+
+    def _handle(self, tracked: _TrackedTask, outcome: Any, now: float):
+        if isinstance(outcome, BaseException):
+            tracked.errors += 1
+            if tracked.errors >= self.max_errors:
+                self._resolve(tracked, error=Exception(
+                    f"Error polling task {tracked.task_id}: {str(outcome)}"))
+            elif tracked.deadline is not None and now >= tracked.deadline:
+                self._resolve(tracked, error=TimeoutError(
+                    f"Task {tracked.task_id} did not finish in time (last error: {str(outcome)})"))
+            else:
+                self._reschedule(tracked, now)
+            return
+
+        tracked.errors = 0
+        status = getattr(outcome, 'status', None)
+        progress = getattr(outcome, 'progress', None)
+        if status != tracked.last_status or progress != tracked.last_progress:
+            for callback in tracked.callbacks:
+                try:
+                    callback(outcome)
+                except Exception as e:
+                    logger.warning("Status callback failed for task %s: %s", tracked.task_id, e)
+        tracked.last_status = status
+        tracked.last_progress = progress
+        if status in SUCCEEDED_STATUSES:
+            self._resolve(tracked, result=outcome)
+        elif status in FAILED_STATUSES:
+            failure = getattr(outcome, 'failure', None) or getattr(outcome, 'error', None)
+            self._resolve(tracked, error=TaskFailedError(tracked.task_id, status, failure))
+        elif tracked.deadline is not None and now >= tracked.deadline:
+            self._resolve(tracked, error=TimeoutError(
+                f"Task {tracked.task_id} did not finish in time (last status: {status})"))
+        else:
+            self._reschedule(tracked, now)
+
+    def _due(self, now: float) -> List[_TrackedTask]:
+        due = [t for t in self._tasks.values() if t.next_check <= now]
+        due.sort(key=lambda t: t.next_check)
+        return due[:self.max_batch]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            due = self._due(now)
+            if due:
+                outcomes = await asyncio.gather(
+                    *(self._retrieve(t.task_id) for t in due),
+                    return_exceptions=True
+                )
+                now = time.monotonic()
+                for tracked, outcome in zip(due, outcomes):
+                    self._handle(tracked, outcome, now)
+                continue
+
+            self._wakeup.clear()
+            if self._tasks:
+                delay = max(0.0, min(t.next_check for t in self._tasks.values()) - now)
+            else:
+                delay = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,203 @@
+import functools
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Generation stages take from milliseconds (cache, storage) to many minutes (Runway)
+STAGE_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+
+STAGE_SECONDS = Histogram(
+    'ttv_stage_seconds', 'Duration of each pipeline stage', ['stage'], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    'ttv_stage_errors_total', 'Pipeline stages that raised an exception', ['stage']
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'ttv_http_request_seconds', 'API request latency', ['method', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+_tracer = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every INFO and higher record but only a ``rate`` share of DEBUG records."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+def configure_logging(level: Optional[str] = None, debug_sample_rate: Optional[float] = None):
+    """
+    Set up leveled logging for the app (LOG_LEVEL, default INFO).
+
+    At DEBUG level, LOG_DEBUG_SAMPLE_RATE keeps only that share of debug
+    records, so per-request detail can stay on under load.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+def configure_tracing(service_name: Optional[str] = None) -> bool:
+    """
+    Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+    OpenTelemetry is optional; without the packages or the endpoint only the
+    Prometheus metrics are recorded.
+    """
+    global _tracer
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk is not installed")
+        return False
+    service_name = service_name or os.getenv("OTEL_SERVICE_NAME", "text-to-video")
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("texttovideo")
+    logger.info("Exporting traces to %s", os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"))
+    return True
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """
+    Time a pipeline stage: records ``ttv_stage_seconds{stage}``, counts
+    errors, logs the duration at DEBUG and, with tracing configured, emits an
+    OpenTelemetry span carrying ``attributes``. Works in sync and async code.
+    """
+    started = time.perf_counter()
+    otel_span = _tracer.start_as_current_span(stage, attributes={
+        key: str(value) for key, value in attributes.items() if value is not None
+    }) if _tracer is not None else None
+    if otel_span is not None:
+        otel_span.__enter__()
+    error: Optional[BaseException] = None
+    try:
+        yield
+    except Exception as e:
+        # Cancellation (e.g. the losing side of a hedged request) is not an error
+        STAGE_ERRORS.labels(stage).inc()
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if otel_span is not None:
+            otel_span.__exit__(type(error) if error else None, error,
+                               error.__traceback__ if error else None)
+        logger.debug("%s took %.3fs %s", stage, elapsed, attributes or "")
+
+
+def timed(stage: str):
+    """Decorator that runs an async function inside ``span(stage)``."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _StatsCollector:
+    """Reads queue depth, in-flight and cache numbers from the services when scraped."""
+
+    def __init__(self):
+        self.caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.schedulers: Dict[str, Callable[[], Dict[str, Dict[str, Any]]]] = {}
+        self.providers: Dict[str, Callable[[], Dict[str, Dict[str, Any]]]] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily('ttv_cache_hits', 'Cache hits', labels=['cache'])
+        misses = CounterMetricFamily('ttv_cache_misses', 'Cache misses', labels=['cache'])
+        entries = GaugeMetricFamily('ttv_cache_entries', 'Entries held in the cache', labels=['cache'])
+        size = GaugeMetricFamily('ttv_cache_bytes', 'Bytes held in the cache', labels=['cache'])
+        for name, stats in self.caches.items():
+            values = stats()
+            hits.add_metric([name], values.get('hits', 0))
+            misses.add_metric([name], values.get('misses', 0))
+            entries.add_metric([name], values.get('entries', 0))
+            size.add_metric([name], values.get('bytes', 0))
+        yield from (hits, misses, entries, size)
+
+        in_flight = GaugeMetricFamily('ttv_model_in_flight', 'Generations holding a slot', labels=['model'])
+        queued = GaugeMetricFamily('ttv_model_queue_depth', 'Generations waiting for a slot', labels=['model'])
+        limit = GaugeMetricFamily('ttv_model_concurrency_limit', 'Slots available per model', labels=['model'])
+        for stats in self.schedulers.values():
+            for model, values in stats().items():
+                in_flight.add_metric([model], values.get('active', 0))
+                queued.add_metric([model], values.get('queued', 0))
+                limit.add_metric([model], values.get('limit', 0))
+        yield from (in_flight, queued, limit)
+
+        provider_in_flight = GaugeMetricFamily(
+            'ttv_provider_in_flight', 'Generations running on a provider', labels=['provider'])
+        provider_failures = CounterMetricFamily(
+            'ttv_provider_failures', 'Failed or timed out generations', labels=['provider'])
+        for stats in self.providers.values():
+            for provider, values in stats().items():
+                provider_in_flight.add_metric([provider], values.get('in_flight', 0))
+                provider_failures.add_metric([provider], values.get('failures', 0))
+        yield from (provider_in_flight, provider_failures)
+
+        for name, value in self.gauges.items():
+            gauge = GaugeMetricFamily(name, name.replace('_', ' '))
+            gauge.add_metric([], value())
+            yield gauge
+
+
+_collector = _StatsCollector()
+REGISTRY.register(_collector)
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Any]]):
+    """Export a cache's ``stats()`` (hits, misses, entries, bytes) as ``ttv_cache_*{cache=name}``."""
+    _collector.caches[name] = stats
+
+
+def register_scheduler(name: str, stats: Callable[[], Dict[str, Dict[str, Any]]]):
+    """Export a scheduler's per-model ``stats()`` as in-flight, queue depth and limit gauges."""
+    _collector.schedulers[name] = stats
+
+
+def register_providers(name: str, stats: Callable[[], Dict[str, Dict[str, Any]]]):
+    """Export per-provider ``stats()`` (in_flight, failures) as ``ttv_provider_*{provider=...}``."""
+    _collector.providers[name] = stats
+
+
+def register_gauge(name: str, value: Callable[[], float]):
+    """Export ``value()`` as the gauge ``name`` at scrape time."""
+    _collector.gauges[name] = value
+
+
+def render_metrics() -> tuple:
+    """Return the Prometheus text exposition and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
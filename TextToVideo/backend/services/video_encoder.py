@@ -0,0 +1,181 @@
+import asyncio
+import subprocess
+import tempfile
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Size of each chunk read from ffmpeg when streaming to storage
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _peek(frames: Iterable[np.ndarray]) -> Tuple[np.ndarray, Iterator[np.ndarray]]:
+    """Return the first frame and an iterator over all frames, without buffering the rest."""
+    iterator = iter(frames)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        raise ValueError("No frames to encode")
+    return first, chain([first], iterator)
+
+
+class FFmpegVideoEncoder:
+    """
+    Encodes RGB frames by piping them as raw video into an ffmpeg subprocess.
+
+    Frames are written one at a time, so memory use does not depend on the
+    length of the video. ``output`` is a file path, or None to read the
+    encoded MP4 from ``stdout`` (written as fragmented MP4, which does not
+    need a seekable output).
+    """
+
+    def __init__(self,
+                 width: int,
+                 height: int,
+                 fps: int = 30,
+                 output: Optional[str] = None,
+                 codec: str = 'libx264',
+                 crf: int = 23,
+                 preset: str = 'veryfast',
+                 ffmpeg_binary: str = 'ffmpeg'):
+        self.width = width
+        self.height = height
+        self.output = output
+        self._stderr = tempfile.TemporaryFile()
+        args = [
+            ffmpeg_binary, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', 'pipe:0',
+            '-an',
+            '-c:v', codec, '-preset', preset, '-crf', str(crf),
+            # yuv420p keeps the output playable in browsers and mobile players
+            '-pix_fmt', 'yuv420p',
+        ]
+        if output:
+            args += ['-movflags', '+faststart', output]
+        else:
+            args += ['-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4', 'pipe:1']
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=None if output else subprocess.PIPE,
+            stderr=self._stderr
+        )
+
+    @property
+    def stdout(self):
+        return self.process.stdout
+
+    def write(self, frame: np.ndarray):
+        """Write one RGB frame of shape (height, width, 3)."""
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match "
+                             f"{self.width}x{self.height}")
+        # No copy unless the frame is not already contiguous uint8
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        self.process.stdin.write(memoryview(frame).cast('B'))
+
+    def close_input(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            self.process.stdin.close()
+
+    def finish(self) -> Optional[str]:
+        """Close the input, wait for ffmpeg and return the output path."""
+        self.close_input()
+        returncode = self.process.wait()
+        self._stderr.seek(0)
+        errors = self._stderr.read().decode(errors='replace').strip()
+        self._stderr.close()
+        if returncode != 0:
+            raise Exception(f"ffmpeg exited with code {returncode}: {errors}")
+        return self.output
+
+    def abort(self):
+        self.close_input()
+        self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+
+    def __enter__(self) -> "FFmpegVideoEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+
+def encode_frames(frames: Iterable[np.ndarray], output_path: str, fps: int = 30, **options: Any) -> str:
+    """Encode frames from any iterable (e.g. a generator) to an MP4 file."""
+    first, frames = _peek(frames)
+    height, width = first.shape[:2]
+    with FFmpegVideoEncoder(width, height, fps=fps, output=output_path, **options) as encoder:
+        for frame in frames:
+            encoder.write(frame)
+    return output_path
+
+
+async def encode_frames_to_storage(frames: Iterable[np.ndarray],
+                                   storage_service: Any,
+                                   filename: str,
+                                   container_type: str = 'videos',
+                                   fps: int = 30,
+                                   metadata: Optional[Dict[str, str]] = None,
+                                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                   **options: Any) -> Dict[str, Any]:
+    """
+    Encode frames and upload the output to blob storage as it is produced.
+
+    Frames are consumed and fed to ffmpeg on a worker thread while encoded
+    chunks are staged as blob blocks, so neither the frames nor the encoded
+    video are ever held in memory as a whole. The blob is only committed once
+    every frame was written and ffmpeg exited successfully.
+    """
+    first, frames = _peek(frames)
+    height, width = first.shape[:2]
+    encoder = FFmpegVideoEncoder(width, height, fps=fps, output=None, **options)
+    writer_errors: List[BaseException] = []
+
+    def feed():
+        try:
+            for frame in frames:
+                encoder.write(frame)
+        except BaseException as e:
+            writer_errors.append(e)
+        finally:
+            try:
+                encoder.close_input()
+            except BrokenPipeError:
+                pass
+
+    writer = threading.Thread(target=feed, name='ffmpeg-frame-writer', daemon=True)
+    writer.start()
+
+    async def chunks():
+        while True:
+            chunk = await asyncio.to_thread(encoder.stdout.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        # ffmpeg also ends cleanly when the frames stop early, so check both sides before
+        # upload_chunks commits the block list; failing here leaves only uncommitted blocks
+        await asyncio.to_thread(writer.join)
+        if writer_errors:
+            raise writer_errors[0]
+        await asyncio.to_thread(encoder.finish)
+
+    try:
+        result = await storage_service.upload_chunks(
+            chunks(),
+            filename,
+            container_type=container_type,
+            metadata=metadata
+        )
+    except BaseException:
+        encoder.abort()
+        raise
+    return result
@@ -1,76 +1,182 @@
 import os
 import torch
 from transformers import AutoProcessor, AutoModelForText2Image
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
-import cv2
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Callable
 import requests
-import json
+import uuid
 from dotenv import load_dotenv
+from services.video_encoder import encode_frames, encode_frames_to_storage
+from services.media_ingest import iter_source_media
+from services.video_scoring import QualityScorer, score_videos
+from services.model_registry import model_registry
+from services.audio_mux import mux_audio
 
 load_dotenv()
 
+SDXL_MODEL_ID = "stabilityai/stable-diffusion-xl-base-1.0"
+
+def _default_device() -> torch.device:
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def _load_sdxl():
+    """
+    Load the SDXL processor and model onto the default device.
+    
+    With MODEL_LOW_MEMORY=1 weights are loaded in half precision (bf16 on CPU,
+    fp16 on GPU) from memory-mapped safetensors, roughly halving resident memory.
+    """
+    device = _default_device()
+    options = {}
+    if os.getenv("MODEL_LOW_MEMORY") == "1":
+        options = {
+            "torch_dtype": torch.float16 if device.type == "cuda" else torch.bfloat16,
+            "use_safetensors": True,
+            "low_cpu_mem_usage": True
+        }
+    processor = AutoProcessor.from_pretrained(SDXL_MODEL_ID)
+    model = AutoModelForText2Image.from_pretrained(SDXL_MODEL_ID, **options)
+    model.to(device)
+    model.eval()
+    return processor, model
+
+model_registry.register(SDXL_MODEL_ID, _load_sdxl)
+
+def warm_up_models() -> List[str]:
+    """Load the local generation models now rather than on the first request."""
+    return model_registry.warm_up([SDXL_MODEL_ID])
+
 class VideoGenerator:
     def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.processor = AutoProcessor.from_pretrained("stabilityai/stable-diffusion-xl-base-1.0")
-        self.model = AutoModelForText2Image.from_pretrained("stabilityai/stable-diffusion-xl-base-1.0")
-        self.model.to(self.device)
+        # The model itself is loaded from the shared registry on first use
+        self.device = _default_device()
         
         # Initialize API keys
         self.runwayml_api_key = os.getenv("RUNWAYML_API_KEY")
         self.pikalabs_api_key = os.getenv("PIKALABS_API_KEY")
         
-    def generate_frames(self, prompt: str, num_frames: int = 60) -> List[np.ndarray]:
-        """
-        Generate video frames using Stable Diffusion
-        """
-        frames = []
-        for _ in range(num_frames):
-            inputs = self.processor(prompt, return_tensors="pt").to(self.device)
-            with torch.no_grad():
-                output = self.model.generate(**inputs)
-            frame = output.images[0].numpy()
-            frames.append(frame)
-        return frames
+        # Reuse connections between API calls and never wait forever on a provider
+        self.session = requests.Session()
+        self.request_timeout = (10, float(os.getenv("PROVIDER_REQUEST_TIMEOUT_SECONDS", "60")))
+        
+    @property
+    def processor(self):
+        return model_registry.get(SDXL_MODEL_ID)[0]
     
-    def create_video_from_frames(self, frames: List[np.ndarray], fps: int = 30) -> str:
-        """
-        Convert frames to video
+    @property
+    def model(self):
+        return model_registry.get(SDXL_MODEL_ID)[1]
+    
+    def _generate_batch(self, model, inputs, count: int, generator=None) -> List[np.ndarray]:
+        """Run the model once for ``count`` frames by repeating the tokenized prompt along the batch axis."""
+        batch = {
+            key: value.repeat(count, *[1] * (value.dim() - 1)) if torch.is_tensor(value) else value
+            for key, value in inputs.items()
+        }
+        with torch.no_grad():
+            output = model.generate(**batch, generator=generator)
+        return [image.numpy() for image in output.images[:count]]
+    
+    def iter_frames(self, prompt: str, num_frames: int = 60, batch_size: int = 4,
+                    seed: Optional[int] = None, keyframe_interval: int = 1,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[np.ndarray]:
         """
-        height, width = frames[0].shape[:2]
-        output_path = f"output_{hash(str(frames))}.mp4"
+        Generate video frames using Stable Diffusion, yielding them as they are ready
+        
+        The prompt is tokenized once and frames are generated ``batch_size`` at
+        a time. With ``seed`` the random generator is fixed so results are
+        reproducible. With ``keyframe_interval`` > 1 only every n-th frame (and
+        the last one) is generated by the model; the frames in between are
+        interpolated from their neighbouring keyframes, which costs a small
+        fraction of a model call. ``progress_callback(done, total)`` is called
+        after each batch with the number of keyframes generated so far; an
+        exception it raises stops the generation.
         
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        Frames are yielded after every batch, so an encoder can consume them
+        while the next batch is generated and the video is never held whole.
+        The model is held in the registry until the generator finishes or is
+        closed, so an idle unload can't remove it between batches.
+        """
+        if num_frames <= 0:
+            return
+        with model_registry.use(SDXL_MODEL_ID) as (processor, model):
+            yield from self._iter_frames(processor, model, prompt, num_frames, batch_size, seed,
+                                         keyframe_interval, progress_callback)
+    
+    def _iter_frames(self, processor, model, prompt: str, num_frames: int, batch_size: int,
+                     seed: Optional[int], keyframe_interval: int,
+                     progress_callback: Optional[Callable[[int, int], None]]) -> Iterator[np.ndarray]:
+        inputs = processor(prompt, return_tensors="pt").to(self.device)
+        generator = torch.Generator(device=self.device).manual_seed(seed) if seed is not None else None
         
-        for frame in frames:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            out.write(frame)
+        keyframe_interval = max(1, keyframe_interval)
+        keyframe_indices = list(range(0, num_frames, keyframe_interval))
+        if keyframe_indices[-1] != num_frames - 1:
+            keyframe_indices.append(num_frames - 1)
         
-        out.release()
-        return output_path
+        previous = None
+        for start in range(0, len(keyframe_indices), batch_size):
+            count = min(batch_size, len(keyframe_indices) - start)
+            batch = self._generate_batch(model, inputs, count, generator)
+            if progress_callback:
+                progress_callback(start + count, len(keyframe_indices))
+            for index, keyframe in zip(keyframe_indices[start:start + count], batch):
+                if previous is not None:
+                    left_index, left = previous
+                    left_f = left.astype(np.float32)
+                    right_f = keyframe.astype(np.float32)
+                    span = index - left_index
+                    for offset in range(1, span):
+                        weight = offset / span
+                        yield ((1.0 - weight) * left_f + weight * right_f).astype(left.dtype)
+                yield keyframe
+                previous = (index, keyframe)
     
-    def add_audio(self, video_path: str, audio_path: str) -> str:
+    def generate_frames(self, prompt: str, num_frames: int = 60, batch_size: int = 4,
+                        seed: Optional[int] = None, keyframe_interval: int = 1,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> List[np.ndarray]:
         """
-        Add background audio to video
+        Generate all video frames at once; see ``iter_frames``
         """
-        video = VideoFileClip(video_path)
-        audio = AudioFileClip(audio_path)
-        
-        # Loop audio if it's shorter than video
-        if audio.duration < video.duration:
-            audio = audio.loop(duration=video.duration)
-        else:
-            audio = audio.subclip(0, video.duration)
+        return list(self.iter_frames(prompt, num_frames=num_frames, batch_size=batch_size, seed=seed,
+                                     keyframe_interval=keyframe_interval, progress_callback=progress_callback))
+    
+    def create_video_from_frames(self, frames: Iterable[np.ndarray], fps: int = 30,
+                                 output_path: Optional[str] = None, codec: str = 'libx264',
+                                 crf: int = 23, preset: str = 'veryfast') -> str:
+        """
+        Convert frames to video
         
-        # Combine video and audio
-        final_video = video.set_audio(audio)
-        output_path = f"final_{os.path.basename(video_path)}"
-        final_video.write_videofile(output_path)
+        ``frames`` may be any iterable of RGB arrays, including a generator;
+        frames are piped to ffmpeg one at a time and encoded as H.264.
+        """
+        if output_path is None:
+            output_path = f"output_{uuid.uuid4().hex}.mp4"
+        return encode_frames(frames, output_path, fps=fps, codec=codec, crf=crf, preset=preset)
+    
+    async def upload_video_from_frames(self, frames: Iterable[np.ndarray], storage_service,
+                                       filename: Optional[str] = None, container_type: str = 'videos',
+                                       fps: int = 30, **options) -> Dict:
+        """
+        Encode frames and stream the encoded video straight into blob storage
+        """
+        if filename is None:
+            filename = f"{uuid.uuid4()}.mp4"
+        return await encode_frames_to_storage(
+            frames, storage_service, filename, container_type=container_type, fps=fps, **options
+        )
+    
+    def add_audio(self, video_path: str, audio_path: str, output_path: Optional[str] = None) -> str:
+        """
+        Add background audio to video
         
-        return output_path
+        The video stream is copied as is and only the audio is encoded, looped
+        or trimmed to the video's length by ffmpeg. The result is written next
+        to the input video unless ``output_path`` is given.
+        """
+        if output_path is None:
+            output_path = os.path.join(os.path.dirname(video_path), f"final_{os.path.basename(video_path)}")
+        return mux_audio(video_path, audio_path, output_path)
     
     def generate_with_runwayml(self, prompt: str, duration: int = 120) -> Dict:
         """
@@ -87,10 +193,11 @@ class VideoGenerator:
             "model": "gen-2"
         }
         
-        response = requests.post(
+        response = self.session.post(
             "https://api.runwayml.com/v1/generate",
             headers=headers,
-            json=data
+            json=data,
+            timeout=self.request_timeout
         )
         
         return response.json()
@@ -110,69 +217,58 @@ class VideoGenerator:
             "model": "pika-1"
         }
         
-        response = requests.post(
+        response = self.session.post(
             "https://api.pikalabs.ai/v1/generate",
             headers=headers,
-            json=data
+            json=data,
+            timeout=self.request_timeout
         )
         
         return response.json()
     
-    def process_source_media(self, media_paths: List[str]) -> List[np.ndarray]:
+    def iter_source_media(self, media_paths: List[str], stride: int = 1,
+                          target_fps: Optional[float] = None, start: Optional[float] = None,
+                          end: Optional[float] = None, resolution: Optional[int] = None,
+                          workers: int = 0) -> Iterator[np.ndarray]:
+        """
+        Lazily iterate frames of source media (images/videos) for video generation
+        
+        See ``services.media_ingest.iter_source_media`` for the options.
+        """
+        return iter_source_media(
+            media_paths,
+            stride=stride,
+            target_fps=target_fps,
+            start=start,
+            end=end,
+            resolution=resolution,
+            workers=workers
+        )
+    
+    def process_source_media(self, media_paths: List[str], **options) -> List[np.ndarray]:
         """
         Process source media (images/videos) for video generation
+        
+        Materializes every frame; prefer ``iter_source_media`` for long videos.
         """
-        processed_frames = []
-        
-        for path in media_paths:
-            if path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                frame = cv2.imread(path)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                processed_frames.append(frame)
-            elif path.lower().endswith(('.mp4', '.avi', '.mov')):
-                cap = cv2.VideoCapture(path)
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    processed_frames.append(frame)
-                cap.release()
-        
-        return processed_frames
+        return list(self.iter_source_media(media_paths, **options))
     
-    def select_best_video(self, video_paths: List[str], criteria: Optional[Dict] = None) -> str:
+    def select_best_video(self, video_paths: List[str], criteria: Optional[Dict] = None,
+                          scorer: Optional[QualityScorer] = None,
+                          max_workers: Optional[int] = None) -> Optional[str]:
         """
         Select the best video based on quality metrics
-        """
-        if not criteria:
-            criteria = {
-                "resolution": 1080,
-                "min_duration": 60,
-                "max_duration": 180
-            }
         
+        Candidates are probed from their container headers and scored in
+        parallel. Pass ``scorer`` (e.g. ``SharpnessMotionScorer()``) to also
+        weigh sampled-frame quality.
+        """
         best_video = None
         best_score = -1
         
-        for path in video_paths:
-            cap = cv2.VideoCapture(path)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            duration = frame_count / fps
-            
-            # Calculate quality score
-            resolution_score = min(width, height) / criteria["resolution"]
-            duration_score = 1.0 if criteria["min_duration"] <= duration <= criteria["max_duration"] else 0.5
-            
-            total_score = resolution_score * duration_score
-            
-            if total_score > best_score:
-                best_score = total_score
-                best_video = path
-            
-            cap.release()
-        
-        return best_video 
\ No newline at end of file
+        for result in score_videos(video_paths, criteria, scorer, max_workers):
+            if result["score"] > best_score:
+                best_score = result["score"]
+                best_video = result["path"]
+        
+        return best_video
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import logging
+import re
+import shutil
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from services.pipeline import Pipeline
+from services.prompt_cache import PromptCache
+from services.providers import HTTPSessionPool
+from services.storage_service import DEFAULT_CHUNK_SIZE
+from services.telemetry import span, timed
+
+logger = logging.getLogger(__name__)
+
+
+MIRROR_MODES = ("ranges", "server", "off")
+
+_CONTENT_RANGE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+
+def _source_key(url: str) -> str:
+    """Provider URLs carry expiring signatures in the query; the path identifies the file."""
+    parts = urlsplit(url)
+    return hashlib.sha256(f"{parts.netloc}{parts.path}".encode("utf-8")).hexdigest()
+
+
+class VideoMirror:
+    """
+    Copies generated videos from the provider into our own storage.
+
+    Provider URLs expire, so every finished video is copied into the
+    ``videos`` container and clients get a SAS URL from our storage. In
+    ``ranges`` mode the video is downloaded with parallel HTTP range requests,
+    each range staged as a block as soon as it arrives; ``server`` mode lets
+    Azure fetch the URL itself (Copy Blob). A JPEG thumbnail of the first
+    keyframe is written to the ``thumbnails`` container at the same time.
+    Copies are remembered by source URL, so a cached generation that returns
+    the same video again is not copied twice, as long as the copy still
+    exists in the videos container.
+    """
+
+    def __init__(self, storage_service: Any, sessions: HTTPSessionPool, mode: str = "ranges",
+                 range_size: int = 2 * DEFAULT_CHUNK_SIZE, max_concurrency: int = 4,
+                 thumbnail_width: int = 480, ffmpeg_binary: str = 'ffmpeg',
+                 cache_size: int = 4096, retries: int = 3):
+        if mode not in MIRROR_MODES:
+            raise ValueError(f"Unknown mirror mode: {mode}")
+        self.storage_service = storage_service
+        self.sessions = sessions
+        self.mode = mode
+        self.range_size = range_size
+        self.max_concurrency = max_concurrency
+        self.thumbnail_width = thumbnail_width
+        self.ffmpeg_binary = ffmpeg_binary
+        self.retries = retries
+        # Our blobs don't expire, but they can be deleted: mirror() checks a cached copy before using it
+        self.cache = PromptCache(max_entries=cache_size, max_age=float("inf"))
+
+    async def _fetch_range(self, url: str, start: int, end: int) -> bytes:
+        session = self.sessions.get("mirror")
+        for attempt in range(self.retries):
+            try:
+                async with session.get(url, headers={"Range": f"bytes={start}-{end}"}) as response:
+                    if response.status != 206:
+                        raise Exception(f"Range request returned {response.status}")
+                    return await response.read()
+            except Exception:
+                if attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+    async def _copy_ranges(self, url: str, filename: str, metadata: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        session = self.sessions.get("mirror")
+        # A one-byte range request tells us the size and whether ranges are supported
+        async with session.get(url, headers={"Range": "bytes=0-0"}) as response:
+            if response.status >= 400:
+                raise Exception(f"Source returned {response.status}")
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status != 206 or match is None:
+                # No range support: stream the body through in order instead
+                return await self.storage_service.upload_chunks(
+                    response.content.iter_chunked(self.range_size),
+                    filename,
+                    container_type='videos',
+                    metadata=metadata,
+                    max_concurrency=self.max_concurrency
+                )
+            size = int(match.group(1))
+        return await self.storage_service.upload_ranges(
+            lambda start, end: self._fetch_range(url, start, end),
+            size,
+            filename,
+            container_type='videos',
+            metadata=metadata,
+            block_size=self.range_size,
+            max_concurrency=self.max_concurrency
+        )
+
+    async def mirror(self, source_url: str, metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Copy a video into the videos container; returns video_blob, size and a fresh SAS video_url."""
+        key = _source_key(source_url)
+        copied = False
+
+        async def copy():
+            nonlocal copied
+            copied = True
+            filename = f"{key[:32]}.mp4"
+            with span("mirror_video", mode=self.mode):
+                if self.mode == "server":
+                    stored = await self.storage_service.copy_from_url(
+                        source_url, filename, container_type='videos', metadata=metadata)
+                else:
+                    stored = await self._copy_ranges(source_url, filename, metadata)
+            logger.debug("Mirrored %d bytes into %s", stored['size'], filename)
+            return {"video_blob": filename, "size": stored["size"]}
+
+        # Sized by the stored blob, so the cache stats report how much it has mirrored
+        stored = await self.cache.get_or_create(key, copy, size_of=lambda value: value["size"])
+        if not copied and not await self.storage_service.file_exists(stored["video_blob"], 'videos'):
+            # Deleted since it was mirrored (e.g. through DELETE /files); copy it again
+            logger.info("Mirrored video %s is gone, copying it again", stored["video_blob"])
+            self.cache.invalidate(key)
+            stored = await self.cache.get_or_create(key, copy, size_of=lambda value: value["size"])
+        return {
+            **stored,
+            "video_url": await self.storage_service.get_file_url(stored["video_blob"], 'videos')
+        }
+
+    @timed("thumbnail")
+    async def thumbnail(self, video_url: str, name: str) -> Dict[str, Any]:
+        """Write a JPEG of the video's first keyframe to the thumbnails container."""
+        if not shutil.which(self.ffmpeg_binary):
+            raise Exception(f"{self.ffmpeg_binary} not found")
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg_binary, '-v', 'error',
+            # Only decode keyframes, so this stops after the first one
+            '-skip_frame', 'nokey', '-i', video_url,
+            '-frames:v', '1',
+            '-vf', f"scale='min({self.thumbnail_width},iw)':-2",
+            '-f', 'image2pipe', '-c:v', 'mjpeg', 'pipe:1',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        image, errors = await process.communicate()
+        if process.returncode != 0 or not image:
+            raise Exception(f"Error creating thumbnail: {errors.decode(errors='replace')[-300:]}")
+        stored = await self.storage_service.upload_file(image, f"{name}.jpg", container_type='thumbnails')
+        return {"thumbnail_blob": stored["filename"], "thumbnail_url": stored["sas_url"] or stored["url"]}
+
+    async def store_result(self, result: Dict[str, Any],
+                           metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Make a generation result point at our own storage.
+
+        Copies the video unless it is already stored (local renders carry
+        ``blob``) and creates the thumbnail concurrently. Returns the fields
+        to merge into the result; the provider URL is kept as
+        ``source_video_url``. A failed thumbnail is skipped.
+        """
+        source_url = result["video_url"]
+        name = result.get("blob", "").rsplit(".", 1)[0] or _source_key(source_url)[:32]
+        pipeline = Pipeline()
+        if result.get("blob"):
+            async def existing():
+                return {"video_blob": result["blob"], "video_url": source_url}
+            pipeline.add("video", existing)
+        elif self.mode == "off":
+            async def unchanged():
+                return {}
+            pipeline.add("video", unchanged)
+        else:
+            pipeline.add("video", lambda: self.mirror(source_url, metadata))
+        pipeline.add("thumbnail", lambda: self.thumbnail(source_url, name), required=False)
+        results = await pipeline.run()
+        stored = {**results["video"], **(results["thumbnail"] or {})}
+        if stored.get("video_url", source_url) != source_url:
+            stored["source_video_url"] = source_url
+        return stored
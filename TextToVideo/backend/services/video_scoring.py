@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from services.media_probe import probe_video
+
+DEFAULT_CRITERIA = {
+    "resolution": 1080,
+    "min_duration": 60,
+    "max_duration": 180
+}
+
+# A scorer takes (path, probe info) and returns a quality factor in [0, 1]
+QualityScorer = Callable[[str, Dict[str, Any]], float]
+
+
+def _laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian, a standard sharpness measure."""
+    center = gray[1:-1, 1:-1]
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]) - 4.0 * center
+    return float(laplacian.var())
+
+
+class SharpnessMotionScorer:
+    """
+    Scores a video from a few sampled frames.
+
+    Sharpness is the Laplacian variance of each sample; motion is the mean
+    absolute difference between consecutive samples. Blurry or static videos
+    score low, as do videos whose motion is so large they are mostly noise.
+    All metrics are computed on downscaled grayscale frames with NumPy.
+    """
+
+    def __init__(self, samples: int = 5, width: int = 320,
+                 sharpness_target: float = 500.0, motion_range: tuple = (0.01, 0.25)):
+        self.samples = samples
+        self.width = width
+        self.sharpness_target = sharpness_target
+        self.motion_range = motion_range
+
+    def _sample_frames(self, path: str, frame_count: int) -> List[np.ndarray]:
+        cap = cv2.VideoCapture(path)
+        frames = []
+        try:
+            positions = np.linspace(0, max(frame_count - 1, 0), self.samples).astype(int)
+            for position in positions:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+                ret, frame = cap.read()
+                if not ret:
+                    continue
+                height, width = frame.shape[:2]
+                if width > self.width:
+                    frame = cv2.resize(frame, (self.width, round(height * self.width / width)),
+                                       interpolation=cv2.INTER_AREA)
+                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float32))
+        finally:
+            cap.release()
+        return frames
+
+    def metrics(self, path: str, info: Dict[str, Any]) -> Dict[str, float]:
+        frames = self._sample_frames(path, info.get("frame_count", 0))
+        if not frames:
+            return {"sharpness": 0.0, "motion": 0.0}
+        stack = np.stack(frames)
+        sharpness = float(np.mean([_laplacian_variance(frame) for frame in stack]))
+        motion = float(np.abs(np.diff(stack, axis=0)).mean() / 255.0) if len(stack) > 1 else 0.0
+        return {"sharpness": sharpness, "motion": motion}
+
+    def __call__(self, path: str, info: Dict[str, Any]) -> float:
+        metrics = self.metrics(path, info)
+        sharpness_score = min(1.0, metrics["sharpness"] / self.sharpness_target)
+        low, high = self.motion_range
+        motion = metrics["motion"]
+        if motion < low:
+            motion_score = 0.5 + 0.5 * motion / low
+        elif motion > high:
+            motion_score = max(0.5, 1.0 - (motion - high))
+        else:
+            motion_score = 1.0
+        return sharpness_score * motion_score
+
+
+def score_video(path: str, criteria: Optional[Dict] = None,
+                scorer: Optional[QualityScorer] = None) -> Dict[str, Any]:
+    """Score one video on resolution and duration, optionally weighted by a quality scorer."""
+    criteria = {**DEFAULT_CRITERIA, **(criteria or {})}
+    info = probe_video(path)
+    # probe_video reports a zero duration rather than dividing by a zero fps
+    duration = info["duration"]
+
+    resolution_score = min(info["width"], info["height"]) / criteria["resolution"]
+    duration_score = 1.0 if criteria["min_duration"] <= duration <= criteria["max_duration"] else 0.5
+    total_score = resolution_score * duration_score
+    if scorer is not None:
+        total_score *= scorer(path, info)
+    return {"path": path, "score": total_score, **info}
+
+
+def score_videos(video_paths: List[str], criteria: Optional[Dict] = None,
+                 scorer: Optional[QualityScorer] = None,
+                 max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Score several videos in parallel; probing and sampling are IO/subprocess bound."""
+    if not video_paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, len(video_paths))) as executor:
+        return list(executor.map(lambda path: score_video(path, criteria, scorer), video_paths))
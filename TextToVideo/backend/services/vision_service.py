@@ -0,0 +1,88 @@
+import asyncio
+import io
+from typing import Any, Dict, Optional
+from services.prompt_cache import PromptCache
+from services.telemetry import timed
+
+VISUAL_FEATURES = ['Description', 'Tags', 'Categories']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _metadata_value(value: str) -> str:
+    """Blob metadata values must be plain ASCII on a single line."""
+    return value.encode('ascii', 'ignore').decode().replace('\n', ' ')
+
+
+class VisionAnalysisService:
+    """
+    Runs Computer Vision analysis of uploaded images after the upload has returned.
+
+    Each analysis is tracked as a job in the job store. Results are stored as
+    metadata on the blob itself and cached by the content's SHA-256, so
+    re-uploading the same image never calls Vision again (concurrent
+    analyses of the same content share one call).
+    """
+
+    def __init__(self, vision_client: Any, storage_service: Any, job_store: Any,
+                 max_concurrency: int = 4, cache_size: int = 4096):
+        self.vision_client = vision_client
+        self.storage_service = storage_service
+        self.job_store = job_store
+        self.max_concurrency = max_concurrency
+        self.cache = PromptCache(max_entries=cache_size, max_age=30 * 24 * 3600)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def is_image(filename: str) -> bool:
+        return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+    def _to_dict(self, image_analysis) -> Dict[str, Any]:
+        return {
+            "description": image_analysis.description.captions[0].text if image_analysis.description.captions else None,
+            "tags": [tag.name for tag in image_analysis.tags],
+            "categories": [category.name for category in image_analysis.categories]
+        }
+
+    @timed("vision_analysis")
+    async def _call_vision(self, filename: str, container_type: str) -> Dict[str, Any]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._slots:
+            # Let Vision fetch the blob itself when we can hand it a signed URL
+            url = await self.storage_service.get_file_url(filename, container_type)
+            if url and '?' in url:
+                image_analysis = await asyncio.to_thread(
+                    self.vision_client.analyze_image, url, visual_features=VISUAL_FEATURES)
+            else:
+                content = await self.storage_service.download_file(filename, container_type)
+                image_analysis = await asyncio.to_thread(
+                    self.vision_client.analyze_image_in_stream, io.BytesIO(content),
+                    visual_features=VISUAL_FEATURES)
+        return self._to_dict(image_analysis)
+
+    async def submit(self, analysis_id: str, filename: str, container_type: str) -> Dict[str, Any]:
+        """Register a queued analysis job and return the handle given to the client."""
+        await self.job_store.create_async(analysis_id, {
+            "status": "queued",
+            "type": "image_analysis",
+            "filename": filename,
+            "container": container_type
+        })
+        return {"analysis_id": analysis_id, "status": "queued"}
+
+    async def analyze(self, analysis_id: str, filename: str, container_type: str, content_sha256: str):
+        """Background task: analyze the blob, store results as blob metadata and on the job."""
+        if not await self.job_store.transition_async(analysis_id, ["queued"], "processing"):
+            return
+        try:
+            analysis = await self.cache.get_or_create(
+                content_sha256, lambda: self._call_vision(filename, container_type))
+            await self.storage_service.update_file_metadata(filename, container_type, {
+                "content_sha256": content_sha256,
+                "analysis_description": _metadata_value(analysis["description"] or ""),
+                "analysis_tags": _metadata_value(",".join(analysis["tags"])),
+                "analysis_categories": _metadata_value(",".join(analysis["categories"]))
+            })
+            await self.job_store.update_async(analysis_id, {"status": "completed", "analysis": analysis})
+        except Exception as e:
+            await self.job_store.update_async(analysis_id, {"status": "failed", "error": str(e)})
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend as the API does: main and services.* from backend/,
+# and the offline fakes (fakes.py, fake_providers.py) from backend/scripts/
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SCRIPTS_DIR = os.path.join(BACKEND_DIR, 'scripts')
+for path in (SCRIPTS_DIR, BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def storage():
+    """StorageService over the in-memory blob store from scripts/fakes.py."""
+    from fakes import AZURITE_CONNECTION_STRING, InMemoryBlobServiceClient
+    from services.storage_service import StorageService
+    return StorageService(AZURITE_CONNECTION_STRING, blob_service_client=InMemoryBlobServiceClient())
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """
+    The API module (main.py), imported with its job store and output in a temporary
+    directory, no prewarm thread and a dummy Runway key
+    """
+    with pytest.MonkeyPatch.context() as env:
+        env.setenv("JOB_STORE_PATH", str(tmp_path_factory.mktemp("jobs") / "jobs.db"))
+        env.setenv("OUTPUT_DIR", str(tmp_path_factory.mktemp("output")))
+        env.setenv("SERVICES_PREWARM", "0")
+        env.setenv("RUNWAYML_API_SECRET", "test")
+        import main
+        yield main
+
+
+@pytest.fixture
+def api(main_module, storage, tmp_path, monkeypatch):
+    """
+    TestClient of the API with a fresh job store and event bus and the in-memory storage;
+    the other services are built again on first use
+    """
+    from fastapi.testclient import TestClient
+    from services.job_events import JobEventBus
+    from services.job_store import SQLiteJobStore
+    job_store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(main_module, "job_store", job_store)
+    monkeypatch.setattr(main_module, "job_events", JobEventBus(job_store, poll_interval=0.05))
+    monkeypatch.setattr(main_module, "storage_service", storage)
+    for name in ("runway_service", "vision_api_client", "vision_service", "http_sessions",
+                 "generation_router", "video_mirror", "audio_library"):
+        monkeypatch.setattr(main_module, name, None)
+    with TestClient(main_module.app) as client:
+        yield client
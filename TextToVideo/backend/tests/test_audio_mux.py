@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+from services.audio_mux import AudioLibrary
+
+
+@pytest.fixture
+def library(storage, tmp_path):
+    async def upload(*tracks):
+        for name, size in tracks:
+            await storage.upload_file(bytes([len(name)]) * size, name)
+
+    # Room for one 1000-byte track at a time
+    return AudioLibrary(storage, cache_dir=str(tmp_path / "audio"), max_bytes=1500), upload
+
+
+def test_tracks_are_downloaded_once_to_disk(library, storage):
+    library, upload = library
+    downloads = []
+    original = storage.download_to_file
+
+    async def counting(*args, **kwargs):
+        downloads.append(args[0])
+        return await original(*args, **kwargs)
+
+    storage.download_to_file = counting
+
+    async def scenario():
+        await upload(("music/a.mp3", 1000))
+
+        async def read():
+            async with library.use("music/a.mp3") as path:
+                with open(path, "rb") as audio:
+                    return audio.read()
+
+        return await asyncio.gather(*(read() for _ in range(5)))
+
+    contents = asyncio.run(scenario())
+    assert downloads == ["music/a.mp3"]
+    assert all(content == bytes([len("music/a.mp3")]) * 1000 for content in contents)
+    assert not [name for name in os.listdir(library.cache_dir) if name.endswith(".part")]
+
+
+def test_evicted_track_in_use_keeps_its_file_until_released(library):
+    library, upload = library
+
+    async def scenario():
+        await upload(("a.mp3", 1000), ("b.mp3", 1000))
+        async with library.use("a.mp3") as a_path:
+            # b evicts a, which a mux is still reading
+            async with library.use("b.mp3") as b_path:
+                assert library.cache.get("a.mp3") is None
+                assert os.path.exists(a_path)
+            assert os.path.exists(a_path)
+        assert not os.path.exists(a_path)
+        # b was not evicted and stays cached after use
+        assert os.path.exists(b_path)
+
+    asyncio.run(scenario())
+
+
+def test_unused_track_is_deleted_on_eviction(library):
+    library, upload = library
+
+    async def scenario():
+        await upload(("a.mp3", 1000), ("b.mp3", 1000))
+        async with library.use("a.mp3") as a_path:
+            pass
+        async with library.use("b.mp3"):
+            assert not os.path.exists(a_path)
+
+    asyncio.run(scenario())
+
+
+def test_track_cached_again_while_in_use_keeps_its_file(library):
+    library, upload = library
+
+    async def scenario():
+        await upload(("a.mp3", 1000), ("b.mp3", 1000))
+        async with library.use("a.mp3") as a_path:
+            async with library.use("b.mp3"):
+                pass
+            # a was evicted while pinned; using it again takes over the same file
+            async with library.use("a.mp3") as again:
+                assert again == a_path
+        assert os.path.exists(a_path)
+        assert library.cache.get("a.mp3") is not None
+
+    asyncio.run(scenario())
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from services.candidates import generate_candidates
+
+# What main.candidate_criteria(5) asks for: 720p, 4 to 7 seconds
+CRITERIA = {"resolution": 720, "min_duration": 4.0, "max_duration": 7.0}
+
+
+class FakeProvider:
+    """
+    Generates candidate ``seed`` after ``delays[seed]`` seconds.
+
+    Its videos are probed as ``videos[seed]`` (height, duration); seeds in
+    ``fails`` raise instead.
+    """
+
+    def __init__(self, videos, delays=None, fails=()):
+        self.videos = videos
+        self.delays = delays or {}
+        self.fails = set(fails)
+        self.started = []
+        self.cancelled = []
+
+    async def generate(self, seed, on_progress):
+        self.started.append(seed)
+        try:
+            on_progress({"progress": 0.5})
+            await asyncio.sleep(self.delays.get(seed, 0.0))
+        except asyncio.CancelledError:
+            self.cancelled.append(seed)
+            raise
+        if seed in self.fails:
+            raise RuntimeError(f"candidate {seed} failed")
+        return {"video_url": f"https://provider/{seed}.mp4", "provider": "fake"}
+
+    def probe(self, path):
+        seed = int(path.rsplit("/", 1)[1].split(".")[0])
+        if seed not in self.videos:
+            raise RuntimeError(f"cannot probe {path}")
+        height, duration = self.videos[seed]
+        return {"width": height * 16 // 9, "height": height, "duration": duration}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    def make(*args, **kwargs):
+        fake = FakeProvider(*args, **kwargs)
+        monkeypatch.setattr("services.video_scoring.probe_video", fake.probe)
+        return fake
+    return make
+
+
+def run(provider, num_candidates, **options):
+    return asyncio.run(generate_candidates(provider.generate, num_candidates, criteria=CRITERIA,
+                                           seed=0, **options))
+
+
+def test_best_scoring_candidate_is_selected(provider):
+    # A 1080p clip of the wrong length scores below a 720p clip of the right one
+    fake = provider({0: (480, 5.0), 1: (1080, 12.0), 2: (720, 5.0)})
+    updates = []
+    result = run(fake, 3, on_update=updates.append)
+
+    assert result["selected_candidate"] == 2
+    assert result["video_url"] == "https://provider/2.mp4"
+    assert result["score"] == pytest.approx(1.0)
+    scores = [candidate["score"] for candidate in result["candidates"]]
+    assert scores == [pytest.approx(480 / 720), pytest.approx(0.75), pytest.approx(1.0)]
+    assert all(candidate["status"] == "completed" for candidate in result["candidates"])
+    assert [candidate["seed"] for candidate in result["candidates"]] == [0, 1, 2]
+    # Updates are snapshots, not the live list
+    assert updates[0][0]["status"] == "running" and "score" not in updates[0][0]
+
+
+def test_threshold_returns_early_and_cancels_the_rest(provider):
+    fake = provider({0: (720, 5.0), 1: (1080, 5.0), 2: (1080, 5.0)}, delays={1: 5.0, 2: 5.0})
+
+    async def scenario():
+        result = await generate_candidates(fake.generate, 3, quality_threshold=0.9,
+                                           criteria=CRITERIA, seed=0)
+        # The losers have finished cancelling by the time the result is returned
+        return result, sorted(fake.cancelled)
+
+    result, cancelled = asyncio.run(scenario())
+    assert result["selected_candidate"] == 0
+    statuses = [candidate["status"] for candidate in result["candidates"]]
+    assert statuses == ["completed", "cancelled", "cancelled"]
+    assert cancelled == [1, 2]
+
+
+def test_threshold_not_reached_waits_for_every_candidate(provider):
+    fake = provider({0: (480, 5.0), 1: (720, 5.0)}, delays={1: 0.02})
+    result = run(fake, 2, quality_threshold=1.5)
+
+    assert result["selected_candidate"] == 1
+    assert fake.cancelled == []
+
+
+def test_failed_and_unscorable_candidates(provider):
+    # Candidate 1 fails; candidate 2 can't be probed, so it scores 0 but still counts
+    fake = provider({0: (480, 5.0)}, fails={1})
+    result = run(fake, 3)
+
+    assert result["selected_candidate"] == 0
+    candidates = result["candidates"]
+    assert candidates[1]["status"] == "failed" and "failed" in candidates[1]["error"]
+    assert candidates[2]["status"] == "completed" and candidates[2]["score"] == 0.0
+    assert "score_error" in candidates[2]
+
+
+def test_all_candidates_failing_raises(provider):
+    fake = provider({}, fails={0, 1})
+    with pytest.raises(Exception, match="all 2 failed"):
+        run(fake, 2)
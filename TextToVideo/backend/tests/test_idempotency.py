@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+@pytest.fixture
+def submit(api, main_module, monkeypatch):
+    """POST /generate-video without running the generation; returns (response, started job ids)."""
+    started = []
+
+    async def process_video_generation(job_id, *args):
+        started.append(job_id)
+
+    monkeypatch.setattr(main_module, "process_video_generation", process_video_generation)
+
+    def post(prompt="a sunset over the ocean", key=None, **params):
+        headers = {"Idempotency-Key": key} if key else {}
+        return api.post("/generate-video", params={"prompt": prompt, **params}, headers=headers)
+
+    post.started = started
+    return post
+
+
+def test_same_idempotency_key_returns_the_existing_job(submit):
+    first = submit(key="order-1").json()
+    again = submit(key="order-1").json()
+
+    assert first["duplicate"] is False
+    assert again["duplicate"] is True and again["job_id"] == first["job_id"]
+    assert submit.started == [first["job_id"]]
+
+
+def test_idempotency_key_reused_for_another_request_is_rejected(submit):
+    submit(key="order-1")
+    response = submit("a different prompt", key="order-1")
+    assert response.status_code == 422
+    assert len(submit.started) == 1
+
+
+def test_same_request_within_the_duplicate_window_returns_the_existing_job(submit):
+    first = submit(duration=5).json()
+    # Trivially different prompts share a fingerprint
+    again = submit("  A sunset over the OCEAN! ", duration=5).json()
+    assert again["duplicate"] is True and again["job_id"] == first["job_id"]
+
+    assert submit(duration=10).json()["duplicate"] is False
+    assert submit("a sunrise").json()["duplicate"] is False
+    assert len(submit.started) == 3
+
+
+def test_same_request_after_the_duplicate_window_starts_a_new_job(submit, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "DUPLICATE_WINDOW_SECONDS", 0.05)
+    first = submit().json()
+    time.sleep(0.1)
+    assert submit().json()["job_id"] != first["job_id"]
+
+    monkeypatch.setattr(main_module, "DUPLICATE_WINDOW_SECONDS", 0)
+    assert submit().json()["duplicate"] is False
+    assert len(submit.started) == 3
+
+
+def test_failed_job_does_not_hold_its_key(submit, main_module):
+    first = submit(key="order-1").json()
+    main_module.job_store.update(first["job_id"], {"status": "failed", "error": "Runway failed"})
+
+    retry = submit(key="order-1").json()
+    assert retry["duplicate"] is False and retry["job_id"] != first["job_id"]
+
+
+@pytest.mark.parametrize("key", ["order-1", None])
+def test_concurrent_double_submit_starts_one_job(submit, key):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: submit(key=key).json(), range(8)))
+
+    assert len({response["job_id"] for response in responses}) == 1
+    assert [response["duplicate"] for response in responses].count(False) == 1
+    assert len(submit.started) == 1
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.005)
+
+
+def test_websocket_subscription_follows_a_job_to_the_end(api, main_module):
+    job_store = main_module.job_store
+    job_store.create("job-1", {"status": "processing", "progress": 0})
+
+    with api.websocket_connect("/jobs/ws") as websocket:
+        websocket.send_json({"action": "subscribe", "job_id": "job-1"})
+        first = websocket.receive_json()
+        assert first["job_id"] == "job-1" and first["job"]["status"] == "processing"
+
+        job_store.update("job-1", {"progress": 0.5, "stage": "generating"})
+        update = websocket.receive_json()
+        assert update["job"]["progress"] == 0.5 and update["job"]["stage"] == "generating"
+
+        job_store.update("job-1", {"status": "completed", "progress": 1.0, "video_url": "https://v.mp4"})
+        assert websocket.receive_json()["job"]["status"] == "completed"
+
+        # The terminal event ends the subscription, so subscribing again starts a new one
+        wait_for(lambda: main_module.job_events.watchers == 0)
+        websocket.send_json({"action": "subscribe", "job_id": "job-1"})
+        assert websocket.receive_json()["job"]["video_url"] == "https://v.mp4"
+
+
+def test_websocket_malformed_frames_get_an_error_and_keep_the_connection(api, main_module):
+    main_module.job_store.create("job-1", {"status": "completed", "progress": 1.0})
+
+    with api.websocket_connect("/jobs/ws") as websocket:
+        websocket.send_text("not json")
+        assert "error" in websocket.receive_json()
+        websocket.send_json({"action": "watch", "job_id": "job-1"})
+        assert "error" in websocket.receive_json()
+        websocket.send_json({"action": "subscribe", "job_id": "missing"})
+        assert websocket.receive_json() == {"job_id": "missing", "error": "Job not found"}
+
+        websocket.send_json({"action": "subscribe", "job_id": "job-1"})
+        assert websocket.receive_json()["job"]["status"] == "completed"
+
+
+def parse_events(body):
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+def test_sse_streams_updates_until_the_job_finishes(api, main_module):
+    job_store = main_module.job_store
+    job_store.create("job-1", {"status": "processing", "progress": 0})
+
+    def finish():
+        wait_for(lambda: main_module.job_events.watchers == 1)
+        job_store.update("job-1", {"progress": 0.5})
+        job_store.update("job-1", {"status": "completed", "progress": 1.0})
+
+    worker = threading.Thread(target=finish)
+    worker.start()
+    response = api.get("/jobs/job-1/events")
+    worker.join()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert events[0]["status"] == "processing"
+    assert events[-1]["status"] == "completed"
+    assert [event["progress"] for event in events] == sorted(event["progress"] for event in events)
+
+
+def test_sse_unknown_job_is_404(api):
+    assert api.get("/jobs/missing/events").status_code == 404
@@ -0,0 +1,143 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from services.job_store import JobStore, SQLiteJobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+def hold_write_lock(path: str, seconds: float) -> threading.Thread:
+    """Take the database's write lock from another connection, as another worker would."""
+    locked = threading.Event()
+
+    def hold():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        locked.set()
+        time.sleep(seconds)
+        conn.execute("COMMIT")
+        conn.close()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    locked.wait()
+    return thread
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+
+def test_create_update_and_get(store):
+    store.create("job-1", {"prompt": "a cat"})
+    store.update("job-1", {"progress": 0.5})
+    assert store.get("job-1") == {"status": "queued", "prompt": "a cat", "progress": 0.5}
+    assert store.get("missing") is None
+    with pytest.raises(KeyError):
+        store.update("missing", {"progress": 1.0})
+
+
+def test_transition_only_from_the_given_statuses(store):
+    store.create("job-1", {})
+    assert store.transition("job-1", ["queued"], "processing")
+    assert not store.transition("job-1", ["queued"], "processing")
+    assert store.get("job-1")["status"] == "processing"
+
+
+def test_transition_is_atomic_across_stores(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    stores = [SQLiteJobStore(path, cache_max_age=0) for _ in range(4)]
+    stores[0].create("job-1", {})
+    winners = []
+
+    def claim(store):
+        if store.transition("job-1", ["queued"], "processing"):
+            winners.append(store)
+
+    threads = [threading.Thread(target=claim, args=(store,)) for store in stores for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(winners) == 1
+
+
+def test_async_writes_apply_in_order(store):
+    async def scenario():
+        await store.create_async("job-1", {})
+        store.update_soon("job-1", {"stage": "frames", "progress": 0.3})
+        await store.update_async("job-1", {"stage": "uploading"})
+        return await store.get_async("job-1")
+
+    assert asyncio.run(scenario()) == {"status": "queued", "stage": "uploading", "progress": 0.3}
+
+
+def test_update_soon_writes_a_snapshot(store):
+    store.create("job-1", {})
+    videos = [{"url": "a"}]
+    store.update_soon("job-1", {"videos": videos})
+    videos.append({"url": "b"})
+    store.close()
+    store._cache.clear()
+    assert store.get("job-1")["videos"] == [{"url": "a"}]
+
+
+def test_locked_database_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path, progress_busy_timeout=0.05)
+    store.create("job-1", {})
+
+    async def scenario():
+        stalls = []
+
+        async def ticker():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                stalls.append(now - last)
+                last = now
+
+        ticks = asyncio.ensure_future(ticker())
+        holder = hold_write_lock(path, 0.5)
+        store.update_soon("job-1", {"progress": 0.5})
+        await store.update_async("job-1", {"status": "completed", "progress": 1.0})
+        ticks.cancel()
+        holder.join()
+        return max(stalls)
+
+    assert asyncio.run(scenario()) < 0.25
+    store.close()
+    store._cache.clear()
+    # The progress update gave up on the lock; the final write waited for it
+    assert store.get("job-1") == {"status": "completed", "progress": 1.0}
+
+
+def test_get_async_serves_cached_records_without_a_thread(store, monkeypatch):
+    store.create("job-1", {})
+
+    def fail(*args):
+        raise AssertionError("cached read went to a thread")
+
+    monkeypatch.setattr(asyncio, "to_thread", fail)
+    assert asyncio.run(store.get_async("job-1"))["status"] == "queued"
+
+
+def test_purge_expired_removes_old_finished_jobs(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"), ttl=0, purge_interval=float("inf"))
+    store.create("done", {"status": "completed"})
+    store.create("running", {"status": "processing"})
+    time.sleep(0.01)
+    assert store.purge_expired() == 1
+    assert store.get("done") is None
+    assert store.get("running") is not None
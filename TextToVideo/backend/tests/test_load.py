@@ -0,0 +1,100 @@
+"""
+The checks of scripts/load_test.py as assertions: concurrent uploads, listings and
+generations through the API, with Runway and Computer Vision served by the fakes and
+blobs kept in memory. Throughput and latency are left to the script.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from aiohttp import web
+
+from fake_providers import FakeProviders
+from fakes import FakeVision
+
+CLIENTS = 8
+
+
+@pytest.fixture
+def fake_services():
+    """The fake Runway and Vision APIs on a free port, served from their own thread."""
+    providers = FakeProviders(latency=0.05, jitter=0.01, tail_rate=0, tail_latency=0, failure_rate=0)
+    vision = FakeVision(latency=0.01, jitter=0)
+    app = providers.app()
+    app.add_routes(vision.routes())
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{port}", vision
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
+
+
+@pytest.fixture
+def load_api(api, main_module, fake_services, monkeypatch):
+    """The API with Runway and Computer Vision pointed at the fakes."""
+    url, vision = fake_services
+    for name in ("RUNWAYML_BASE_URL", "RUNWAY_API_BASE_URL", "AZURE_VISION_ENDPOINT"):
+        monkeypatch.setenv(name, url)
+    monkeypatch.setattr(main_module, "AZURE_VISION_ENDPOINT", url)
+    monkeypatch.setattr(main_module, "AZURE_VISION_KEY", "fake")
+    return api, vision
+
+
+def concurrently(func, count):
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        return list(pool.map(func, range(count)))
+
+
+def test_concurrent_uploads_are_stored_listed_and_analyzed(load_api):
+    api, vision = load_api
+
+    def upload(index):
+        response = api.post("/upload", files={"file": (f"load-{index}.png", b"image %d" % index, "image/png")})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    uploads = concurrently(upload, 24)
+    assert len({upload["filename"] for upload in uploads}) == 24
+
+    # Paging through the listing finds every upload exactly once
+    listed, page_token = [], None
+    while True:
+        params = {"limit": 10, **({"page_token": page_token} if page_token else {})}
+        page = api.get("/files", params=params).json()
+        listed += [entry["name"] for entry in page["files"]]
+        page_token = page.get("next_page_token")
+        if not page_token:
+            break
+    assert sorted(listed) == sorted(upload["filename"] for upload in uploads)
+
+    # Background tasks have run by the time TestClient returns a response
+    for upload in uploads:
+        analysis = api.get(f"/analysis/{upload['analysis']['analysis_id']}").json()
+        assert analysis["status"] == "completed", analysis
+    assert vision.calls == 24
+
+
+def test_concurrent_generations_complete(load_api):
+    api, _ = load_api
+
+    def generate(index):
+        response = api.post("/generate-video", params={"prompt": f"Load test scene {index}", "duration": 5})
+        assert response.status_code == 200, response.text
+        return response.json()["job_id"]
+
+    job_ids = concurrently(generate, CLIENTS)
+    assert len(set(job_ids)) == CLIENTS
+    jobs = [api.get(f"/video-status/{job_id}").json() for job_id in job_ids]
+    assert all(job["status"] == "completed" for job in jobs), jobs
+    # Every video was copied from the provider into our videos container
+    stored = {entry["name"] for entry in api.get("/files", params={"container_type": "videos"}).json()["files"]}
+    assert {job["video_blob"] for job in jobs} == stored
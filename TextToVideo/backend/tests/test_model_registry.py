@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from services.model_registry import ModelRegistry
+
+
+def reapers():
+    return [thread for thread in threading.enumerate() if thread.name == 'model-idle-reaper']
+
+
+def test_concurrent_first_use_loads_once():
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.02)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("sdxl", load)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get("sdxl"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len({id(model) for model in models}) == 1
+
+
+def test_unregistered_model_raises():
+    with pytest.raises(KeyError):
+        ModelRegistry().acquire("missing")
+
+
+def test_models_in_use_are_not_unloaded():
+    registry = ModelRegistry()
+    registry.register("sdxl", object)
+    with registry.use("sdxl"):
+        assert registry.unload_idle(0) == []
+        assert not registry.unload("sdxl")
+        assert registry.is_loaded("sdxl")
+    assert registry.unload_idle(0) == ["sdxl"]
+    assert not registry.is_loaded("sdxl")
+
+
+def test_recently_used_models_are_kept():
+    registry = ModelRegistry()
+    registry.register("sdxl", object)
+    registry.get("sdxl")
+    assert registry.unload_idle(60) == []
+    assert not registry.unload("sdxl", max_idle=60)
+    assert registry.unload("sdxl")
+
+
+def test_one_reaper_for_models_loading_at_once():
+    before = len(reapers())
+    registry = ModelRegistry(idle_timeout=3600, reap_interval=3600)
+    barrier = threading.Barrier(4)
+
+    def load():
+        barrier.wait()
+        return object()
+
+    names = [f"model-{i}" for i in range(4)]
+    for name in names:
+        registry.register(name, load)
+    threads = [threading.Thread(target=registry.get, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reapers()) == before + 1
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from services.pipeline import Pipeline
+
+
+def recorder():
+    events = []
+    return events, lambda name, status, detail: events.append((name, status))
+
+
+def test_stages_get_their_dependencies_results():
+    async def video():
+        return "video.mp4"
+
+    async def thumbnail(video):
+        return f"{video}.png"
+
+    async def publish(video, thumbnail):
+        return [video, thumbnail]
+
+    pipeline = Pipeline().add("video", video).add("thumbnail", thumbnail, ["video"])
+    pipeline.add("publish", publish, ["video", "thumbnail"])
+    results = asyncio.run(pipeline.run())
+    assert results["publish"] == ["video.mp4", "video.mp4.png"]
+
+
+def test_failed_optional_stage_skips_its_dependents():
+    async def video():
+        return "video.mp4"
+
+    async def audio():
+        raise RuntimeError("no audio track")
+
+    async def mux(video, audio):
+        raise AssertionError("mux must be skipped")
+
+    async def thumbnail(video):
+        return "thumb.png"
+
+    events, on_stage = recorder()
+    pipeline = (Pipeline()
+                .add("video", video)
+                .add("audio", audio, required=False)
+                .add("mux", mux, ["video", "audio"])
+                .add("thumbnail", thumbnail, ["video"]))
+    results = asyncio.run(pipeline.run(on_stage))
+
+    assert results == {"video": "video.mp4", "audio": None, "mux": None, "thumbnail": "thumb.png"}
+    assert ("audio", "failed") in events
+    assert ("mux", "skipped") in events and ("mux", "running") not in events
+    assert ("thumbnail", "completed") in events
+
+
+def test_failed_required_stage_cancels_and_waits_for_the_rest():
+    unwound = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            await asyncio.sleep(0.01)
+            unwound.append("slow")
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("render failed")
+
+    async def after(slow):
+        raise AssertionError("must not start")
+
+    async def scenario():
+        pipeline = Pipeline().add("slow", slow).add("broken", broken).add("after", after, ["slow"])
+        with pytest.raises(RuntimeError, match="render failed"):
+            await pipeline.run()
+        # Every stage has finished unwinding when run() raises
+        return list(unwound), [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    unwound_at_return, leftover = asyncio.run(scenario())
+    assert unwound_at_return == ["slow"]
+    assert leftover == []
+
+
+def test_cancelling_the_pipeline_cancels_its_stages():
+    unwound = []
+
+    async def stage():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            unwound.append("stage")
+
+    async def scenario():
+        run = asyncio.ensure_future(Pipeline().add("stage", stage).run())
+        await asyncio.sleep(0.01)
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        return list(unwound)
+
+    assert asyncio.run(scenario()) == ["stage"]
+
+
+def test_stages_must_follow_their_dependencies():
+    async def stage():
+        return None
+
+    pipeline = Pipeline().add("video", stage)
+    with pytest.raises(ValueError):
+        pipeline.add("video", stage)
+    with pytest.raises(ValueError):
+        pipeline.add("mux", stage, ["audio"])
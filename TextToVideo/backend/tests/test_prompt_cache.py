@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from services.prompt_cache import PromptCache, normalize_prompt, prompt_cache_key
+
+
+def test_trivially_different_prompts_share_a_key():
+    assert normalize_prompt("  A  Sunset over the OCEAN. ") == "a sunset over the ocean"
+    assert prompt_cache_key("video", "A sunset!", duration=5) == prompt_cache_key("video", "a  sunset", duration=5)
+    assert prompt_cache_key("video", "a sunset", duration=5) != prompt_cache_key("video", "a sunset", duration=10)
+
+
+def test_concurrent_misses_make_one_upstream_call():
+    async def scenario():
+        cache = PromptCache()
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"video_url": "https://example/v.mp4"}
+
+        results = await asyncio.gather(*(cache.get_or_create("key", factory) for _ in range(10)))
+        again = await cache.get_or_create("key", factory)
+        return results, again, len(calls), cache.stats()
+
+    results, again, calls, stats = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"video_url": "https://example/v.mp4"} for result in results + [again])
+    assert stats["misses"] == 1 and stats["hits"] == 10
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    async def scenario():
+        cache = PromptCache()
+        started = asyncio.Event()
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            started.set()
+            await asyncio.sleep(0.05)
+            return {"attempt": len(calls)}
+
+        leader = asyncio.ensure_future(cache.get_or_create("key", factory))
+        await started.wait()
+        followers = [asyncio.ensure_future(cache.get_or_create("key", factory)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results, len(calls)
+
+    leader, results, calls = asyncio.run(scenario())
+    assert leader.cancelled()
+    # One follower took over; the others waited on it instead of starting their own call
+    assert calls == 2
+    assert results == [{"attempt": 2}] * 3
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        cache = PromptCache()
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(*(cache.get_or_create("key", failing) for _ in range(3)),
+                                       return_exceptions=True)
+
+        async def working():
+            return {"ok": True}
+
+        return results, len(calls), await cache.get_or_create("key", working)
+
+    results, calls, retried = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == {"ok": True}
+
+
+def test_entries_are_evicted_by_bytes_count_and_age(monkeypatch):
+    evicted = []
+    cache = PromptCache(max_entries=3, max_bytes=100, max_age=10,
+                        on_evict=lambda key, value: evicted.append(key))
+    cache.put("a", {}, size=60)
+    cache.put("b", {}, size=30)
+    cache.get("a")
+    cache.put("c", {}, size=30)
+    # Over 100 bytes: the least recently used entry goes first
+    assert evicted == ["b"] and cache.stats()["bytes"] == 90
+
+    cache.put("d", {})
+    cache.put("e", {})
+    assert evicted == ["b", "a"] and cache.stats()["entries"] == 3
+
+    now = time.monotonic()
+    monkeypatch.setattr("services.prompt_cache.time.monotonic", lambda: now + 11)
+    assert cache.get("c") is None
+    assert evicted[-1] == "c"
+
+
+def test_unsized_entries_are_bounded_by_count_only():
+    cache = PromptCache(max_entries=2)
+    for key in "abc":
+        cache.put(key, {"url": key})
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 2, "bytes": 0, "hits": 0, "misses": 0}
+
+
+def test_size_of_sizes_created_entries():
+    async def scenario():
+        cache = PromptCache(max_bytes=100)
+
+        async def factory():
+            return {"size": 80}
+
+        await cache.get_or_create("a", factory, size_of=lambda value: value["size"])
+        await cache.get_or_create("b", factory, size_of=lambda value: value["size"])
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 80
+
+
+def test_cached_values_are_copies():
+    cache = PromptCache()
+    cache.put("key", {"url": "x"})
+    cache.get("key")["url"] = "changed"
+    assert cache.get("key") == {"url": "x"}
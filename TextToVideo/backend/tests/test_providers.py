@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from fake_providers import FakeProviders
+from services.providers import (GenerationProvider, HTTPSessionPool, PikaProvider, ProviderError,
+                                ProviderRouter)
+
+
+class ScriptedProvider(GenerationProvider):
+    """Finishes after ``delay`` seconds, or fails if ``fails`` is set."""
+
+    def __init__(self, name, delay=0.0, fails=False, submit_only=False, **options):
+        super().__init__(**options)
+        self.name = name
+        self.delay = delay
+        self.fails = fails
+        self.submit_only = submit_only
+        self.started = 0
+        self.cancelled = 0
+
+    async def _generate(self, prompt, duration, job_id, priority, on_progress, seed):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fails:
+            raise ProviderError(f"{self.name} failed")
+        return {"video_url": f"https://{self.name}/video.mp4"}
+
+
+def with_p95(provider, seconds, samples=20):
+    """Give the provider a latency history whose p95 is ``seconds``."""
+    provider.min_samples = samples
+    for _ in range(samples):
+        provider.latency.record(seconds)
+    return provider
+
+
+def test_fallback_runs_the_secondary_when_the_primary_fails():
+    primary = ScriptedProvider("primary", fails=True)
+    secondary = ScriptedProvider("secondary")
+    router = ProviderRouter({"primary": primary, "secondary": secondary}, mode="fallback",
+                            fallback="secondary")
+
+    result = asyncio.run(router.generate("primary", "a sunset"))
+    assert result["provider"] == "secondary"
+    assert result["video_url"] == "https://secondary/video.mp4"
+    assert primary.failures == 1 and secondary.started == 1
+
+
+def test_single_mode_does_not_fall_back():
+    primary = ScriptedProvider("primary", fails=True)
+    secondary = ScriptedProvider("secondary")
+    router = ProviderRouter({"primary": primary, "secondary": secondary}, fallback="secondary")
+
+    with pytest.raises(ProviderError):
+        asyncio.run(router.generate("primary", "a sunset"))
+    assert secondary.started == 0
+
+
+def test_hedge_fires_after_the_primary_p95():
+    primary = with_p95(ScriptedProvider("primary", delay=1.0, hedge_after=60), 0.05)
+    secondary = ScriptedProvider("secondary", delay=0.01)
+    router = ProviderRouter({"primary": primary, "secondary": secondary}, mode="hedge",
+                            fallback="secondary")
+    assert primary.hedge_delay() == pytest.approx(0.05)
+
+    async def scenario():
+        result = await router.generate("primary", "a sunset")
+        await asyncio.sleep(0)
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["provider"] == "secondary"
+    assert router.hedges == 1 and router.hedge_wins == 1
+    # The slow primary is cancelled once the hedge wins
+    assert primary.cancelled == 1 and primary.in_flight == 0
+
+
+def test_no_hedge_when_the_primary_beats_its_p95():
+    primary = with_p95(ScriptedProvider("primary", delay=0.01), 0.5)
+    secondary = ScriptedProvider("secondary")
+    router = ProviderRouter({"primary": primary, "secondary": secondary}, mode="hedge",
+                            fallback="secondary")
+
+    result = asyncio.run(router.generate("primary", "a sunset"))
+    assert result["provider"] == "primary"
+    assert router.hedges == 0 and secondary.started == 0
+
+
+def test_submit_only_providers_are_never_hedged_or_a_fallback():
+    providers = {
+        "runway": ScriptedProvider("runway"),
+        "pika": ScriptedProvider("pika", submit_only=True)
+    }
+    with pytest.raises(ValueError):
+        ProviderRouter(providers, mode="hedge", fallback="pika")
+
+    router = ProviderRouter(providers, mode="hedge", fallback="runway")
+    # The default mode is ignored for a submit-only primary...
+    assert router.resolve("pika") == (providers["pika"], None, "single")
+    # ...but asking for a hedge or fallback explicitly is an error
+    with pytest.raises(ValueError):
+        router.resolve("pika", mode="hedge")
+    with pytest.raises(ValueError):
+        router.resolve("pika", fallback="runway")
+    with pytest.raises(ValueError):
+        router.resolve("runway", fallback="pika", mode="fallback")
+
+
+def test_pika_returns_the_video_of_its_single_request():
+    async def scenario():
+        fake = FakeProviders(latency=0.01, jitter=0, tail_rate=0, tail_latency=0, failure_rate=0)
+        sessions = HTTPSessionPool()
+        async with TestServer(fake.app()) as server:
+            pika = PikaProvider(sessions, "key", base_url=str(server.make_url("")))
+            try:
+                return await pika.generate("a sunset", duration=5)
+            finally:
+                await sessions.close()
+
+    result = asyncio.run(scenario())
+    assert result["video_url"].endswith(".mp4")
+
+
+def test_pika_without_a_video_url_fails():
+    class PendingPika(PikaProvider):
+        async def _request(self, method, path, payload=None):
+            return {"id": "job-1", "status": "pending"}
+
+    pika = PendingPika(HTTPSessionPool(), "key")
+    with pytest.raises(ProviderError):
+        asyncio.run(pika.generate("a sunset"))
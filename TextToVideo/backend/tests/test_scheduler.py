@@ -0,0 +1,174 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from services import scheduler as scheduler_module
+from services.scheduler import GenerationScheduler, QuotaExceededError
+
+MODEL = "gen4_turbo"
+
+
+def tier(concurrent=1, daily=None, used=None):
+    limits = {"maxConcurrentGenerations": concurrent}
+    if daily is not None:
+        limits["maxDailyGenerations"] = daily
+    credits = {"tier": {"models": {MODEL: limits}}}
+    if used is not None:
+        credits["usage"] = {"models": {MODEL: {"dailyGenerations": used}}}
+    return lambda: credits
+
+
+@pytest.fixture
+def today(monkeypatch):
+    """Controls the scheduler's idea of the current UTC day."""
+    current = {"day": date(2026, 1, 1)}
+    monkeypatch.setattr(scheduler_module, "_utc_today", lambda: current["day"])
+    return current
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        scheduler = GenerationScheduler(tier(concurrent=1), workers=1)
+        order = []
+        release = asyncio.Event()
+
+        async def run(job_id, priority):
+            async with scheduler.slot(MODEL, job_id, priority):
+                order.append(job_id)
+                if job_id == "first":
+                    await release.wait()
+
+        first = asyncio.ensure_future(run("first", 0))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(run(job_id, priority))
+                   for job_id, priority in [("low", 5), ("normal-a", 1), ("normal-b", 1), ("urgent", 0)]]
+        await asyncio.sleep(0.01)
+        positions = {job_id: scheduler.queue_info(job_id)["queue_position"]
+                     for job_id in ("urgent", "normal-a", "normal-b", "low")}
+        release.set()
+        await asyncio.gather(first, *waiting)
+        return order, positions
+
+    order, positions = asyncio.run(scenario())
+    assert order == ["first", "urgent", "normal-a", "normal-b", "low"]
+    assert positions == {"urgent": 1, "normal-a": 2, "normal-b": 3, "low": 4}
+
+
+def test_concurrency_is_capped_at_the_workers_share():
+    async def scenario():
+        scheduler = GenerationScheduler(tier(concurrent=4), workers=2)
+        running, peak = 0, 0
+
+        async def run(job_id):
+            nonlocal running, peak
+            async with scheduler.slot(MODEL, job_id):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(run(f"job-{i}") for i in range(8)))
+        return peak, scheduler.stats()[MODEL]
+
+    peak, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats["limit"] == 2 and stats["active"] == 0
+
+
+def test_daily_quota_fails_fast_once_used_up(today):
+    async def scenario():
+        # 6 a day shared by 2 workers: 3 here, 1 of them already used per Runway's report
+        scheduler = GenerationScheduler(tier(concurrent=5, daily=6, used=2), workers=2)
+        for i in range(2):
+            async with scheduler.slot(MODEL, f"job-{i}"):
+                pass
+        with pytest.raises(QuotaExceededError):
+            async with scheduler.slot(MODEL, "job-over"):
+                pass
+        return scheduler.stats()[MODEL]
+
+    stats = asyncio.run(scenario())
+    assert stats["daily_used"] == 3 and stats["daily_limit"] == 3
+
+
+def test_queued_waiter_is_refused_when_the_quota_runs_out(today):
+    async def scenario():
+        scheduler = GenerationScheduler(tier(concurrent=1, daily=2), workers=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(MODEL, "holder"):
+                await release.wait()
+
+        async def run(job_id):
+            async with scheduler.slot(MODEL, job_id):
+                pass
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(run(f"job-{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await holder
+        return await asyncio.gather(*queued, return_exceptions=True), scheduler.stats()[MODEL]
+
+    results, stats = asyncio.run(scenario())
+    assert results[0] is None
+    assert isinstance(results[1], QuotaExceededError)
+    assert stats["active"] == 0
+
+
+def test_quota_resets_at_midnight_without_a_refresh(today):
+    def limits():
+        if calls:
+            raise ConnectionError("Runway unreachable")
+        calls.append(1)
+        return tier(concurrent=1, daily=1)()
+
+    calls = []
+
+    async def scenario():
+        scheduler = GenerationScheduler(limits, workers=1, refresh_interval=0)
+        async with scheduler.slot(MODEL, "day-1"):
+            pass
+        with pytest.raises(QuotaExceededError):
+            async with scheduler.slot(MODEL, "day-1-over"):
+                pass
+        today["day"] += timedelta(days=1)
+        # The refresh fails; the lane still sees the new day on acquire
+        async with scheduler.slot(MODEL, "day-2"):
+            pass
+        return scheduler.stats()[MODEL]
+
+    assert asyncio.run(scenario())["daily_used"] == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = GenerationScheduler(tier(concurrent=1), workers=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(MODEL, "holder"):
+                await release.wait()
+
+        async def run(job_id):
+            async with scheduler.slot(MODEL, job_id):
+                pass
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        abandoned = asyncio.ensure_future(run("abandoned"))
+        kept = asyncio.ensure_future(run("kept"))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        position = scheduler.queue_info("kept")["queue_position"]
+        release.set()
+        await asyncio.gather(holder, kept)
+        return position, scheduler.stats()[MODEL]
+
+    position, stats = asyncio.run(scenario())
+    assert position == 1
+    assert stats["active"] == 0 and stats["queued"] == 0
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+
+
+class RecordingFile:
+    """A local file that remembers which threads read from it."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self.threads = set()
+
+    def read(self, size: int = -1) -> bytes:
+        self.threads.add(threading.get_ident())
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+class AsyncReader:
+    """Reads like FastAPI's UploadFile."""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self.threads = set()
+
+    async def read(self, size: int = -1) -> bytes:
+        self.threads.add(threading.get_ident())
+        chunk, self._data = self._data[:size], self._data[size:]
+        return chunk
+
+
+def test_local_files_are_read_off_the_event_loop(storage, tmp_path):
+    data = os.urandom(300 * 1024)
+    path = tmp_path / "render.mp4"
+    path.write_bytes(data)
+
+    async def scenario():
+        video = RecordingFile(str(path))
+        try:
+            stored = await storage.upload_stream(video, "render.mp4", container_type='videos',
+                                                 chunk_size=64 * 1024)
+        finally:
+            video.close()
+        return stored, video.threads, await storage.download_file("render.mp4", 'videos')
+
+    loop_thread = threading.get_ident()
+    stored, threads, downloaded = asyncio.run(scenario())
+    assert downloaded == data
+    assert stored["size"] == len(data)
+    assert threads and loop_thread not in threads
+
+
+def test_async_streams_are_awaited_on_the_loop(storage):
+    data = os.urandom(100 * 1024)
+
+    async def scenario():
+        upload = AsyncReader(data)
+        await storage.upload_stream(upload, "upload.png", chunk_size=16 * 1024)
+        return upload.threads, await storage.download_file("upload.png")
+
+    loop_thread = threading.get_ident()
+    threads, downloaded = asyncio.run(scenario())
+    assert downloaded == data
+    assert threads == {loop_thread}
+
+
+def test_download_to_file_streams_chunks_off_the_event_loop(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr("fakes.DOWNLOAD_CHUNK_SIZE", 64 * 1024)
+    data = os.urandom(300 * 1024)
+    writes = []
+
+    class RecordingWriter:
+        def __init__(self, path, mode):
+            self._file = open(path, mode)
+
+        def write(self, chunk):
+            writes.append((threading.get_ident(), len(chunk)))
+            return self._file.write(chunk)
+
+        def close(self):
+            self._file.close()
+
+    monkeypatch.setattr("services.storage_service.open", RecordingWriter, raising=False)
+
+    async def scenario():
+        await storage.upload_file(data, "track.mp3")
+        return await storage.download_to_file("track.mp3", str(tmp_path / "track.mp3"))
+
+    loop_thread = threading.get_ident()
+    size = asyncio.run(scenario())
+    assert size == len(data)
+    assert (tmp_path / "track.mp3").read_bytes() == data
+    assert len(writes) == 5
+    assert loop_thread not in {thread for thread, _ in writes}
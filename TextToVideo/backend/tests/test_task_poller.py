@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.task_poller import RunwayTaskPoller, TaskFailedError
+
+
+class FakeTasks:
+    """Returns the scripted statuses in order, then repeats the last one."""
+
+    def __init__(self, statuses, poller=None):
+        self.statuses = list(statuses)
+        self.calls = 0
+        self.intervals = []
+        self.poller = poller
+
+    async def retrieve(self, task_id):
+        if self.poller is not None:
+            self.intervals.append(self.poller._tasks[task_id].interval)
+        status = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        self.calls += 1
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(id=task_id, status=status, progress=None, output=["https://example/v.mp4"])
+
+
+def make_poller(statuses, **options):
+    tasks = FakeTasks(statuses)
+    options = {"min_interval": 0.01, "max_interval": 0.02, **options}
+    poller = RunwayTaskPoller(SimpleNamespace(tasks=tasks), **options)
+    tasks.poller = poller
+    return poller, tasks
+
+
+def test_waiters_on_one_task_share_its_polls():
+    async def scenario():
+        poller, tasks = make_poller(["PENDING", "RUNNING", "SUCCEEDED"])
+        results = await asyncio.gather(*(poller.wait("task-1") for _ in range(5)))
+        await poller.stop()
+        return results, tasks.calls
+
+    results, calls = asyncio.run(scenario())
+    assert calls == 3
+    assert all(result.status == "SUCCEEDED" for result in results)
+    assert len({id(result) for result in results}) == 1
+
+
+def test_backoff_grows_up_to_the_cap():
+    async def scenario():
+        poller, tasks = make_poller(["RUNNING"] * 5 + ["SUCCEEDED"],
+                                    min_interval=0.01, max_interval=0.04, backoff=2.0)
+        await poller.wait("task-1")
+        await poller.stop()
+        return tasks.intervals
+
+    assert asyncio.run(scenario()) == pytest.approx([0.01, 0.02, 0.04, 0.04, 0.04, 0.04])
+
+
+def test_deadline_raises_timeout():
+    async def scenario():
+        poller, _ = make_poller(["RUNNING"])
+        try:
+            await poller.wait("task-1", timeout=0.05)
+        finally:
+            await poller.stop()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_deadline_applies_while_status_calls_fail():
+    async def scenario():
+        poller, tasks = make_poller([ConnectionError("unreachable")], max_errors=1000)
+        try:
+            await poller.wait("task-1", timeout=0.05)
+        finally:
+            await poller.stop()
+
+    with pytest.raises(TimeoutError, match="unreachable"):
+        asyncio.run(scenario())
+
+
+def test_failed_task_raises_task_failed_error():
+    async def scenario():
+        poller, _ = make_poller(["RUNNING", "FAILED"])
+        try:
+            await poller.wait("task-1")
+        finally:
+            await poller.stop()
+
+    with pytest.raises(TaskFailedError):
+        asyncio.run(scenario())
+
+
+def test_cancelled_waiter_stops_receiving_status_callbacks():
+    async def scenario():
+        poller, _ = make_poller(["PENDING", "RUNNING", "THROTTLED", "RUNNING", "SUCCEEDED"])
+        abandoned, kept = [], []
+        cancelled = asyncio.ensure_future(poller.wait("task-1", on_status=lambda t: abandoned.append(t.status)))
+        survivor = asyncio.ensure_future(poller.wait("task-1", on_status=lambda t: kept.append(t.status)))
+        while not abandoned:
+            await asyncio.sleep(0.001)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await survivor
+        await poller.stop()
+        return abandoned, kept
+
+    abandoned, kept = asyncio.run(scenario())
+    assert abandoned == ["PENDING"]
+    assert kept == ["PENDING", "RUNNING", "THROTTLED", "RUNNING", "SUCCEEDED"]
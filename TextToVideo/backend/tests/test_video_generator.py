@@ -0,0 +1,66 @@
+"""
+The checks of scripts/benchmark_frames.py as assertions, with a fake SDXL model in the
+registry; timing the real model is left to the script. Needs torch and transformers.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+video_generator = pytest.importorskip("services.video_generator")
+torch = pytest.importorskip("torch")
+
+from services.model_registry import model_registry  # noqa: E402
+
+
+class FakeInputs(dict):
+    def to(self, device):
+        return self
+
+
+class FakeProcessor:
+    def __call__(self, prompt, return_tensors):
+        return FakeInputs(input_ids=torch.ones(1, 4, dtype=torch.long))
+
+
+class FakeModel:
+    """Returns 2x2 frames filled with the running number of the generated frame."""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate(self, input_ids, generator=None):
+        done = sum(self.batches)
+        self.batches.append(input_ids.shape[0])
+        return SimpleNamespace(images=[torch.full((2, 2, 3), float(done + i)) for i in range(input_ids.shape[0])])
+
+
+@pytest.fixture
+def model():
+    fake = FakeModel()
+    model_registry.unload(video_generator.SDXL_MODEL_ID)
+    model_registry.register(video_generator.SDXL_MODEL_ID, lambda: (FakeProcessor(), fake))
+    yield fake
+    model_registry.unload(video_generator.SDXL_MODEL_ID)
+    model_registry.register(video_generator.SDXL_MODEL_ID, video_generator._load_sdxl)
+
+
+def test_batched_generation_makes_one_call_per_batch(model):
+    frames = video_generator.VideoGenerator().generate_frames("a sunset", 16, batch_size=4, seed=42)
+    assert len(frames) == 16
+    assert model.batches == [4, 4, 4, 4]
+    assert [frame[0, 0, 0] for frame in frames] == list(range(16))
+
+
+def test_keyframes_generate_fewer_frames_and_interpolate_the_rest(model):
+    progress = []
+    frames = video_generator.VideoGenerator().generate_frames(
+        "a sunset", 16, batch_size=4, seed=42, keyframe_interval=4,
+        progress_callback=lambda done, total: progress.append((done, total)))
+
+    assert len(frames) == 16
+    # Keyframes 0, 4, 8, 12 and the last frame, 15
+    assert model.batches == [4, 1]
+    assert progress == [(4, 5), (5, 5)]
+    assert frames[4][0, 0, 0] == 1.0 and frames[15][0, 0, 0] == 4.0
+    assert frames[2][0, 0, 0] == pytest.approx(0.5)
+    assert frames[13][0, 0, 0] == pytest.approx(3 + 1 / 3)
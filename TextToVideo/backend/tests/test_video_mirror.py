@@ -0,0 +1,41 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from fake_providers import FAKE_VIDEO, FakeProviders
+from services.providers import HTTPSessionPool
+from services.video_mirror import VideoMirror
+
+
+def test_deleted_copies_are_mirrored_again(storage):
+    copies = []
+    copy_from_url = storage.copy_from_url
+
+    async def counting(*args, **kwargs):
+        copies.append(args[1])
+        return await copy_from_url(*args, **kwargs)
+
+    storage.copy_from_url = counting
+
+    async def scenario():
+        fake = FakeProviders(latency=0, jitter=0, tail_rate=0, tail_latency=0, failure_rate=0)
+        sessions = HTTPSessionPool()
+        mirror = VideoMirror(storage, sessions, mode="server")
+        async with TestServer(fake.app()) as server:
+            url = str(server.make_url("/files/task.mp4")) + "?signature=1"
+            first = await mirror.mirror(url)
+            # The same video under a fresh signature is not copied again
+            again = await mirror.mirror(url.replace("signature=1", "signature=2"))
+            assert again["video_blob"] == first["video_blob"] and len(copies) == 1
+
+            await storage.delete_file(first["video_blob"], 'videos')
+            restored = await mirror.mirror(url)
+            stored = await storage.download_file(restored["video_blob"], 'videos')
+        await sessions.close()
+        await storage.close()
+        return restored, stored
+
+    restored, stored = asyncio.run(scenario())
+    assert len(copies) == 2
+    assert stored == FAKE_VIDEO
+    assert restored["size"] == len(FAKE_VIDEO)